@@ -0,0 +1,103 @@
+# benchmarks/bench_advisories.py
+# Cost of matching installed packages against an advisory dump (core/advisories.py).
+#
+# Usage (from the hel-sec-audit directory):
+#   python -m benchmarks.bench_advisories                            # 100,000 synthetic advisories, 3,000 installed packages
+#   python -m benchmarks.bench_advisories --advisories 20000 --installed 1000
+#   python -m benchmarks.bench_advisories --dump all.json --scheme pacman  # a real dump, against the live package database
+#
+# Synthetic dumps are written in both formats: the Arch security tracker's JSON (pacman versions)
+# and an OSV array (Debian versions). Building the index is what a changed dump costs once;
+# every later scan loads the cached index instead.
+
+import argparse
+import json
+import os
+import random
+import tempfile
+
+from benchmarks.bench_parsers import bench
+from core import advisories, dpkg_db, pacman_db
+
+def _version(rng, scheme):
+    version = f"{rng.randint(0, 9)}.{rng.randint(0, 30)}.{rng.randint(0, 30)}-{rng.randint(1, 4)}"
+    if scheme == "debian" and rng.random() < 0.3:
+        version += rng.choice(["+deb12u1", "ubuntu0.1", "~bpo12+1"])
+    return version
+
+def write_synthetic_arch_dump(path, count, packages, seed=1):
+    """Tracker AVGs spread over the package names; one in ten is still unfixed."""
+    rng = random.Random(seed)
+    groups = []
+    for number in range(count):
+        fixed = None if rng.random() < 0.1 else _version(rng, "pacman")
+        groups.append({"name": f"AVG-{number}", "packages": [rng.choice(packages)], "status": "Vulnerable" if fixed is None else "Fixed",
+                       "severity": rng.choice(advisories.SEVERITIES), "type": "arbitrary code execution", "affected": _version(rng, "pacman"),
+                       "fixed": fixed, "ticket": None, "issues": [f"CVE-2024-{number:05d}"], "advisories": []})
+    with open(path, "w") as f:
+        json.dump(groups, f)
+
+def write_synthetic_osv_dump(path, count, packages, ecosystem="Debian:12", seed=1):
+    """OSV records with one ECOSYSTEM range each; a few are for another release and must be ignored."""
+    rng = random.Random(seed)
+    records = []
+    for number in range(count):
+        events = [{"introduced": "0" if rng.random() < 0.8 else _version(rng, "debian")}]
+        if rng.random() < 0.9:
+            events.append({"fixed": _version(rng, "debian")})
+        records.append({"id": f"DEBIAN-CVE-2024-{number:05d}", "upstream": [f"CVE-2024-{number:05d}"],
+                        "affected": [{"package": {"ecosystem": ecosystem if rng.random() < 0.9 else "Debian:11", "name": rng.choice(packages)},
+                                      "ranges": [{"type": "ECOSYSTEM", "events": events}]}]})
+    with open(path, "w") as f:
+        json.dump(records, f)
+
+def synthetic_installed(count, scheme, seed=2):
+    rng = random.Random(seed)
+    if scheme == "pacman":
+        return {f"package-{n}": pacman_db.InstalledPackage(f"package-{n}", _version(rng, scheme), "explicit", 0, 0, False, "", "")
+                for n in range(count)}
+    return {f"package-{n}": dpkg_db.InstalledPackage(f"package-{n}", version, "amd64", "installed", False, False, f"package-{n}", version)
+            for n, version in ((n, _version(rng, scheme)) for n in range(count))}
+
+def run_rows(dump, scheme, ecosystem, installed, iterations, directory):
+    cache = os.path.join(directory, f"{scheme}.cache")
+    bench(f"{scheme}: build index from the dump", max(1, iterations // 5),
+          lambda: advisories.read_dump(dump, scheme, ecosystem), 1, "dumps")
+    advisories.load_index(dump, scheme, ecosystem, cache)
+    index = advisories.load_index(dump, scheme, ecosystem, cache)
+    ranges = sum(len(entry[1]) + len(entry[2]) for entry in index.packages.values())
+    bench(f"{scheme}: load cached index ({ranges} ranges)", iterations,
+          lambda: advisories.load_index(dump, scheme, ecosystem, cache), ranges, "ranges")
+    bench(f"{scheme}: match_installed ({len(installed)} packages)", iterations,
+          lambda: advisories.match_installed(index, installed), len(installed), "packages")
+    found = advisories.match_installed(index, installed)
+    print(f"{scheme}: {len(found)} vulnerabilities in {len({vulnerability.package for vulnerability in found})} of {len(installed)} packages")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark advisory matching.")
+    parser.add_argument("--advisories", type=int, default=100000)
+    parser.add_argument("--installed", type=int, default=3000)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--dump", help="A real advisory dump, matched against the live package database.")
+    parser.add_argument("--scheme", choices=["pacman", "debian"], default="debian")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="hel-sec-audit-bench-")
+    print(f"{'Step':<56} {'Time':>16} {'Throughput':>21}")
+    if args.dump:
+        ecosystem = advisories.os_release_ecosystem() if args.scheme == "debian" else None
+        installed = pacman_db.load_installed_packages(cache_path=False) if args.scheme == "pacman" else dpkg_db.load_installed_packages()
+        run_rows(args.dump, args.scheme, ecosystem, installed, args.iterations, directory)
+        return
+
+    # Fewer advisory targets than installed packages, as in reality: most packages have none, some many
+    names = [f"package-{n}" for n in range(args.installed * 2)]
+    arch_dump = os.path.join(directory, "all.json")
+    write_synthetic_arch_dump(arch_dump, args.advisories, names)
+    run_rows(arch_dump, "pacman", None, synthetic_installed(args.installed, "pacman"), args.iterations, directory)
+    osv_dump = os.path.join(directory, "osv.json")
+    write_synthetic_osv_dump(osv_dump, args.advisories, names)
+    run_rows(osv_dump, "debian", "Debian:12", synthetic_installed(args.installed, "debian"), args.iterations, directory)
+
+if __name__ == "__main__":
+    main()
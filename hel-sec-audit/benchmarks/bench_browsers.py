@@ -0,0 +1,124 @@
+# benchmarks/bench_browsers.py
+# Cost of finding and auditing every browser profile on a shared workstation (core/browser_profiles.py).
+#
+# Usage (from the hel-sec-audit directory):
+#   python -m benchmarks.bench_browsers                    # 300 synthetic users with 1-4 profiles each
+#   python -m benchmarks.bench_browsers --users 1000 --workers 32
+#   python -m benchmarks.bench_browsers --prefs-mb 8     # a larger prefs.js for the parse/cache rows
+#
+# The synthetic /home has Firefox profiles.ini files and Local State files of the Chromium-family
+# browsers, with prefs.js / Preferences files padded to realistic sizes (prefs.js is often 100+ KiB).
+
+import argparse
+import json
+import os
+import random
+import tempfile
+
+from benchmarks.bench_parsers import bench
+from core import browser_profiles, firefox_prefs
+from core.checks.browser_security import BrowserSecurityCheck
+
+def _firefox_prefs(rng):
+    lines = [f'user_pref("extensions.synthetic.pref{n}", "{rng.random()}");' for n in range(rng.randint(500, 2500))]
+    if rng.random() < 0.3:
+        lines.append('user_pref( "network.trr.mode",0 ) ;')
+    return "\n".join(lines) + "\n"
+
+def write_large_prefs(path, megabytes, seed=1):
+    """A prefs.js of about the given size, with the comments and escapes real ones have."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("// Mozilla User Preferences\n\n/* Do not edit this file. */\n\n")
+        written, number = 0, 0
+        while written < megabytes * 1024 * 1024:
+            line = f'user_pref("services.sync.synthetic.{number}", "{{\\"id\\":{rng.random()},\\"url\\":\\"https://example.org/{number}\\"}}");\n'
+            if number % 3 == 0:
+                line = f'user_pref("browser.synthetic.count{number}", {rng.randint(-5, 100000)});\n'
+            f.write(line)
+            written += len(line)
+            number += 1
+
+def _chrome_prefs(rng):
+    prefs = {"profile": {"cookie_controls_mode": rng.choice([0, 1, 2, 2])},
+             "extensions": {"settings": {f"ext{n}": {"state": 1, "path": "x" * 64} for n in range(rng.randint(20, 200))}}}
+    if rng.random() < 0.2:
+        # Absent means on; only written when turned off
+        prefs["safebrowsing"] = {"enabled": False}
+    return prefs
+
+def write_synthetic_homes(root, users, seed=1):
+    """:return: The number of profiles written."""
+    rng = random.Random(seed)
+    count = 0
+    for number in range(users):
+        home = os.path.join(root, f"user{number}")
+        firefox = os.path.join(home, browser_profiles.FIREFOX_DIR)
+        names = [f"abc{number}x{n}.default-release" for n in range(rng.randint(0, 2))]
+        if names:
+            os.makedirs(firefox)
+            with open(os.path.join(firefox, "profiles.ini"), "w") as f:
+                for n, name in enumerate(names):
+                    f.write(f"[Profile{n}]\nName={'default-release' if n == 0 else f'work{n}'}\nIsRelative=1\nPath={name}\n\n")
+                    os.makedirs(os.path.join(firefox, name))
+                    with open(os.path.join(firefox, name, "prefs.js"), "w") as prefs:
+                        prefs.write(_firefox_prefs(rng))
+                    if rng.random() < 0.2:
+                        # A hardening user.js overriding what prefs.js says
+                        with open(os.path.join(firefox, name, "user.js"), "w") as user_js:
+                            user_js.write('user_pref("network.trr.mode", 3);\n')
+                f.write("[General]\nStartWithLastProfile=1\nVersion=2\n")
+            count += len(names)
+        for browser, directory in rng.sample(browser_profiles.CHROMIUM_BROWSERS, rng.randint(0, 2)):
+            config = os.path.join(home, directory)
+            profile_dirs = ["Default"] + [f"Profile {n}" for n in range(1, rng.randint(1, 3))]
+            os.makedirs(config)
+            with open(os.path.join(config, "Local State"), "w") as f:
+                json.dump({"profile": {"info_cache": {name: {"name": f"Person {n + 1}"} for n, name in enumerate(profile_dirs)}}}, f)
+            for name in profile_dirs:
+                os.makedirs(os.path.join(config, name))
+                with open(os.path.join(config, name, "Preferences"), "w") as f:
+                    json.dump(_chrome_prefs(rng), f)
+            count += len(profile_dirs)
+        os.makedirs(home, exist_ok=True)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark browser profile discovery and evaluation.")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=browser_profiles.DEFAULT_MAX_WORKERS)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--prefs-mb", type=float, default=4)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        count = write_synthetic_homes(root, args.users)
+        homes = browser_profiles.user_homes(root)
+        check = BrowserSecurityCheck()
+        profiles = browser_profiles.discover_profiles(homes, args.workers)
+        print(f"{len(homes)} homes, {len(profiles)} profiles ({count} written)")
+        print(f"{'Step':<56} {'Time':>16} {'Throughput':>21}")
+        large = os.path.join(root, "large-profile")
+        os.makedirs(large)
+        write_large_prefs(os.path.join(large, "prefs.js"), args.prefs_mb)
+        def cold():
+            firefox_prefs.clear_cache()
+            return firefox_prefs.load_profile_prefs(large)
+        count = len(cold())
+        bench(f"load_profile_prefs, {args.prefs_mb:g} MB prefs.js, parsed", args.iterations, cold, count, "prefs")
+        bench(f"load_profile_prefs, {args.prefs_mb:g} MB prefs.js, cached", args.iterations * 100,
+              lambda: firefox_prefs.load_profile_prefs(large), count, "prefs")
+        for workers in sorted({1, args.workers}):
+            bench(f"discover_profiles, {workers} workers", args.iterations,
+                  lambda: browser_profiles.discover_profiles(homes, workers), len(homes), "homes")
+            def evaluate_cold():
+                firefox_prefs.clear_cache()
+                return browser_profiles.evaluate_profiles(profiles, check._evaluate_profile, workers)
+            bench(f"evaluate_profiles, {workers} workers, prefs parsed", args.iterations, evaluate_cold, len(profiles), "profiles")
+            bench(f"evaluate_profiles, {workers} workers, prefs cached", args.iterations,
+                  lambda: browser_profiles.evaluate_profiles(profiles, check._evaluate_profile, workers), len(profiles), "profiles")
+        weak = sum(not finding["is_secure"] for profile, finding in browser_profiles.evaluate_profiles(profiles, check._evaluate_profile))
+        print(f"{weak} of {len(profiles)} profiles have weak settings")
+
+if __name__ == "__main__":
+    main()
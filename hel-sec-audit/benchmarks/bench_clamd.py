@@ -0,0 +1,190 @@
+# benchmarks/bench_clamd.py
+# Throughput of core/clamd_client.py against a stand-in clamd, or a real one.
+#
+# Usage (from the hel-sec-audit directory):
+#   python -m benchmarks.bench_clamd                          # 2,000 synthetic files, stand-in clamd
+#   python -m benchmarks.bench_clamd --files 500 --jobs 8
+#   python -m benchmarks.bench_clamd --socket /run/clamav/clamd.ctl   # the running clamd
+#   python -m benchmarks.bench_clamd --serve /tmp/clamd.sock  # only run the stand-in, e.g. for
+#                                                             # 'hel-sec-audit clamd-scan --socket /tmp/clamd.sock ...'
+#
+# The stand-in speaks clamd's protocol (IDSESSION, PING, VERSION, INSTREAM, END, with "z" and "n"
+# command prefixes) and reports files containing the EICAR test string, so the client can be checked
+# without ClamAV installed. It does no real scanning: the numbers show the client's own overhead.
+
+import argparse
+import os
+import random
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+
+from core import clamd_client
+
+# The standard antivirus test file, split so this source file is not itself flagged
+EICAR = b"X5O!P%@AP[4\\PZX54(P^)7CC)7}$" + b"EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*"
+STANDIN_SIGNATURE = "Eicar-Test-Signature"
+STANDIN_STREAM_MAX_LENGTH = 25 * 1024 * 1024
+
+class _StandInHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.buffer = b""
+
+    def _read_exact(self, count):
+        while len(self.buffer) < count:
+            data = self.request.recv(65536)
+            if not data:
+                raise ConnectionError("client went away")
+            self.buffer += data
+        data, self.buffer = self.buffer[:count], self.buffer[count:]
+        return data
+
+    def _read_command(self):
+        # "zCOMMAND\0" or "nCOMMAND\n"
+        prefix = self._read_exact(1)
+        end = b"\0" if prefix == b"z" else b"\n"
+        while end not in self.buffer:
+            data = self.request.recv(4096)
+            if not data:
+                raise ConnectionError("client went away")
+            self.buffer += data
+        command, self.buffer = self.buffer.split(end, 1)
+        return command.decode(), end
+
+    def _instream(self):
+        received, found, tail = 0, False, b""
+        while True:
+            length = struct.unpack("!L", self._read_exact(4))[0]
+            if not length:
+                break
+            data = self._read_exact(length)
+            received += length
+            if received > STANDIN_STREAM_MAX_LENGTH:
+                return None
+            found = found or EICAR in tail + data
+            tail = data[-len(EICAR):]
+        return f"stream: {STANDIN_SIGNATURE} FOUND" if found else "stream: OK"
+
+    def handle(self):
+        session = False
+        number = 0
+        try:
+            while True:
+                command, end = self._read_command()
+                number += 1
+                if command == "IDSESSION":
+                    session = True
+                    number = 0
+                    continue
+                if command == "END":
+                    return
+                if command == "PING":
+                    reply = "PONG"
+                elif command == "VERSION":
+                    reply = "ClamAV 1.0.0-standin/27062/Thu Jan  1 00:00:00 2026"
+                elif command == "INSTREAM":
+                    reply = self._instream()
+                    if reply is None:
+                        # clamd drops the connection after this error
+                        self.request.sendall(b"INSTREAM size limit exceeded. ERROR" + end)
+                        return
+                else:
+                    reply = "UNKNOWN COMMAND"
+                self.request.sendall(((f"{number}: " if session else "") + reply).encode() + end)
+                if not session:
+                    return
+        except ConnectionError:
+            return
+
+class StandInClamd(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """A clamd stand-in on a UNIX socket; serve_forever() in a thread, shutdown() when done."""
+    daemon_threads = True
+
+    def __init__(self, path):
+        super().__init__(path, _StandInHandler)
+
+def write_synthetic_tree(root, files, infected=10, seed=1):
+    """Files of 1-256 KiB in nested directories; some contain the EICAR string, one is too large to stream."""
+    rng = random.Random(seed)
+    paths = []
+    for n in range(files):
+        directory = os.path.join(root, f"d{n % 20}", f"s{n % 7}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file{n}.bin")
+        data = os.urandom(rng.randint(1, 256) * 1024)
+        if n % max(1, files // infected) == 0:
+            data = data[:len(data) // 2] + EICAR + data[len(data) // 2:]
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    with open(os.path.join(root, "huge.iso"), "wb") as f:
+        f.truncate(clamd_client.DEFAULT_MAX_FILE_SIZE + 1)
+    return paths
+
+def timed(label, run, units, unit_name):
+    started = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<56} {elapsed * 1000:>9.2f} ms/run {units / elapsed:>14,.0f} {unit_name}/s")
+    return result
+
+def unpooled_scan(path, files):
+    # What a client without sessions does: one connection per file, as clamdscan without --multiscan
+    found = 0
+    for file_path in files:
+        connection = clamd_client.ClamdConnection(path)
+        with open(file_path, "rb") as f:
+            found += clamd_client.parse_reply(connection.instream(f))[0] == "found"
+        connection.close()
+    return found
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pooled clamd INSTREAM client.")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--jobs", type=int, default=clamd_client.DEFAULT_POOL_SIZE)
+    parser.add_argument("--socket", help="Scan through this clamd instead of the stand-in.")
+    parser.add_argument("--serve", help="Only run the stand-in clamd on this socket path until interrupted.")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        server = StandInClamd(args.serve)
+        print(f"Stand-in clamd listening on {args.serve}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.unlink(args.serve)
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        tree = os.path.join(root, "tree")
+        files = write_synthetic_tree(tree, args.files)
+        total_mb = sum(os.path.getsize(path) for path in files) / (1024 * 1024)
+        server = None
+        socket_path = args.socket
+        if not socket_path:
+            socket_path = os.path.join(root, "clamd.sock")
+            server = StandInClamd(socket_path)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            print(f"{'Scan':<56} {'Time':>16} {'Throughput':>21}")
+            def pooled():
+                with clamd_client.ConnectionPool(socket_path, size=args.jobs) as pool:
+                    return list(clamd_client.scan_paths([tree], pool))
+            results = timed(f"scan_paths, {args.jobs} pooled connections ({total_mb:.0f} MiB)", pooled, len(files), "files")
+            timed("one connection per file, sequential", lambda: unpooled_scan(socket_path, files), len(files), "files")
+            counts = {}
+            for result in results:
+                counts[result.status] = counts.get(result.status, 0) + 1
+            print(f"results: {counts}")
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+
+if __name__ == "__main__":
+    main()
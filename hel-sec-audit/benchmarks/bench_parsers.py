@@ -0,0 +1,298 @@
+# benchmarks/bench_parsers.py
+# Throughput of the Linux output parsers, run against replayed command output instead of the live machine.
+#
+# Usage (from the hel-sec-audit directory):
+#   python -m benchmarks.bench_parsers                      # synthetic outputs (5,000 sockets, 3,000 packages, ...)
+#   python -m benchmarks.bench_parsers --fixture arch.json  # output recorded with HEL_SEC_AUDIT_EXECUTOR=record:arch.json
+#   python -m benchmarks.bench_parsers --proc-root /proc    # the live socket tables instead of synthetic ones
+#   python -m benchmarks.bench_parsers --pacman-root /var/lib/pacman  # the live pacman database
+#
+# Every iteration uses a fresh FactProvider, so the shared probes are parsed again each time.
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from core.checks.firewall_status import FirewallStatusCheck
+from core.checks.open_ports import OpenPortsCheck
+from core.checks.software_updates import SoftwareUpdatesCheck
+from core.executors import ReplayExecutor, load_fixture, set_executor
+from core.facts import FactProvider
+from core import clamav_db, dpkg_db, pacman_sync
+from core.pacman_db import load_installed_packages, read_local_database
+from core.firewall_rules import NFT_RULESET_COMMAND, parse_iptables_save, parse_nft_json
+from core.proc_net import read_listening_sockets
+from core.reachability import ReachabilityAnalyzer
+
+NFT_COMMAND = ("sudo", *NFT_RULESET_COMMAND)
+APT_UPGRADABLE_COMMAND = ("apt", "list", "--upgradable")
+PACMAN_UPGRADABLE_COMMAND = ("pacman", "-Qu")
+
+PROC_NET_HEADER = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+
+def write_synthetic_proc(root, sockets, processes=50):
+    """
+    Writes /proc/net/{tcp,tcp6,udp} tables with the given number of sockets (a third of them
+    established connections, which the reader has to skip) and /proc/<pid>/fd links owning them.
+    """
+    tables = {"tcp": [], "tcp6": [], "udp": []}
+    owned = {pid: [] for pid in range(1000, 1000 + processes)}
+    for i in range(sockets):
+        inode = 100000 + i
+        port = 1024 + i % 60000
+        if i % 3 == 0:
+            table, state, address = "udp", "07", f"{i & 255:02X}{(i >> 8) & 255:02X}000A"
+        elif i % 3 == 1:
+            table, state, address = "tcp", "0A" if i % 2 else "01", f"{i & 255:02X}{(i >> 8) & 255:02X}000A"
+        else:
+            table, state, address = "tcp6", "0A", "0000000000000000FFFF0000" + f"{i & 255:02X}{(i >> 8) & 255:02X}000A"
+        remote = "0" * len(address)
+        tables[table].append(f"{len(tables[table]):4}: {address}:{port:04X} {remote}:0000 {state} 00000000:00000000 00:00000000 00000000  1000        0 {inode} 1 0000000000000000 100 0 0 10 0\n")
+        owned[1000 + i % processes].append(inode)
+
+    os.makedirs(os.path.join(root, "net"))
+    for table, rows in tables.items():
+        with open(os.path.join(root, "net", table), "w") as f:
+            f.write(PROC_NET_HEADER)
+            f.writelines(rows)
+    for pid, inodes in owned.items():
+        fd_dir = os.path.join(root, str(pid), "fd")
+        os.makedirs(fd_dir)
+        for fd, inode in enumerate(inodes, start=3):
+            os.symlink(f"socket:[{inode}]", os.path.join(fd_dir, str(fd)))
+        os.symlink(f"/usr/bin/service{pid}", os.path.join(root, str(pid), "exe"))
+
+def synthetic_apt_output(packages):
+    rows = ["Listing... Done"]
+    for i in range(packages):
+        rows.append(f"libpackage{i}/stable-security 1.{i % 50}.{i % 7}-1 amd64 [upgradable from: 1.{i % 50}.{i % 7}-0]")
+    return "\n".join(rows) + "\n"
+
+def synthetic_pacman_output(packages):
+    return "\n".join(f"package{i} 1.{i % 50}.{i % 7}-1 -> 1.{i % 50}.{i % 7}-2" for i in range(packages)) + "\n"
+
+def synthetic_nft_output(rules):
+    # One inet table whose input chain jumps to a services chain holding the per-port rules
+    items = [
+        {"table": {"family": "inet", "name": "filter", "handle": 1}},
+        {"chain": {"family": "inet", "table": "filter", "name": "input", "handle": 1, "type": "filter", "hook": "input", "prio": 0, "policy": "drop"}},
+        {"chain": {"family": "inet", "table": "filter", "name": "services", "handle": 2}},
+        {"rule": {"family": "inet", "table": "filter", "chain": "input", "expr": [
+            {"match": {"op": "in", "left": {"ct": {"key": "state"}}, "right": ["established", "related"]}}, {"accept": None}]}},
+        {"rule": {"family": "inet", "table": "filter", "chain": "input", "expr": [{"jump": {"target": "services"}}]}},
+    ]
+    for i in range(rules):
+        items.append({"rule": {"family": "inet", "table": "filter", "chain": "services", "expr": [
+            {"match": {"op": "==", "left": {"payload": {"protocol": "ip", "field": "saddr"}},
+                       "right": {"prefix": {"addr": f"10.{(i >> 8) & 255}.{i & 255}.0", "len": 24}}}},
+            {"match": {"op": "==", "left": {"payload": {"protocol": "tcp", "field": "dport"}}, "right": 1024 + i}},
+            {"counter": {"packets": 0, "bytes": 0}}, {"accept": None}]}})
+    return json.dumps({"nftables": items})
+
+def synthetic_iptables_output(rules):
+    rows = ["*filter", ":INPUT DROP [0:0]", ":FORWARD DROP [0:0]", ":OUTPUT ACCEPT [0:0]", ":services - [0:0]",
+            "-A INPUT -m conntrack --ctstate RELATED,ESTABLISHED -j ACCEPT", "-A INPUT -j services"]
+    for i in range(rules):
+        rows.append(f"-A services -s 10.{(i >> 8) & 255}.{i & 255}.0/24 -p tcp -m tcp --dport {1024 + i} -j ACCEPT")
+    rows.append("COMMIT")
+    return "\n".join(rows) + "\n"
+
+def write_synthetic_pacman_db(root, packages):
+    """
+    Writes a pacman database with local/<name>-<version>/desc entries and a sync/core.db listing all
+    but every 20th package, a tenth of them with a newer version.
+    """
+    import io
+    import tarfile
+
+    os.makedirs(os.path.join(root, "local"))
+    os.makedirs(os.path.join(root, "sync"))
+    with open(os.path.join(root, "local", "ALPM_DB_VERSION"), "w") as f:
+        f.write("9\n")
+    with tarfile.open(os.path.join(root, "sync", "core.db"), "w:gz") as archive:
+        for i in range(packages):
+            entry = f"libpackage{i}-1.{i % 50}.{i % 7}-1"
+            os.makedirs(os.path.join(root, "local", entry))
+            reason = "%REASON%\n1\n\n" if i % 3 else ""
+            with open(os.path.join(root, "local", entry, "desc"), "w") as f:
+                f.write(f"%NAME%\nlibpackage{i}\n\n%VERSION%\n1.{i % 50}.{i % 7}-1\n\n%DESC%\nSynthetic package {i}\n\n"
+                        f"%BUILDDATE%\n1700000000\n\n%INSTALLDATE%\n1700000100\n\n%PACKAGER%\nBench <bench@example.org>\n\n"
+                        f"{reason}%VALIDATION%\npgp\n\n")
+            if i % 20:
+                # Every tenth package has a newer pkgrel in the repository
+                if i % 10 == 1:
+                    entry = f"libpackage{i}-1.{i % 50}.{i % 7}-2"
+                directory = tarfile.TarInfo(entry)
+                directory.type = tarfile.DIRTYPE
+                archive.addfile(directory)
+                desc = f"%NAME%\nlibpackage{i}\n".encode()
+                member = tarfile.TarInfo(entry + "/desc")
+                member.size = len(desc)
+                archive.addfile(member, io.BytesIO(desc))
+
+def write_synthetic_apt_lists(root, packages, archive_packages=60000):
+    """
+    Writes a dpkg status file with the given number of installed packages and an apt Packages index the size
+    of Debian's main archive, holding every installed package (a tenth of them with a newer revision).
+    """
+    lists = os.path.join(root, "lists")
+    os.makedirs(lists)
+    with open(os.path.join(root, "status"), "w") as f:
+        for i in range(packages):
+            f.write(f"Package: libpackage{i}\nStatus: install ok installed\nPriority: optional\nSection: libs\nInstalled-Size: 100\n"
+                    f"Maintainer: Bench <bench@example.org>\nArchitecture: amd64\nVersion: 1.{i % 50}.{i % 7}-1\n"
+                    f"Depends: libc6 (>= 2.36)\nDescription: Synthetic package {i}\n Long description.\n\n")
+    with open(os.path.join(lists, "deb.example.org_debian_dists_stable_InRelease"), "w") as f:
+        f.write("Origin: Debian\nSuite: stable\nCodename: bench\n")
+    with open(os.path.join(lists, "deb.example.org_debian_dists_stable_main_binary-amd64_Packages"), "w") as f:
+        for i in range(max(packages, archive_packages)):
+            revision = 2 if i % 10 == 1 else 1
+            f.write(f"Package: libpackage{i}\nSource: package{i}\nVersion: 1.{i % 50}.{i % 7}-{revision}\nInstalled-Size: 100\n"
+                    f"Maintainer: Bench <bench@example.org>\nArchitecture: amd64\nDepends: libc6 (>= 2.36)\n"
+                    f"Description: Synthetic package {i}\nFilename: pool/main/p/package{i}/libpackage{i}_1.0-1_amd64.deb\n"
+                    f"Size: 12345\nSHA256: {'0' * 64}\n\n")
+
+def synthetic_fixture(packages, firewall_rules):
+    return {
+        APT_UPGRADABLE_COMMAND: (synthetic_apt_output(packages), "", 0),
+        PACMAN_UPGRADABLE_COMMAND: (synthetic_pacman_output(packages), "", 0),
+        NFT_COMMAND: (synthetic_nft_output(firewall_rules), "", 0),
+    }
+
+def write_synthetic_clamav_db(root, signature_bytes=4 * 1024 * 1024):
+    """Writes main/daily/bytecode .cvd files (and a daily.cld) whose headers are followed by filler the reader must not touch."""
+    built = int(time.time()) - 3600
+    for name, version in (("main.cvd", 62), ("daily.cvd", 27000), ("daily.cld", 27062), ("bytecode.cvd", 335)):
+        stamp = time.strftime("%d %b %Y %H-%M +0000", time.gmtime(built))
+        header = f"ClamAV-VDB:{stamp}:{version}:2000000:90:0123456789abcdef:signature:builder:{built}".encode().ljust(clamav_db.HEADER_SIZE, b" ")
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(header + bytes(signature_bytes))
+
+def bench(label, iterations, run, units, unit_name):
+    # One untimed round first, so imports and caches do not count against the parser.
+    run()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        run()
+    elapsed = time.perf_counter() - started
+    per_iteration = elapsed / iterations
+    throughput = units / per_iteration if per_iteration else float("inf")
+    print(f"{label:<56} {per_iteration * 1000:>9.2f} ms/run {throughput:>14,.0f} {unit_name}/s")
+
+def count_lines(entries, command):
+    stdout, stderr, return_code = entries.get(command, ("", "", 0))
+    return max(1, len(stdout.splitlines()))
+
+def count_lines_in(path):
+    try:
+        with open(path, "r") as f:
+            return max(0, sum(1 for _ in f) - 1)
+    except OSError:
+        return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Linux output parsers against replayed command output.")
+    parser.add_argument("--fixture", help="Replay a fixture recorded with HEL_SEC_AUDIT_EXECUTOR=record:<path> instead of synthetic output.")
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--proc-root", help="Read socket tables from this proc filesystem instead of a synthetic one.")
+    parser.add_argument("--packages", type=int, default=3000)
+    parser.add_argument("--pacman-root", help="Read the pacman database (local/, sync/) from this directory instead of a synthetic one.")
+    parser.add_argument("--firewall-rules", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--package-manager", choices=["apt", "pacman"], default="apt",
+                        help="Which package manager's output the software parser is fed.")
+    args = parser.parse_args(argv)
+
+    entries = load_fixture(args.fixture) if args.fixture else synthetic_fixture(args.packages, args.firewall_rules)
+    previous = set_executor(ReplayExecutor(entries))
+    synthetic_proc = None
+    proc_root = args.proc_root
+    if not proc_root:
+        synthetic_proc = tempfile.TemporaryDirectory()
+        proc_root = synthetic_proc.name
+        write_synthetic_proc(proc_root, args.sockets)
+    synthetic_pacman = None
+    pacman_root = args.pacman_root
+    if not pacman_root:
+        synthetic_pacman = tempfile.TemporaryDirectory()
+        pacman_root = synthetic_pacman.name
+        write_synthetic_pacman_db(pacman_root, args.packages)
+    pacman_local, pacman_sync_dir = os.path.join(pacman_root, "local"), os.path.join(pacman_root, "sync")
+    synthetic_apt = tempfile.TemporaryDirectory()
+    write_synthetic_apt_lists(synthetic_apt.name, args.packages)
+    apt_status, apt_lists = os.path.join(synthetic_apt.name, "status"), os.path.join(synthetic_apt.name, "lists")
+    try:
+        # The package manager is detected from the filesystem, so it is pinned to match the replayed output.
+        preset = {"package_manager": args.package_manager}
+        open_ports = OpenPortsCheck()
+        firewall = FirewallStatusCheck()
+        software = SoftwareUpdatesCheck()
+        upgradable_command = APT_UPGRADABLE_COMMAND if args.package_manager == "apt" else PACMAN_UPGRADABLE_COMMAND
+
+        print(f"{'Parser':<56} {'Time':>16} {'Throughput':>21}")
+        socket_lines = sum(count_lines_in(os.path.join(proc_root, "net", table)) for table in ("tcp", "tcp6", "udp", "udp6", "raw", "raw6"))
+        bench("OpenPortsCheck (/proc/net + fd owners)", args.iterations,
+              lambda: open_ports._evaluate_linux_open_ports({"ok": True, "sockets": read_listening_sockets(proc_root), "error": ""}),
+              socket_lines, "sockets")
+        firewall_rule_count = max(1, len(json.loads(entries.get(NFT_COMMAND, ('{"nftables": []}',))[0])["nftables"]))
+        bench("FirewallStatusCheck (nft -j list ruleset)", args.iterations,
+              lambda: firewall._check_linux_firewall(FactProvider(preset)),
+              firewall_rule_count, "items")
+        sockets = read_listening_sockets(proc_root, resolve_owners=False)
+        ruleset = parse_nft_json(synthetic_nft_output(args.firewall_rules))
+        bench(f"ReachabilityAnalyzer ({len(sockets)} sockets x {ruleset.rule_count()} rules)", args.iterations,
+              lambda: ReachabilityAnalyzer(ruleset).analyze(sockets),
+              len(sockets), "sockets")
+        iptables_output = synthetic_iptables_output(args.firewall_rules)
+        bench("parse_iptables_save", args.iterations,
+              lambda: parse_iptables_save(iptables_output),
+              args.firewall_rules, "rules")
+        installed_count = max(1, len(read_local_database(pacman_local, pacman_sync_dir)))
+        bench("read_local_database (pacman local/*/desc)", args.iterations,
+              lambda: read_local_database(pacman_local, pacman_sync_dir),
+              installed_count, "packages")
+        index_cache = os.path.join(pacman_root, "bench-index.cache") if synthetic_pacman else os.path.join(tempfile.gettempdir(), "hel-sec-audit-bench-index.cache")
+        bench("load_installed_packages (cached index, mmap)", args.iterations,
+              lambda: load_installed_packages(pacman_local, pacman_sync_dir, cache_path=index_cache),
+              installed_count, "packages")
+        def read_sync_databases():
+            pacman_sync._database_cache.clear()
+            return pacman_sync.load_sync_databases(pacman_sync_dir, conf_path=os.devnull)[0]
+        databases = read_sync_databases()
+        bench("load_sync_databases (tar headers, no extraction)", args.iterations, read_sync_databases,
+              max(1, sum(len(database.packages) for database in databases)), "packages")
+        installed = load_installed_packages(pacman_local, pacman_sync_dir, cache_path=index_cache)
+        bench(f"pending_updates ({len(pacman_sync.pending_updates(installed, databases))} of {len(installed)} installed)", args.iterations,
+              lambda: pacman_sync.pending_updates(installed, databases),
+              installed_count, "packages")
+        def read_apt_lists():
+            dpkg_db._index_cache.clear()
+            return dpkg_db.load_package_indexes(apt_lists)[0]
+        apt_indexes = read_apt_lists()
+        bench("load_package_indexes (apt Packages, mmap)", args.iterations, read_apt_lists,
+              max(1, sum(len(index.packages) for index in apt_indexes)), "packages")
+        dpkg_installed = dpkg_db.load_installed_packages(apt_status, apt_indexes)
+        bench(f"dpkg status + pending_upgrades ({len(dpkg_db.pending_upgrades(dpkg_installed, apt_indexes))} of {len(dpkg_installed)} installed)", args.iterations,
+              lambda: dpkg_db.pending_upgrades(dpkg_db.load_installed_packages(apt_status, apt_indexes), apt_indexes),
+              max(1, len(dpkg_installed)), "packages")
+        clamav_dir = os.path.join(synthetic_apt.name, "clamav")
+        os.mkdir(clamav_dir)
+        write_synthetic_clamav_db(clamav_dir)
+        bench("clamav_db.load_databases (.cvd/.cld headers)", args.iterations,
+              lambda: clamav_db.load_databases(clamav_dir),
+              len(clamav_db.database_paths(clamav_dir)), "databases")
+        bench(f"SoftwareUpdatesCheck ({' '.join(upgradable_command)})", args.iterations,
+              lambda: software._check_linux_software(FactProvider(preset)),
+              count_lines(entries, upgradable_command), "packages")
+    finally:
+        set_executor(previous)
+        if synthetic_proc:
+            synthetic_proc.cleanup()
+        if synthetic_pacman:
+            synthetic_pacman.cleanup()
+        synthetic_apt.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_versions.py
+# Throughput of core/versions.py against the package managers' own tools ('vercmp', 'dpkg --compare-versions').
+#
+# Usage (from the hel-sec-audit directory):
+#   python -m benchmarks.bench_versions                  # 20,000 synthetic versions per ordering
+#   python -m benchmarks.bench_versions --versions 5000 --tool-pairs 100
+#
+# The tools are spawned once per pair, which is what comparing through them costs; they are skipped when not
+# installed. Every pair compared through a tool is also checked against the engine and mismatches are reported.
+
+import argparse
+import random
+import shutil
+import subprocess
+
+from benchmarks.bench_parsers import bench
+from core import versions
+
+def synthetic_versions(count, scheme, seed=1):
+    """Versions shaped like real ones: epochs, pre-releases, letters, pkgrel / Debian revisions."""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        upstream = ".".join(str(rng.randint(0, 30)) for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.1:
+            upstream += rng.choice(["a", "b", "rc1", "beta2", "p1"])
+        if scheme == "debian":
+            if rng.random() < 0.1:
+                upstream += rng.choice(["~rc1", "~beta", "+dfsg", "+ds1"])
+            version = f"{upstream}-{rng.randint(1, 5)}" + rng.choice(["", "", "ubuntu1", "+deb12u1", "~bpo12+1", "+b1"])
+        else:
+            version = f"{upstream}-{rng.randint(1, 5)}"
+        if rng.random() < 0.05:
+            version = f"{rng.randint(1, 3)}:{version}"
+        result.append(version)
+    return result
+
+def tool_command(scheme):
+    if scheme == "pacman" and shutil.which("vercmp"):
+        return lambda a, b: ["vercmp", a, b]
+    if scheme == "debian" and shutil.which("dpkg"):
+        return lambda a, b: ["dpkg", "--compare-versions", a, "lt", b]
+    return None
+
+def tool_result(scheme, completed):
+    if scheme == "pacman":
+        value = int(completed.stdout.strip() or 0)
+        return (value > 0) - (value < 0)
+    # 'dpkg --compare-versions a lt b' only answers "older or not"
+    return -1 if completed.returncode == 0 else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the version comparison engine against vercmp / dpkg.")
+    parser.add_argument("--versions", type=int, default=20000)
+    parser.add_argument("--tool-pairs", type=int, default=200, help="Pairs compared by spawning the package manager's tool.")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'Comparison':<56} {'Time':>16} {'Throughput':>21}")
+    for scheme in ("pacman", "debian"):
+        pairwise = versions.SCHEMES[scheme][1]
+        key = versions.SCHEMES[scheme][0]
+        sample = synthetic_versions(args.versions, scheme)
+        pairs = list(zip(sample, reversed(sample)))
+
+        bench(f"{scheme}: pairwise port ({len(pairs)} pairs)", args.iterations,
+              lambda: [pairwise(a, b) for a, b in pairs], len(pairs), "pairs")
+
+        def batch_cold():
+            key.cache_clear()
+            return versions.compare_batch(pairs, scheme)
+        bench(f"{scheme}: compare_batch, keys built each run", args.iterations, batch_cold, len(pairs), "pairs")
+        bench(f"{scheme}: compare_batch, cached keys", args.iterations,
+              lambda: versions.compare_batch(pairs, scheme), len(pairs), "pairs")
+        bench(f"{scheme}: sort_versions ({len(sample)} versions)", args.iterations,
+              lambda: versions.sort_versions(sample, scheme), len(sample), "versions")
+        bench(f"{scheme}: versions_in_range", args.iterations,
+              lambda: versions.versions_in_range(sample, "1.0-1", "10.0-1", scheme), len(sample), "versions")
+
+        command = tool_command(scheme)
+        if command is None:
+            print(f"{scheme}: {'vercmp' if scheme == 'pacman' else 'dpkg'} not installed, tool comparison skipped")
+            continue
+        tool_pairs = pairs[:args.tool_pairs]
+        mismatches = []
+
+        def through_tool():
+            mismatches.clear()
+            for a, b in tool_pairs:
+                expected = tool_result(scheme, subprocess.run(command(a, b), capture_output=True, text=True))
+                engine = versions.compare_versions(a, b, scheme)
+                if (engine if scheme == "pacman" else min(engine, 0)) != expected:
+                    mismatches.append((a, b, engine, expected))
+        label = "vercmp" if scheme == "pacman" else "dpkg --compare-versions"
+        bench(f"{scheme}: {label} ({len(tool_pairs)} processes)", 1, through_tool, len(tool_pairs), "pairs")
+        print(f"{scheme}: {len(mismatches)} of {len(tool_pairs)} pairs disagree with {label}" + (f", e.g. {mismatches[0]}" if mismatches else ""))
+
+if __name__ == "__main__":
+    main()
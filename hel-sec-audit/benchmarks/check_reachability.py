@@ -0,0 +1,81 @@
+# benchmarks/check_reachability.py
+# Regression check of core/reachability.py against a ruleset shaped like the one firewalld writes
+# (table inet firewalld: filter_INPUT -> filter_INPUT_ZONES -> filter_IN_public -> filter_IN_public_allow).
+#
+# Usage (from the hel-sec-audit directory):
+#   python -m benchmarks.check_reachability
+#
+# Prints each listener with its expected and actual status; exits with 1 if any of them differ.
+# firewalld's "ct status dnat accept" and "ct state { new, untracked }" must not turn the ports the
+# zone's final reject blocks into "restricted" ones.
+
+import json
+import sys
+
+from core.firewall_rules import parse_nft_json
+from core.proc_net import ListeningSocket
+from core.reachability import ReachabilityAnalyzer, BLOCKED, EXPOSED, LOOPBACK, RESTRICTED
+
+def _match(left, right, op="=="):
+    return {"match": {"op": op, "left": left, "right": right}}
+
+def _ct(key, values):
+    return _match({"ct": {"key": key}}, {"set": values} if isinstance(values, list) else values, op="in")
+
+def _rule(chain, *expr):
+    return {"rule": {"family": "inet", "table": "firewalld", "chain": chain, "expr": list(expr)}}
+
+def _chain(name, hook=None):
+    chain = {"family": "inet", "table": "firewalld", "name": name}
+    if hook:
+        chain.update({"type": "filter", "hook": hook, "prio": 10, "policy": "accept"})
+    return {"chain": chain}
+
+def firewalld_nft_output():
+    """:return: 'nft -j list ruleset' of firewalld's public zone with ssh and dhcpv6-client allowed."""
+    dport = lambda protocol, port: _match({"payload": {"protocol": protocol, "field": "dport"}}, port)
+    new = _ct("state", ["new", "untracked"])
+    items = [
+        {"table": {"family": "inet", "name": "firewalld"}},
+        _chain("filter_INPUT", "input"),
+        _chain("filter_INPUT_ZONES"),
+        _chain("filter_IN_public"),
+        _chain("filter_IN_public_allow"),
+        _rule("filter_INPUT", _ct("state", ["established", "related"]), {"accept": None}),
+        _rule("filter_INPUT", _ct("status", "dnat"), {"accept": None}),
+        _rule("filter_INPUT", _match({"meta": {"key": "iifname"}}, "lo"), {"accept": None}),
+        _rule("filter_INPUT", {"jump": {"target": "filter_INPUT_ZONES"}}),
+        _rule("filter_INPUT", _ct("state", "invalid"), {"drop": None}),
+        _rule("filter_INPUT", {"reject": {"type": "icmpx", "expr": "admin-prohibited"}}),
+        _rule("filter_INPUT_ZONES", _match({"meta": {"key": "iifname"}}, "eth0"), {"goto": {"target": "filter_IN_public"}}),
+        _rule("filter_INPUT_ZONES", {"goto": {"target": "filter_IN_public"}}),
+        _rule("filter_IN_public", {"jump": {"target": "filter_IN_public_allow"}}),
+        _rule("filter_IN_public_allow", dport("tcp", 22), new, {"accept": None}),
+        _rule("filter_IN_public_allow",
+              _match({"payload": {"protocol": "ip6", "field": "daddr"}}, {"prefix": {"addr": "fe80::", "len": 64}}),
+              dport("udp", 546), new, {"accept": None}),
+    ]
+    return json.dumps({"nftables": items})
+
+# (socket, expected status)
+EXPECTED = [
+    (ListeningSocket("tcp", "0.0.0.0", 22, 0, 0, None, None), EXPOSED),
+    (ListeningSocket("tcp6", "::", 3306, 0, 0, None, None), BLOCKED),
+    (ListeningSocket("tcp", "0.0.0.0", 8080, 0, 0, None, None), BLOCKED),
+    (ListeningSocket("udp6", "::", 546, 0, 0, None, None), RESTRICTED),
+    (ListeningSocket("tcp", "127.0.0.1", 631, 0, 0, None, None), LOOPBACK),
+]
+
+def main(argv=None):
+    ruleset = parse_nft_json(firewalld_nft_output())
+    results = ReachabilityAnalyzer(ruleset).analyze([sock for sock, expected in EXPECTED])
+    failures = 0
+    for (sock, expected), result in zip(EXPECTED, results):
+        ok = result.status == expected
+        failures += not ok
+        conditions = f" ({'; '.join(result.conditions)})" if result.conditions else ""
+        print(f"{'ok  ' if ok else 'FAIL'} {sock.protocol:<5} {f'{sock.address}:{sock.port}':<16} expected {expected:<10} got {result.status}{conditions}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
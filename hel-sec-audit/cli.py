@@ -0,0 +1,199 @@
+# cli.py
+# Headless command line interface: 'hel-sec-audit scan' runs an audit without PyQt5,
+# for servers, cron jobs and fleet-wide runs; 'hel-sec-audit clamd-scan PATH...' scans files
+# for malware through the running clamd.
+#
+# Exit codes follow the worst finding, so scripts can act on them without parsing output:
+#   0 all checks secure, 1 Low, 2 Medium, 3 High, 4 Critical, 64 usage error.
+# clamd-scan exits with 4 when malware was found, 66 when none of the paths could be read and
+# 69 when clamd cannot be reached.
+# Only 'core' is imported here; keep it that way so the CLI starts fast.
+
+import argparse
+import json
+import os
+import re
+import sys
+
+EXIT_USAGE = 64
+# sysexits' EX_NOINPUT: an input file did not exist or was not readable
+EXIT_NOINPUT = 66
+# sysexits' EX_UNAVAILABLE: a service the command needs is not running
+EXIT_UNAVAILABLE = 69
+
+SEVERITY_EXIT_CODES = {
+    "Low": 1,
+    "Medium": 2,
+    "High": 3,
+    "Critical": 4
+}
+
+class _ArgumentParser(argparse.ArgumentParser):
+    # argparse exits with 2 on bad usage, which would read as "worst finding: Medium".
+    def error(self, message):
+        self.print_usage(sys.stderr)
+        self.exit(EXIT_USAGE, f"{self.prog}: error: {message}\n")
+
+def check_slug(check_name):
+    """'Weak Password Policies/Usage' -> 'weak-password-policies-usage'"""
+    return re.sub(r"[^a-z0-9]+", "-", check_name.lower()).strip("-")
+
+def build_parser():
+    parser = _ArgumentParser(prog="hel-sec-audit", description="Security audit for Linux and Windows.")
+    subparsers = parser.add_subparsers(dest="command", required=True, parser_class=_ArgumentParser)
+
+    scan_parser = subparsers.add_parser("scan", help="Run the security checks without the GUI.")
+    scan_parser.add_argument("--checks", help="Comma-separated checks to run, by name or slug (e.g. 'firewall-status,open-network-ports'). Defaults to the checks enabled in the settings.")
+    scan_parser.add_argument("--list-checks", action="store_true", help="List the available checks and exit.")
+    scan_parser.add_argument("--format", choices=["text", "json"], default="text", help="Output format (default: text).")
+    scan_parser.add_argument("--jobs", type=_positive_int, help="Number of checks to run at once (default: from the settings).")
+    scan_parser.add_argument("--timeout", type=_positive_int, help="Per-check timeout in seconds (default: from the settings).")
+    scan_parser.add_argument("--force-refresh", action="store_true", help="Ignore cached results and re-run every check.")
+    scan_parser.add_argument("--incremental", action="store_true", help="Only re-run checks whose input files changed since the last scan.")
+
+    clamd_parser = subparsers.add_parser("clamd-scan", help="Scan files and directories for malware through the running clamd.")
+    clamd_parser.add_argument("paths", nargs="+", help="Files and directories to scan.")
+    clamd_parser.add_argument("--socket", help="clamd's UNIX socket (default: LocalSocket from clamd.conf).")
+    clamd_parser.add_argument("--jobs", type=_positive_int, help="Connections to clamd, i.e. files scanned at once (default: 4).")
+    clamd_parser.add_argument("--max-file-size", type=_positive_int, help="Skip files larger than this many MiB (default: 25, clamd's StreamMaxLength).")
+    clamd_parser.add_argument("--exclude", action="append", default=[], help="Skip names or paths matching this pattern, e.g. '*.iso'. Repeatable.")
+    clamd_parser.add_argument("--cross-filesystems", action="store_true", help="Descend into other mounted filesystems.")
+    clamd_parser.add_argument("--format", choices=["text", "json"], default="text", help="Output format (default: text).")
+    clamd_parser.add_argument("--verbose", action="store_true", help="Also list clean and skipped files.")
+    return parser
+
+def _positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a number")
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+def exit_code_for(results):
+    """:return: 0 when every check is secure, otherwise the code of the worst severity among the findings."""
+    code = 0
+    for result in results:
+        if not result.get("is_secure", True):
+            # Unusual severities (e.g. "False Negative") still count as a finding.
+            code = max(code, SEVERITY_EXIT_CODES.get(result.get("severity"), 1))
+    return code
+
+def format_text(results):
+    lines = []
+    for result in results:
+        status = "SECURE" if result.get("is_secure", True) else "VULNERABLE"
+        cached = " (cached)" if result.get("cached") else ""
+        lines.append(f"[{status}]{cached} {result.get('check_name', 'N/A')}: {result.get('title', '')} (Severity: {result.get('severity', 'N/A')})")
+        lines.append(f"    {result.get('description', '')}".replace("\n", "\n    "))
+        if not result.get("is_secure", True) and result.get("solution") and result["solution"] != "N/A":
+            lines.append(f"    Solution: {result['solution']}")
+    issues_count = sum(1 for result in results if not result.get("is_secure", True))
+    lines.append("")
+    lines.append(f"Total checks performed: {len(results)}, issues found: {issues_count}")
+    return "\n".join(lines)
+
+def _resolve_check_names(parser, requested, available):
+    by_key = {}
+    for check_name in available:
+        by_key[check_name.lower()] = check_name
+        by_key[check_slug(check_name)] = check_name
+    selected = []
+    for item in requested.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        check_name = by_key.get(item.lower()) or by_key.get(check_slug(item))
+        if check_name is None:
+            parser.error(f"unknown check '{item}' (see --list-checks)")
+        if check_name not in selected:
+            selected.append(check_name)
+    if not selected:
+        parser.error("--checks needs at least one check name")
+    return selected
+
+def run_scan(parser, args):
+    # Imported here rather than at the top so 'hel-sec-audit --help' does not pay for loading the checks.
+    from core.security_scanner import SecurityScanner
+
+    scanner = SecurityScanner()
+    if args.list_checks:
+        for check_name, spec in scanner.check_specs.items():
+            print(f"{check_slug(check_name):<32} {spec.cost:<10} {spec.privileges:<5} {check_name}")
+        return 0
+
+    check_names = _resolve_check_names(parser, args.checks, list(scanner.all_checks)) if args.checks else None
+    results = scanner.run_all_checks(
+        max_workers=args.jobs,
+        check_timeout=args.timeout,
+        force_refresh=args.force_refresh,
+        incremental=args.incremental,
+        check_names=check_names
+    )
+    code = exit_code_for(results)
+
+    if args.format == "json":
+        print(json.dumps({"results": results, "exit_code": code}, indent=2))
+    else:
+        print(format_text(results))
+    return code
+
+def run_clamd_scan(parser, args):
+    from core import clamd_client
+
+    max_file_size = args.max_file_size * 1024 * 1024 if args.max_file_size else clamd_client.DEFAULT_MAX_FILE_SIZE
+    counts = {"found": 0, "clean": 0, "skipped": 0, "error": 0}
+    findings = []
+    with clamd_client.ConnectionPool(args.socket or clamd_client.socket_path(), size=args.jobs or clamd_client.DEFAULT_POOL_SIZE) as pool:
+        try:
+            # Printed as they come in: a large tree takes a while and findings should not wait for it
+            for result in clamd_client.scan_paths(args.paths, pool, max_file_size, args.exclude, cross_filesystems=args.cross_filesystems):
+                counts[result.status] += 1
+                if args.format == "json":
+                    if result.status != "clean" or args.verbose:
+                        findings.append(result._asdict())
+                elif result.status == "found":
+                    print(f"FOUND {result.path}: {result.signature}", flush=True)
+                elif result.status == "error":
+                    print(f"ERROR {result.path}: {result.detail}", file=sys.stderr, flush=True)
+                elif args.verbose:
+                    print(f"{result.status.upper()} {result.path}" + (f" ({result.detail})" if result.detail else ""), flush=True)
+        except clamd_client.ClamdError as e:
+            print(f"hel-sec-audit: {e}", file=sys.stderr)
+            return EXIT_UNAVAILABLE
+    code = SEVERITY_EXIT_CODES["Critical"] if counts["found"] else 0
+    if not code and counts["error"] and not counts["clean"]:
+        # Every path was missing or unreadable: nothing was scanned, which is not a clean result
+        code = EXIT_NOINPUT
+    if args.format == "json":
+        print(json.dumps({"results": findings, "counts": counts, "exit_code": code}, indent=2))
+    else:
+        print(f"\nScanned files: {counts['found'] + counts['clean']}, infected: {counts['found']}, skipped: {counts['skipped']}, errors: {counts['error']}")
+    return code
+
+def exit_process(code):
+    """
+    Flushes the output and ends the process with code straight away. A check abandoned after its
+    timeout (e.g. a probe stuck on a sudo prompt) may still hold a thread, and a normal interpreter
+    exit would wait for it; under cron that can be forever.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
+
+def main(argv=None):
+    """
+    :param argv: Arguments without the program name, e.g. ["scan", "--format", "json"].
+    :return: The process exit code.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "scan":
+        return run_scan(parser, args)
+    if args.command == "clamd-scan":
+        return run_clamd_scan(parser, args)
+    return EXIT_USAGE
+
+if __name__ == "__main__":
+    exit_process(main())
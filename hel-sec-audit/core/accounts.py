@@ -0,0 +1,256 @@
+# core/accounts.py
+# Native parser and auditor for /etc/passwd, /etc/shadow and /etc/group.
+# Each file is read in a single pass into an AccountTable indexed by name, UID and group, and
+# audit_accounts() reports every problem at once as structured findings, e.g.
+#   {"id": "empty_password", "severity": "Critical", "subject": "alice", "detail": "..."}
+# No process is spawned per line, so LDAP/NIS-synced files with 100k+ entries stay cheap.
+
+from core.utils import SEVERITY_ORDER
+
+PASSWD_FILE = "/etc/passwd"
+SHADOW_FILE = "/etc/shadow"
+GROUP_FILE = "/etc/group"
+LOGIN_DEFS_FILE = "/etc/login.defs"
+
+# Password hash schemes by crypt(3) prefix
+HASH_SCHEMES = {
+    "$1$": "md5",
+    "$2a$": "bcrypt", "$2b$": "bcrypt", "$2x$": "bcrypt", "$2y$": "bcrypt",
+    "$3$": "nthash",
+    "$5$": "sha256",
+    "$6$": "sha512",
+    "$7$": "scrypt",
+    "$y$": "yescrypt",
+    "$gy$": "gost-yescrypt",
+    "$sha1$": "sha1",
+}
+STRONG_HASH_SCHEMES = ("sha512", "yescrypt", "gost-yescrypt", "bcrypt", "scrypt")
+# Same 5000-round default as sha512crypt: not fast to crack, only not the preferred choice
+ACCEPTABLE_HASH_SCHEMES = ("sha256",)
+NON_INTERACTIVE_SHELLS = ("nologin", "false", "sync", "shutdown", "halt", "true")
+
+# Shadow's "never expires" sentinel and the usual ceiling for a sane maximum password age
+NEVER_EXPIRES_DAYS = 99999
+RECOMMENDED_MAX_DAYS = 365
+
+NOBODY_UID = 65534
+
+class Account:
+    __slots__ = ("name", "uid", "gid", "gecos", "home", "shell", "password_hash",
+                 "last_change", "min_days", "max_days", "warn_days", "inactive_days", "expire_date")
+
+    def __init__(self, name, uid, gid, gecos="", home="", shell=""):
+        self.name = name
+        self.uid = uid
+        self.gid = gid
+        self.gecos = gecos
+        self.home = home
+        self.shell = shell
+        # From /etc/shadow; None when the account has no shadow entry (or shadow was not read)
+        self.password_hash = None
+        self.last_change = None
+        self.min_days = None
+        self.max_days = None
+        self.warn_days = None
+        self.inactive_days = None
+        self.expire_date = None
+
+    def hash_scheme(self):
+        """:return: "empty", "locked", "des", "md5", "sha512", "yescrypt", ... or None without a shadow entry."""
+        return hash_scheme(self.password_hash)
+
+    def has_usable_password(self):
+        return self.hash_scheme() not in (None, "empty", "locked")
+
+    def has_interactive_shell(self):
+        return bool(self.shell) and self.shell.rsplit("/", 1)[-1] not in NON_INTERACTIVE_SHELLS
+
+class AccountTable:
+    def __init__(self):
+        self.accounts = []
+        self.by_name = {}     # name -> Account
+        self.by_uid = {}      # uid -> [Account]
+        self.groups = {}      # group name -> (gid, [member names])
+        self.gids = {}        # gid -> group name
+        self.memberships = {} # account name -> {group name}, supplementary groups only
+
+    def add_account(self, account):
+        if account.name in self.by_name:
+            # The first entry wins, as it does for getpwnam()
+            return
+        self.accounts.append(account)
+        self.by_name[account.name] = account
+        self.by_uid.setdefault(account.uid, []).append(account)
+
+    def add_group(self, name, gid, members):
+        if name in self.groups:
+            return
+        self.groups[name] = (gid, members)
+        self.gids.setdefault(gid, name)
+        for member in members:
+            self.memberships.setdefault(member, set()).add(name)
+
+    def groups_of(self, name):
+        """:return: Names of the account's primary and supplementary groups."""
+        groups = set(self.memberships.get(name, ()))
+        account = self.by_name.get(name)
+        if account and account.gid in self.gids:
+            groups.add(self.gids[account.gid])
+        return groups
+
+def hash_scheme(password_hash):
+    if password_hash is None:
+        return None
+    if password_hash == "":
+        return "empty"
+    if password_hash[0] in "!*":
+        # "!" / "*" / "!!" / "!$6$..." (passwd -l keeps the old hash behind a "!")
+        return "locked"
+    if password_hash[0] == "$":
+        # "$id$..." -> look the "$id$" part up directly
+        end = password_hash.find("$", 1)
+        scheme = HASH_SCHEMES.get(password_hash[:end + 1]) if end > 0 else None
+        if scheme is None and password_hash.startswith("$md5"):
+            scheme = "sun-md5"
+        return scheme or "unknown"
+    if password_hash.startswith("_") and len(password_hash) == 20:
+        return "bsdi"
+    if len(password_hash) == 13:
+        return "des"
+    return "unknown"
+
+def _int_or_none(value):
+    return int(value) if value.isdigit() else None
+
+def parse_passwd(text, table):
+    for line in text.splitlines():
+        # Skip comments, blank lines and NIS "+"/"-" compat entries
+        if not line or line[0] in "#+-":
+            continue
+        fields = line.split(":")
+        if len(fields) < 7 or not fields[2].isdigit() or not fields[3].isdigit():
+            continue
+        table.add_account(Account(fields[0], int(fields[2]), int(fields[3]), fields[4], fields[5], fields[6]))
+
+def parse_shadow(text, table):
+    for line in text.splitlines():
+        if not line or line[0] in "#+-":
+            continue
+        fields = line.split(":")
+        account = table.by_name.get(fields[0])
+        if account is None or len(fields) < 2:
+            continue
+        fields += [""] * (9 - len(fields))
+        account.password_hash = fields[1]
+        account.last_change = _int_or_none(fields[2])
+        account.min_days = _int_or_none(fields[3])
+        account.max_days = _int_or_none(fields[4])
+        account.warn_days = _int_or_none(fields[5])
+        account.inactive_days = _int_or_none(fields[6])
+        account.expire_date = _int_or_none(fields[7])
+
+def parse_group(text, table):
+    for line in text.splitlines():
+        if not line or line[0] in "#+-":
+            continue
+        fields = line.split(":")
+        if len(fields) < 4 or not fields[2].isdigit():
+            continue
+        table.add_group(fields[0], int(fields[2]), [member for member in fields[3].split(",") if member])
+
+def read_login_defs(path=LOGIN_DEFS_FILE):
+    """:return: {key: value} from login.defs ("PASS_MAX_DAYS": "99999", ...); empty if the file is missing."""
+    values = {}
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and not parts[0].startswith("#"):
+                    values[parts[0]] = parts[1]
+    except FileNotFoundError:
+        pass
+    return values
+
+def load_accounts(passwd_text, group_text="", shadow_text=None):
+    """
+    :param shadow_text: Contents of /etc/shadow, or None if it could not be read (hash and aging checks are skipped).
+    :return: AccountTable
+    """
+    table = AccountTable()
+    parse_passwd(passwd_text, table)
+    parse_group(group_text, table)
+    if shadow_text is not None:
+        parse_shadow(shadow_text, table)
+    return table
+
+def _finding(finding_id, severity, subject, detail):
+    return {"id": finding_id, "severity": severity, "subject": subject, "detail": detail}
+
+def _policy_days(login_defs, key):
+    value = login_defs.get(key, "")
+    return int(value) if value.lstrip("-").isdigit() else None
+
+def audit_accounts(table, login_defs=None, shadow_read=True):
+    """
+    :param login_defs: Values from read_login_defs(); UID_MIN and the PASS_* aging policy come from there.
+    :param shadow_read: False when /etc/shadow was unavailable, so missing hashes are not reported per account.
+    :return: List of findings, most severe first.
+    """
+    login_defs = login_defs or {}
+    uid_min = _policy_days(login_defs, "UID_MIN") or 1000
+    policy_max_days = _policy_days(login_defs, "PASS_MAX_DAYS")
+    policy_min_days = _policy_days(login_defs, "PASS_MIN_DAYS")
+    policy_warn_days = _policy_days(login_defs, "PASS_WARN_AGE")
+    findings = []
+
+    # Aging policy for new accounts
+    if policy_max_days is not None and (policy_max_days < 0 or policy_max_days >= NEVER_EXPIRES_DAYS):
+        findings.append(_finding("policy_max_days", "Medium", LOGIN_DEFS_FILE,
+                                 f"PASS_MAX_DAYS is {policy_max_days}, so passwords of new accounts never have to be changed. Recommended {RECOMMENDED_MAX_DAYS} or less."))
+    elif policy_max_days is not None and policy_max_days > RECOMMENDED_MAX_DAYS:
+        findings.append(_finding("policy_max_days", "Low", LOGIN_DEFS_FILE,
+                                 f"PASS_MAX_DAYS is {policy_max_days}, which exceeds the recommended {RECOMMENDED_MAX_DAYS} days."))
+
+    superusers = [account.name for account in table.by_uid.get(0, [])]
+    if len(superusers) > 1:
+        for name in superusers:
+            if name != "root":
+                findings.append(_finding("duplicate_uid0", "Critical", name, f"Account '{name}' has UID 0 and therefore full root privileges ({', '.join(superusers)} share UID 0)."))
+
+    for account in table.accounts:
+        scheme = account.hash_scheme()
+        # nobody (65534) sits above UID_MIN but is a system account all the same
+        is_system = 0 < account.uid < uid_min or account.uid == NOBODY_UID
+
+        if scheme == "empty":
+            findings.append(_finding("empty_password", "Critical", account.name, f"Account '{account.name}' has an empty password and can log in without one."))
+        elif scheme in ACCEPTABLE_HASH_SCHEMES:
+            findings.append(_finding("weak_hash", "Low", account.name, f"Password of '{account.name}' is hashed with {scheme.upper()}; prefer yescrypt or SHA-512 when it is next changed."))
+        elif scheme is not None and scheme not in ("locked",) and scheme not in STRONG_HASH_SCHEMES:
+            findings.append(_finding("weak_hash", "High", account.name, f"Password of '{account.name}' is hashed with {scheme.upper()}, which is fast to crack. Reset it so it is stored as SHA-512 or yescrypt."))
+
+        if is_system:
+            if account.has_usable_password():
+                findings.append(_finding("unlocked_system_account", "High", account.name, f"System account '{account.name}' (UID {account.uid}) has a usable password; lock it with 'passwd -l {account.name}'."))
+            if account.has_interactive_shell():
+                findings.append(_finding("system_account_shell", "Medium", account.name, f"System account '{account.name}' (UID {account.uid}) has the interactive shell {account.shell}; use /usr/sbin/nologin."))
+            continue
+
+        # Aging policy for accounts people log in with
+        if not account.has_usable_password() or account.last_change == 0:
+            continue
+        if account.max_days is None or account.max_days >= NEVER_EXPIRES_DAYS:
+            if policy_max_days is not None and 0 <= policy_max_days < NEVER_EXPIRES_DAYS:
+                findings.append(_finding("password_never_expires", "Medium", account.name, f"Password of '{account.name}' never expires, although PASS_MAX_DAYS is {policy_max_days}."))
+        elif policy_max_days is not None and 0 <= policy_max_days < account.max_days:
+            findings.append(_finding("max_days_exceeds_policy", "Low", account.name, f"Password of '{account.name}' may be kept {account.max_days} days, more than PASS_MAX_DAYS ({policy_max_days})."))
+        if policy_min_days is not None and account.min_days is not None and account.min_days < policy_min_days:
+            findings.append(_finding("min_days_below_policy", "Low", account.name, f"Password of '{account.name}' can be changed again after {account.min_days} days, less than PASS_MIN_DAYS ({policy_min_days})."))
+        if policy_warn_days is not None and account.warn_days is not None and account.warn_days < policy_warn_days:
+            findings.append(_finding("warn_days_below_policy", "Low", account.name, f"'{account.name}' is warned {account.warn_days} days before the password expires, less than PASS_WARN_AGE ({policy_warn_days})."))
+
+    if not shadow_read:
+        findings.append(_finding("shadow_unreadable", "Medium", SHADOW_FILE, "/etc/shadow could not be read, so password hashes and aging were not audited. Run the scan as root."))
+
+    findings.sort(key=lambda finding: -SEVERITY_ORDER[finding["severity"]])
+    return findings
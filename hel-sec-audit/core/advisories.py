@@ -0,0 +1,294 @@
+# core/advisories.py
+# Matches installed packages against a local dump of security advisories, without network access.
+#
+# Two dump formats are read:
+#   - the Arch Linux security tracker's JSON (https://security.archlinux.org/all.json): AVG groups
+#     with their "packages", "status", "severity", "fixed" version and CVE "issues";
+#   - OSV records (https://osv.dev): a JSON array or object, a directory of them, or an ecosystem's
+#     all.zip export, e.g. https://osv-vulnerabilities.storage.googleapis.com/Debian/all.zip.
+# Fetching the dump is left to the user (or cron); the scan only reads it.
+#
+# The dump is turned into an interval index: for every package, its affected ranges sorted by the
+# version key of their upper bound, stored as bytes (versions.version_key_bytes()) so the cached index
+# loads like plain strings. An installed version is looked up with a bisect to the first range ending
+# at or after it, so only the ranges from there on are compared.
+# The index is stored on disk (~/.config/hel-sec-audit/advisories.cache) and rebuilt only when
+# the dump's mtime or size changes.
+
+import json
+import marshal
+import mmap
+import os
+import sys
+import zipfile
+from bisect import bisect_left
+from collections import namedtuple
+from pathlib import Path
+
+from core import versions
+
+OS_RELEASE = "/etc/os-release"
+CACHE_FILENAME = "advisories.cache"
+# Bumped whenever the cached layout changes
+CACHE_FORMAT = 1
+
+# Most severe first; advisories without one are "Unknown"
+SEVERITIES = ("Critical", "High", "Medium", "Low")
+PACKAGE_MANAGER_SCHEMES = {"pacman": "pacman", "apt": "debian"}
+# OSV ecosystems ("Debian:12", "Ubuntu:22.04:LTS") whose versions sort like dpkg's
+OSV_SCHEMES = {"Debian": "debian", "Ubuntu": "debian"}
+OS_RELEASE_ECOSYSTEMS = {"debian": "Debian", "ubuntu": "Ubuntu"}
+
+# Sorts after every version key (whose first byte is the length of the epoch): the upper bound of a range no version has fixed yet
+_UNBOUNDED = b"\xff"
+# Sorts before every version key: a range affecting all versions up to its upper bound
+_FROM_START = b""
+
+Advisory = namedtuple("Advisory", ["id", "aliases", "severity", "summary"])
+# aliases: CVE and other IDs of the same issue; severity: one of SEVERITIES or "Unknown"
+Vulnerability = namedtuple("Vulnerability", ["package", "version", "advisory", "fixed"])
+# package: key of the installed package; fixed: the version that fixes it, None when no fix is released
+AdvisoryIndex = namedtuple("AdvisoryIndex", ["scheme", "advisories", "packages"])
+# advisories: [advisory tuple]; packages: {name: (upper keys, ranges sorted by them, ranges without keys)}
+# A range is (introduced, introduced key, fixed, last affected, upper key, advisory number).
+
+class AdvisoryDumpError(Exception):
+    pass
+
+def _severity(value):
+    value = (value or "").strip().capitalize()
+    return value if value in SEVERITIES else "Unknown"
+
+def _read_records(path):
+    """:return: The JSON documents of a dump: the array's items, the object itself, or every .json of a zip / directory."""
+    try:
+        if os.path.isdir(path):
+            records = []
+            for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+                if entry.name.endswith(".json"):
+                    with open(entry.path, "rb") as f:
+                        records.append(json.load(f))
+            return records
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                return [json.loads(archive.read(name)) for name in archive.namelist() if name.endswith(".json")]
+        with open(path, "rb") as f:
+            data = json.load(f)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise AdvisoryDumpError(f"{path}: {e}")
+    return data if isinstance(data, list) else [data]
+
+def _is_arch_tracker(records):
+    return bool(records) and isinstance(records[0], dict) and "packages" in records[0] and "issues" in records[0]
+
+def _arch_ranges(groups):
+    """:return: ([advisory tuple], [(package, introduced, fixed, last affected, advisory number)]) from tracker AVGs."""
+    advisories, ranges = [], []
+    for group in groups:
+        if not isinstance(group, dict) or group.get("status") == "Not affected":
+            continue
+        number = len(advisories)
+        advisories.append((group.get("name") or "", tuple(group.get("issues") or ()), _severity(group.get("severity")), group.get("type") or ""))
+        for package in group.get("packages") or ():
+            # As arch-audit does: every version before the fix is affected; "affected" only names the version it was reported against
+            ranges.append((package, None, group.get("fixed") or None, None, number))
+    return advisories, ranges
+
+def _osv_severity(record):
+    # GHSA-style "database_specific", or Ubuntu's own priority next to the CVSS vectors
+    severity = _severity((record.get("database_specific") or {}).get("severity"))
+    for entry in record.get("severity") or ():
+        if severity == "Unknown" and entry.get("type") == "Ubuntu":
+            severity = _severity(entry.get("score"))
+    return severity
+
+def _osv_ranges(records, scheme, ecosystem=None):
+    """
+    :param ecosystem: Only entries of this ecosystem or its sub-ecosystems, e.g. "Debian:12" or "Ubuntu:22.04".
+    :return: ([advisory tuple], [(package, introduced, fixed, last affected, advisory number)]) from OSV records.
+    """
+    advisories, ranges = [], []
+    for record in records:
+        if not isinstance(record, dict) or record.get("withdrawn"):
+            continue
+        number = None
+        for affected in record.get("affected") or ():
+            package = affected.get("package") or {}
+            package_ecosystem = package.get("ecosystem") or ""
+            if OSV_SCHEMES.get(package_ecosystem.split(":", 1)[0]) != scheme:
+                continue
+            if ecosystem and package_ecosystem != ecosystem and not package_ecosystem.startswith(ecosystem + ":"):
+                continue
+            if number is None:
+                number = len(advisories)
+                aliases = dict.fromkeys(list(record.get("aliases") or ()) + list(record.get("upstream") or ()))
+                advisories.append((record.get("id") or "", tuple(aliases), _osv_severity(record), record.get("summary") or ""))
+            name = package.get("name") or ""
+            has_ranges = False
+            for entry in affected.get("ranges") or ():
+                if entry.get("type") not in ("ECOSYSTEM", "SEMVER"):
+                    continue # GIT ranges are commit hashes
+                has_ranges = True
+                introduced = None
+                opened = False
+                for event in entry.get("events") or ():
+                    if "introduced" in event:
+                        introduced = None if event["introduced"] == "0" else event["introduced"]
+                        opened = True
+                    elif opened and ("fixed" in event or "limit" in event or "last_affected" in event):
+                        ranges.append((name, introduced, event.get("fixed") or event.get("limit"), event.get("last_affected"), number))
+                        opened = False
+                if opened:
+                    ranges.append((name, introduced, None, None, number))
+            if not has_ranges:
+                for version in affected.get("versions") or ():
+                    ranges.append((name, version, None, version, number))
+    return advisories, ranges
+
+def _sort_key(version, scheme):
+    # None for the versions only the pairwise comparison orders, including pacman versions without
+    # a pkgrel, which compare on a prefix of the key (see versions._compare)
+    key = versions.version_key(version, scheme)
+    if key is None or (scheme == "pacman" and len(key) == 2):
+        return None
+    return versions.version_key_bytes(version, scheme)
+
+def build_index(scheme, advisories, ranges):
+    """:return: AdvisoryIndex of the ranges from _arch_ranges() / _osv_ranges(), as plain tuples and lists that marshal can store."""
+    grouped = {}
+    for name, introduced, fixed, last_affected, number in ranges:
+        upper = fixed if fixed is not None else last_affected
+        introduced_key = _sort_key(introduced, scheme) if introduced is not None else _FROM_START
+        upper_key = _sort_key(upper, scheme) if upper is not None else _UNBOUNDED
+        sortable, irregular = grouped.setdefault(name, ([], []))
+        entry = (introduced, introduced_key, fixed, last_affected, upper_key, number)
+        if introduced_key is not None and upper_key is not None:
+            sortable.append(entry)
+        else:
+            irregular.append(entry)
+    packages = {}
+    for name, (sortable, irregular) in grouped.items():
+        sortable.sort(key=lambda entry: entry[4])
+        packages[name] = ([entry[4] for entry in sortable], sortable, irregular)
+    return AdvisoryIndex(scheme, advisories, packages)
+
+def read_dump(path, scheme, ecosystem=None):
+    """
+    Builds the index of a dump, without the on-disk cache.
+    :param scheme: "pacman" or "debian", the ordering of the installed versions it will be matched against.
+    :return: AdvisoryIndex
+    :raises OSError: If the dump cannot be read.
+    :raises AdvisoryDumpError: If it is not JSON, or the Arch tracker's dump is used for Debian versions.
+    """
+    records = _read_records(path)
+    if _is_arch_tracker(records):
+        if scheme != "pacman":
+            raise AdvisoryDumpError(f"{path}: the Arch Linux security tracker's advisories do not apply to {scheme} packages")
+        advisories, ranges = _arch_ranges(records)
+    else:
+        advisories, ranges = _osv_ranges(records, scheme, ecosystem)
+    return build_index(scheme, advisories, ranges)
+
+def _default_cache_path():
+    return Path.home() / ".config" / "hel-sec-audit" / CACHE_FILENAME
+
+def _dump_key(path, scheme, ecosystem):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, scheme, ecosystem or "")
+
+def _load_cache(cache_path, key):
+    try:
+        with open(cache_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            stored = marshal.loads(mapped)
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if not isinstance(stored, tuple) or len(stored) != 4 or stored[0] != CACHE_FORMAT or stored[1] != key:
+        return None
+    return AdvisoryIndex(key[3], stored[2], stored[3])
+
+def _save_cache(cache_path, key, index):
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = cache_path.with_suffix(".tmp")
+        with open(temporary, "wb") as f:
+            marshal.dump((CACHE_FORMAT, key, index.advisories, index.packages), f)
+        os.replace(temporary, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write advisory index cache '{cache_path}': {e}", file=sys.stderr)
+
+def load_index(path, scheme, ecosystem=None, cache_path=None):
+    """
+    The advisory index of a dump, from the on-disk cache when the dump has not changed since it was written.
+    :param cache_path: Where to keep the index; None for ~/.config/hel-sec-audit/advisories.cache, False to disable.
+    :return: AdvisoryIndex
+    :raises OSError: If the dump cannot be read.
+    :raises AdvisoryDumpError: See read_dump().
+    """
+    key = _dump_key(path, scheme, ecosystem)
+    if cache_path is not False:
+        cache_path = Path(cache_path) if cache_path else _default_cache_path()
+        index = _load_cache(cache_path, key)
+        if index is not None:
+            return index
+    index = read_dump(path, scheme, ecosystem)
+    if cache_path is not False:
+        _save_cache(cache_path, key, index)
+    return index
+
+def _affected(entry, version, scheme):
+    """Yields (fixed, advisory number) of every range of one package that contains the version."""
+    upper_keys, sortable, irregular = entry
+    key = _sort_key(version, scheme)
+    if key is not None:
+        for introduced, introduced_key, fixed, last_affected, upper_key, number in sortable[bisect_left(upper_keys, key):]:
+            # Ranges from the bisect end at or after the version; "fixed" bounds are exclusive
+            if introduced_key <= key and (fixed is None or upper_key > key):
+                yield fixed, number
+    else:
+        irregular = sortable + irregular
+    for introduced, introduced_key, fixed, last_affected, upper_key, number in irregular:
+        if versions.in_range(version, introduced, fixed, scheme) and (last_affected is None or versions.compare_versions(version, last_affected, scheme) <= 0):
+            yield fixed, number
+
+def match_installed(index, installed):
+    """
+    :param installed: {key: InstalledPackage} from pacman_db or dpkg_db; Debian packages are matched by their source package.
+    :return: [Vulnerability] ordered by package key, one per package and advisory.
+    """
+    found = []
+    for key in sorted(installed):
+        package = installed[key]
+        name = getattr(package, "source", None) or package.name
+        entry = index.packages.get(name)
+        if entry is None:
+            continue
+        seen = set()
+        for fixed, number in _affected(entry, getattr(package, "source_version", None) or package.version, index.scheme):
+            if number not in seen:
+                seen.add(number)
+                found.append(Vulnerability(key, package.version, Advisory(*index.advisories[number]), fixed))
+    return found
+
+def highest_severity(vulnerabilities):
+    """:return: The most severe of SEVERITIES among the vulnerabilities, or None if none has a known severity."""
+    present = {vulnerability.advisory.severity for vulnerability in vulnerabilities}
+    return next((severity for severity in SEVERITIES if severity in present), None)
+
+def os_release_ecosystem(path=OS_RELEASE):
+    """
+    :return: The OSV ecosystem of the running distribution ("Debian:12", "Ubuntu:22.04"); only the family
+             ("Debian") when the release is unknown (testing, sid), None for anything else.
+    """
+    fields = {}
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                key, sep, value = line.strip().partition("=")
+                if sep:
+                    fields[key] = value.strip("\"'")
+    except OSError:
+        return None
+    family = OS_RELEASE_ECOSYSTEMS.get(fields.get("ID", ""))
+    if family is None:
+        return None
+    return f"{family}:{fields['VERSION_ID']}" if fields.get("VERSION_ID") else family
@@ -0,0 +1,127 @@
+# core/async_utils.py
+# asyncio counterpart of core.utils.run_command, for multiplexing many short probes on one event loop.
+#
+# asyncio itself is imported inside the functions: it takes longer to import than the rest of the
+# scanner put together, and the synchronous scan used by the GUI and the CLI never needs it.
+
+import contextvars
+import os
+import signal
+import time
+import weakref
+
+from core.utils import is_linux, is_windows
+from core.instrumentation import record_command
+from core.executors import get_executor
+
+# Default cap on child processes running at the same time across the whole event loop.
+DEFAULT_MAX_CONCURRENCY = 16
+
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+# One semaphore per event loop: asyncio primitives cannot be shared between loops.
+_semaphores = weakref.WeakKeyDictionary()
+
+def set_max_concurrency(limit):
+    """
+    Sets the global cap on concurrently running child processes.
+    Only affects event loops that have not spawned a command yet.
+    """
+    global _max_concurrency
+    _max_concurrency = max(1, int(limit))
+    _semaphores.clear()
+
+def _get_semaphore():
+    import asyncio
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_max_concurrency)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+def _kill_process_group(process):
+    # The child runs in its own session, so killing the group also reaps anything it forked.
+    if not is_windows():
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+        except (ProcessLookupError, PermissionError):
+            pass
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+async def run_command_async(command, sudo_required=False, timeout=None):
+    """
+    Runs a command without blocking the event loop and captures its output and return code.
+    :param command: A list of strings representing the command and its arguments.
+    :param sudo_required: If True, prepends 'sudo' to the command on Linux.
+    :param timeout: Seconds to wait before the command's process group is killed; None waits forever.
+    :return: Tuple of (stdout, stderr, return_code), the same shape as core.utils.run_command.
+    """
+    import asyncio
+
+    if sudo_required and is_linux():
+        command = ["sudo"] + command
+
+    executor = get_executor()
+    if not executor.spawns:
+        # Replayed output is served straight from memory.
+        return executor.run(command)
+
+    async with _get_semaphore():
+        started = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=not is_windows()
+            )
+        except FileNotFoundError:
+            return "", f"Error: Command '{command[0]}' not found.", 127
+        except Exception as e:
+            return "", f"An error occurred while running command: {e}", 1
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            _kill_process_group(process)
+            await process.wait()
+            record_command(command, time.perf_counter() - started, None, 0, 124)
+            return "", f"Error: Command '{command[0]}' timed out after {timeout} seconds.", 124
+        except asyncio.CancelledError:
+            _kill_process_group(process)
+            raise
+
+        # asyncio's child watcher reaps the process, so its CPU time is not available here.
+        record_command(command, time.perf_counter() - started, None, len(stdout) + len(stderr), process.returncode)
+        result = (
+            stdout.decode("utf-8", errors="ignore"),
+            stderr.decode("utf-8", errors="ignore"),
+            process.returncode
+        )
+        executor.record(command, result)
+        return result
+
+async def run_commands_async(commands, timeout=None):
+    """
+    Runs several commands concurrently (bounded by the global semaphore).
+    :param commands: List of command lists.
+    :return: List of (stdout, stderr, return_code) tuples in the same order as commands.
+    """
+    return await gather(*(run_command_async(command, timeout=timeout) for command in commands))
+
+async def gather(*awaitables):
+    """asyncio.gather for checks, so check modules do not import asyncio at load time."""
+    import asyncio
+    return await asyncio.gather(*awaitables)
+
+async def run_in_thread(func, *args):
+    """Runs a blocking callable (e.g. a check that only reads files) on the default thread pool."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    # Carry context variables (e.g. the input recorder of core/fingerprints.py) over to the worker thread.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, context.run, func, *args)
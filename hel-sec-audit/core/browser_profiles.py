@@ -0,0 +1,159 @@
+# core/browser_profiles.py
+# Finds every browser profile of every user, so each one can be audited instead of only the first
+# ".default" Firefox profile and Chrome's "Default" profile of whoever runs the scan.
+#
+# Firefox lists its profiles in profiles.ini ([Profile0] Name=..., Path=..., IsRelative=1);
+# Chromium-family browsers list theirs in the "Local State" JSON, under profile.info_cache
+# ("Default", "Profile 1", ...). Both indexes are read for each home directory under /home:
+#
+#   profiles = discover_profiles(user_homes())
+#   for profile, finding in evaluate_profiles(profiles, audit_one_profile):
+#       ...
+#
+# Homes and profiles are handled on a thread pool: the work is mostly small file reads, and on a
+# shared workstation with hundreds of users they add up.
+
+import configparser
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+HOME_ROOT = "/home"
+FIREFOX_DIR = ".mozilla/firefox"
+# (browser, config directory relative to the home); all of them keep the same Local State / Preferences layout
+CHROMIUM_BROWSERS = (
+    ("Google Chrome", ".config/google-chrome"),
+    ("Chromium", ".config/chromium"),
+    ("Brave", ".config/BraveSoftware/Brave-Browser"),
+    ("Microsoft Edge", ".config/microsoft-edge"),
+    ("Vivaldi", ".config/vivaldi"),
+)
+DEFAULT_MAX_WORKERS = 16
+
+BrowserProfile = namedtuple("BrowserProfile", ["browser", "family", "user", "name", "path", "prefs_path"])
+# family: "firefox" or "chromium"; prefs_path: the profile's prefs.js or Preferences file
+
+def user_homes(home_root=HOME_ROOT):
+    """:return: [(user, home)] for every directory under home_root, plus the home of whoever runs the scan."""
+    homes = []
+    try:
+        with os.scandir(home_root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    homes.append((entry.name, entry.path))
+    except OSError:
+        pass
+    own_home = os.path.expanduser("~")
+    if os.path.isdir(own_home) and all(os.path.realpath(own_home) != os.path.realpath(home) for user, home in homes):
+        homes.append((os.path.basename(own_home) or own_home, own_home))
+    return sorted(homes)
+
+def index_paths(homes):
+    """:return: The profiles.ini and Local State files discovery reads for these homes, whether they exist or not."""
+    paths = []
+    for user, home in homes:
+        paths.append(os.path.join(home, FIREFOX_DIR, "profiles.ini"))
+        paths.extend(os.path.join(home, directory, "Local State") for browser, directory in CHROMIUM_BROWSERS)
+    return paths
+
+def parse_profiles_ini(text, root):
+    """
+    :param root: The directory holding profiles.ini; relative profile paths are resolved against it.
+    :return: [(name, path)] of the [Profile*] sections, in file order.
+    """
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    try:
+        parser.read_string(text)
+    except configparser.Error:
+        return []
+    profiles = []
+    for section in parser.sections():
+        if not section.startswith("Profile") or not parser.get(section, "Path", fallback=""):
+            continue
+        path = parser.get(section, "Path")
+        if parser.get(section, "IsRelative", fallback="1").strip() != "0":
+            path = os.path.join(root, path)
+        profiles.append((parser.get(section, "Name", fallback=os.path.basename(path)), os.path.normpath(path)))
+    return profiles
+
+def parse_local_state(text):
+    """:return: [(display name, profile directory name)] from a Chromium "Local State" file."""
+    try:
+        info_cache = json.loads(text).get("profile", {}).get("info_cache", {})
+    except (ValueError, AttributeError):
+        return []
+    if not isinstance(info_cache, dict):
+        return []
+    profiles = []
+    for directory, info in sorted(info_cache.items()):
+        name = info.get("name") if isinstance(info, dict) else None
+        profiles.append((name or directory, directory))
+    return profiles
+
+def _read_text(path):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def firefox_profiles(user, home):
+    """:return: [BrowserProfile] listed in the user's profiles.ini; without one, the directories holding a prefs.js."""
+    root = os.path.join(home, FIREFOX_DIR)
+    text = _read_text(os.path.join(root, "profiles.ini"))
+    if text is not None:
+        entries = parse_profiles_ini(text, root)
+    else:
+        try:
+            with os.scandir(root) as scanned:
+                entries = [(entry.name, entry.path) for entry in scanned
+                           if entry.is_dir(follow_symlinks=False) and os.path.isfile(os.path.join(entry.path, "prefs.js"))]
+        except OSError:
+            return []
+    return [BrowserProfile("Firefox", "firefox", user, name, path, os.path.join(path, "prefs.js")) for name, path in entries]
+
+def chromium_profiles(user, home):
+    """:return: [BrowserProfile] of every Chromium-family browser the user has run, from each one's Local State."""
+    profiles = []
+    for browser, directory in CHROMIUM_BROWSERS:
+        root = os.path.join(home, directory)
+        text = _read_text(os.path.join(root, "Local State"))
+        if text is None:
+            continue
+        entries = parse_local_state(text)
+        if not entries and os.path.isfile(os.path.join(root, "Default", "Preferences")):
+            # Local State is rewritten on exit; a browser killed on its first run may not have listed "Default" yet
+            entries = [("Default", "Default")]
+        for name, profile_dir in entries:
+            path = os.path.join(root, profile_dir)
+            profiles.append(BrowserProfile(browser, "chromium", user, name, path, os.path.join(path, "Preferences")))
+    return profiles
+
+def _home_profiles(home):
+    user, path = home
+    return firefox_profiles(user, path) + chromium_profiles(user, path)
+
+def discover_profiles(homes, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    :param homes: [(user, home)], e.g. from user_homes(). Homes that cannot be read are skipped.
+    :return: [BrowserProfile] of every user, sorted by user, browser and profile name.
+    """
+    profiles = []
+    for found in _map(_home_profiles, homes, max_workers):
+        profiles.extend(found)
+    return sorted(profiles, key=lambda profile: (profile.user, profile.browser, profile.name, profile.path))
+
+def evaluate_profiles(profiles, evaluate, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Runs evaluate(profile) for every profile on a thread pool.
+    :return: [(profile, evaluate(profile))] in the order of profiles.
+    """
+    return list(zip(profiles, _map(evaluate, profiles, max_workers)))
+
+def _map(func, items, max_workers):
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items)), thread_name_prefix="hel-sec-browser") as executor:
+        return list(executor.map(func, items))
@@ -1,64 +1,119 @@
 # core/checks/antivirus_status.py
 
 from core.utils import run_command, is_linux, is_windows
-import datetime
+from core.async_utils import run_command_async, gather
+from core.facts import FactProvider
+from core.fingerprints import record_input, mark_volatile
+from core.config_manager import ConfigManager
+from core import clamav_db
+
+# Read by core/registry.py without importing this module
+CHECK_INFO = {
+    "name": "Antivirus Status",
+    "class": "AntivirusStatusCheck",
+    "os": ["linux", "windows"],
+    "cost": "expensive",
+    "privileges": "user",
+    "order": 50
+}
+
+WHICH_CLAMSCAN_COMMAND = ["which", "clamscan"]
+# Where 'which clamscan' usually finds it; recorded so an install is noticed by an incremental rescan.
+CLAMSCAN_PATHS = ["/usr/bin/clamscan", "/usr/local/bin/clamscan"]
+# Signatures built longer ago than this (see "antivirus_settings" in the config) are reported as outdated.
+DEFAULT_MAX_SIGNATURE_AGE_DAYS = 7
+WINDOWS_ANTIVIRUS_COMMAND = [
+    "powershell.exe",
+    "-Command",
+    "Get-CimInstance -Namespace root/SecurityCenter2 -ClassName AntiVirusProduct | Select-Object displayName, productState, pathToSignedProductExe"
+]
 
 class AntivirusStatusCheck:
     def __init__(self):
-        self.check_name = "Antivirus Status"
+        self.check_name = CHECK_INFO["name"]
         self.description = "Verifies if your antivirus software is active and up to date."
         self.solution = "Ensure your antivirus software is enabled, its definitions are updated regularly, and periodic scans are scheduled. If you don't have one, consider installing a reputable antivirus solution."
         self.severity = "High"
+        self.required_facts = ["unit_state[clamav-daemon]"]
+        self.cache_inputs = ["/var/lib/clamav"]
+        self.max_signature_age_days = ConfigManager().get_antivirus_settings().get("max_signature_age_days", DEFAULT_MAX_SIGNATURE_AGE_DAYS)
 
-    def run_check(self):
+    def run_check(self, facts=None):
         if is_linux():
-            return self._check_linux_antivirus()
+            return self._check_linux_antivirus(facts or FactProvider())
         elif is_windows():
             return self._check_windows_antivirus()
         else:
             return self._create_result(False, "Unsupported OS", "The current operating system is not supported for this check.", "N/A", "Medium")
 
-    def _check_linux_antivirus(self):
+    async def run_check_async(self, facts=None):
+        if is_linux():
+            # 'which' and the daemon state are independent, so they share one round trip.
+            facts = facts or FactProvider()
+            which_probe, _ = await gather(run_command_async(WHICH_CLAMSCAN_COMMAND), facts.resolve_async(self.required_facts))
+            result = self._evaluate_clamav_presence(which_probe, facts.get("unit_state[clamav-daemon]"))
+            if result:
+                return result
+            # A few header reads, not worth a worker thread
+            return self._evaluate_signature_databases()
+        elif is_windows():
+            stdout, stderr, return_code = await run_command_async(WINDOWS_ANTIVIRUS_COMMAND)
+            return self._evaluate_windows_antivirus(stdout, return_code)
+        else:
+            return self.run_check(facts)
+
+    def _check_linux_antivirus(self, facts):
         # We'll primarily check for ClamAV, a common open-source antivirus on Linux.
-        
-        stdout, stderr, return_code = run_command(["which", "clamscan"])
+        result = self._evaluate_clamav_presence(run_command(WHICH_CLAMSCAN_COMMAND), facts.get("unit_state[clamav-daemon]"))
+        if result:
+            return result
+        return self._evaluate_signature_databases()
+
+    def _evaluate_clamav_presence(self, which_probe, daemon_state):
+        # Returns a final result when ClamAV is missing or its daemon is down, None when definitions still need checking.
+        stdout, stderr, return_code = which_probe
         if return_code != 0:
+            for path in CLAMSCAN_PATHS:
+                record_input(path)
             return self._create_result(False, "ClamAV Not Found", "ClamAV (a common Linux antivirus) does not appear to be installed.", "Consider installing ClamAV: 'sudo apt install clamav' or 'sudo pacman -S clamav'", "Medium")
 
-        stdout_daemon, stderr_daemon, return_code_daemon = run_command(["sudo", "systemctl", "is-active", "clamav-daemon"])
-        if return_code_daemon == 0 and "active" in stdout_daemon:
-            stdout_freshclam, stderr_freshclam, return_code_freshclam = run_command(["sudo", "freshclam", "--stdout", "--verbose"])
-            
-            if return_code_freshclam == 0 and "ClamAV databases are up to date." in stdout_freshclam:
-                return self._create_result(True, "ClamAV Active and Up to Date", "ClamAV daemon is running and its virus definitions are current.", "N/A", "Low")
-            else:
-                last_update_line = next((line for line in stdout_freshclam.splitlines() if "Last successful update" in line), None)
-                if last_update_line:
-                    try:
-                        date_str = last_update_line.split("Last successful update: ")[1].strip()
-                        date_obj = datetime.datetime.strptime(date_str, "%a %b %d %H:%M:%S %Y")
-                        
-                        time_diff = datetime.datetime.now() - date_obj
-                        if time_diff.days > 7: 
-                            return self._create_result(False, "ClamAV Definitions Outdated", f"ClamAV daemon is running but definitions were last updated {time_diff.days} days ago.", "Run 'sudo freshclam' to update definitions.", "High")
-                        else:
-                            return self._create_result(True, "ClamAV Active and Reasonably Up to Date", "ClamAV daemon is running and definitions are recently updated.", "N/A", "Low")
-                    except ValueError:
-                        return self._create_result(False, "ClamAV Update Status Unknown", "ClamAV daemon is running but could not determine definition update status.", "Manually check ClamAV definition status: 'sudo freshclam -v'", "Medium")
-                else:
-                    return self._create_result(False, "ClamAV Definitions Not Up to Date", "ClamAV daemon is running but definitions do not appear to be current.", "Run 'sudo freshclam' to update definitions.", "High")
-        else:
-            return self._create_result(False, "ClamAV Daemon Inactive", "ClamAV is installed but its daemon is not active. Your system might be exposed.", "Start ClamAV daemon: 'sudo systemctl start clamav-daemon && sudo systemctl enable clamav-daemon'", "High")
+        if daemon_state == "active":
+            return None
+        return self._create_result(False, "ClamAV Daemon Inactive", "ClamAV is installed but its daemon is not active. Your system might be exposed.", "Start ClamAV daemon: 'sudo systemctl start clamav-daemon && sudo systemctl enable clamav-daemon'", "High")
+
+    def _evaluate_signature_databases(self):
+        # The databases' own headers tell when they were built (see core/clamav_db.py), so neither
+        # 'freshclam' (a network update holding its lock) nor root is needed.
+        # رؤوس ملفات قواعد التواقيع تكفي لمعرفة عمرها دون تشغيل freshclam
+        for path in clamav_db.FRESHCLAM_CONFS:
+            record_input(path)
+        directory = clamav_db.database_directory()
+        record_input(directory)
+        for path in clamav_db.database_paths(directory):
+            record_input(path)
+        headers, errors = clamav_db.load_databases(directory)
+        error_note = f" Unreadable databases: {'; '.join(errors)}" if errors else ""
+        update_solution = "Run 'sudo freshclam' to update definitions, and enable the freshclam service ('sudo systemctl enable --now clamav-freshclam') to keep them current."
+
+        missing = [name for name in ("main", "daily") if name not in headers]
+        if missing:
+            return self._create_result(False, "ClamAV Definitions Missing", f"ClamAV daemon is running but its {' and '.join(missing)} signature {'databases were' if len(missing) > 1 else 'database was'} not found in {directory}.{error_note}", update_solution, "High")
+
+        age = clamav_db.signature_age(headers)
+        newest = max(headers.values(), key=lambda header: header.build_time)
+        total = sum(header.signatures for header in headers.values())
+        days = int(age // 86400)
+        if age > self.max_signature_age_days * 86400:
+            return self._create_result(False, "ClamAV Definitions Outdated", f"ClamAV daemon is running but its newest signatures ({newest.name} version {newest.version}) were built {days} days ago.{error_note}", update_solution, "High")
+        built = f"{days} days" if days else f"{int(age // 3600)} hours"
+        return self._create_result(True, "ClamAV Active and Up to Date", f"ClamAV daemon is running and its signatures are current: built {built} ago ({newest.name} version {newest.version}, {total:,} signatures).{error_note}", "N/A", "Low")
 
     def _check_windows_antivirus(self):
-        powershell_command = [
-            "powershell.exe",
-            "-Command",
-            "Get-CimInstance -Namespace root/SecurityCenter2 -ClassName AntiVirusProduct | Select-Object displayName, productState, pathToSignedProductExe"
-        ]
-        
-        stdout, stderr, return_code = run_command(powershell_command)
-        
+        stdout, stderr, return_code = run_command(WINDOWS_ANTIVIRUS_COMMAND)
+        return self._evaluate_windows_antivirus(stdout, return_code)
+
+    def _evaluate_windows_antivirus(self, stdout, return_code):
+        mark_volatile()
         if return_code != 0:
             return self._create_result(False, "Antivirus Check Failed", "Could not retrieve antivirus status (possibly due to insufficient permissions or PowerShell execution policy). Please run as administrator.", self.solution, "Medium")
 
@@ -1,27 +1,86 @@
 # core/checks/browser_security.py
 # Checks security settings of common web browsers.
 
-from core.utils import is_windows, is_linux, run_command
+from core.utils import is_windows, is_linux, run_command, SEVERITY_ORDER, highest_severity
+from core.async_utils import run_in_thread
+from core.fingerprints import record_input
+from core.browser_profiles import user_homes, index_paths, discover_profiles, evaluate_profiles, HOME_ROOT
+from core.firefox_prefs import load_profile_prefs, system_pref_paths
 import os
 import json
 import sqlite3 # Firefox uses SQLite databases for some settings
 
+# Read by core/registry.py without importing this module
+CHECK_INFO = {
+    "name": "Browser Security Settings",
+    "class": "BrowserSecurityCheck",
+    "os": ["linux", "windows"],
+    "cost": "cheap",
+    "privileges": "user",
+    "order": 60
+}
+
+# How many weak profiles are spelled out in the description; all profiles are in result["findings"]
+MAX_DESCRIBED_FINDINGS = 15
+# Firefox's Safe Browsing switches; the first one is the pre-50 master switch
+SAFEBROWSING_PREFS = ("browser.safebrowsing.enabled", "browser.safebrowsing.malware.enabled", "browser.safebrowsing.phishing.enabled")
+
+def _chrome_issues(prefs):
+    """:return: Security problems found in a Chromium-family Preferences document."""
+    issues = []
+    # Chrome leaves "safebrowsing.enabled" out while it is at its default (on): only an explicit false counts
+    if prefs.get("safebrowsing", {}).get("enabled", True) is False:
+        issues.append("Safe Browsing (Phishing/Malware protection) is disabled.")
+
+    # Check Third-party cookies status, only where the user chose to allow them:
+    # profile.cookie_controls_mode 0 = allow, 1 = block third-party, 2 = block in Incognito only;
+    # older versions keep a profile.block_third_party_cookies switch instead
+    profile = prefs.get("profile", {})
+    if profile.get("cookie_controls_mode") == 0 or profile.get("block_third_party_cookies") is False:
+        issues.append("Third-party cookies are allowed (potential for tracking).")
+    return issues
+
+def _firefox_issues(prefs):
+    """:return: Security problems found in a Firefox profile's effective preferences (core/firefox_prefs.py)."""
+    issues = []
+    # Check HTTPS-Only Mode (dom.security.https_only_mode)
+    if prefs.get("dom.security.https_only_mode") is False:
+        issues.append("HTTPS-Only Mode is disabled.")
+
+    # Check Enhanced Tracking Protection (privacy.trackingprotection.enabled)
+    if prefs.get("privacy.trackingprotection.enabled") is False:
+        issues.append("Enhanced Tracking Protection is disabled.")
+
+    # Check Secure DNS (network.trr.mode)
+    # 0=off (default), 1=opportunistic, 2=DoH first, 3=DoH only, 5=off by choice
+    # We want mode 2 or 3 for strong security
+    if prefs.get("network.trr.mode") in (0, 1, 5):
+        issues.append("Secure DNS (DNS-over-HTTPS/TLS) is not configured for 'secure only' mode.")
+
+    # Check Phishing and Malware Protection (browser.safebrowsing.*)
+    if any(prefs.get(name) is False for name in SAFEBROWSING_PREFS):
+        issues.append("Phishing and/or Malware Protection is disabled.")
+    return issues
+
 class BrowserSecurityCheck:
     def __init__(self):
-        self.check_name = "Browser Security Settings"
+        self.check_name = CHECK_INFO["name"]
         self.description = "Examines key security configurations of common web browsers (Chrome, Firefox) to identify potential vulnerabilities."
         self.solution = "Enable HTTPS-Only Mode, Enhanced Tracking Protection, Secure DNS, and ensure Phishing/Malware protection is active in your browser settings. Keep your browser updated."
         self.severity = "High"
+        self.required_facts = []
+        # /home changes when a user is added; the profile indexes and prefs files are recorded while scanning
+        self.cache_inputs = [HOME_ROOT, "~/.mozilla/firefox", "~/.config"]
+
+    def run_check(self, facts=None):
+        if is_linux():
+            return self._check_linux_profiles()
 
-    def run_check(self):
         results = []
 
         if is_windows():
             results.append(self._check_chrome_windows())
             results.append(self._check_firefox_windows())
-        elif is_linux():
-            results.append(self._check_chrome_linux())
-            results.append(self._check_firefox_linux())
         else:
             results.append(self._create_result(False, "Unsupported OS for Browser Check", "Browser security checks are not supported on this operating system.", "N/A", "Medium"))
         
@@ -47,6 +106,9 @@ class BrowserSecurityCheck:
         else:
             return self._create_result(overall_is_secure, overall_title, overall_description, overall_solution, overall_severity)
 
+    async def run_check_async(self, facts=None):
+        # This check only reads profile files, so it runs on a worker thread instead of spawning commands.
+        return await run_in_thread(self.run_check)
 
     def _check_chrome_windows(self):
         # Chrome settings are stored in preferences file as JSON
@@ -54,6 +116,7 @@ class BrowserSecurityCheck:
         # Or in the Registry (less common for specific settings)
         chrome_path = os.path.expandvars(r"%LOCALAPPDATA%\Google\Chrome\User Data")
         default_profile_path = os.path.join(chrome_path, "Default", "Preferences")
+        record_input(default_profile_path)
 
         if not os.path.exists(default_profile_path):
             return self._create_result(True, "Chrome Not Found/Config Unavailable (Windows)", "Google Chrome browser configuration file not found. Please ensure Chrome is installed and used.", "N/A", "Low") # Not vulnerable, just not found
@@ -62,27 +125,10 @@ class BrowserSecurityCheck:
             with open(default_profile_path, "r", encoding="utf-8") as f:
                 prefs = json.load(f)
             
-            issues = []
+            # Secure DNS (DNS-over-HTTPS) is not in Preferences but set by command line flags or group policy,
+            # so it is not checked for Chrome.
+            issues = _chrome_issues(prefs)
 
-            # Check Safe Browse (Phishing/Malware protection)
-            safe_Browse_enabled = prefs.get("safeBrowse", {}).get("enabled", False)
-            if not safe_Browse_enabled:
-                issues.append("Safe Browse (Phishing/Malware protection) is disabled.")
-            
-            # Check for Secure DNS (DNS-over-HTTPS)
-            # This setting is not directly in Preferences, but often managed via command line flags or group policy
-            # It's hard to programmatically verify without deep parsing or admin tools.
-            # For simplicity, we might skip this for now or check a less direct indicator.
-            # Let's skip secure DNS check for Chrome for now due to complexity.
-
-            # Check Third-party cookies status
-            # prefs.content_settings.exceptions.cookies (can be complex)
-            # A simpler approach is to check default behavior:
-            cookie_default = prefs.get("profile", {}).get("default_content_settings", {}).get("cookies", 0)
-            # 0: Allow all, 1: Block third-party (Chrome default), 2: Block all
-            if cookie_default == 0:
-                issues.append("Third-party cookies are allowed (potential for tracking).")
-            
             if issues:
                 description = "Chrome security issues: \n" + "\n".join(issues)
                 return self._create_result(False, "Weak Chrome Security Settings (Windows)", description, self.solution, self.severity)
@@ -100,6 +146,8 @@ class BrowserSecurityCheck:
         # Some settings are also in places.sqlite for site permissions.
 
         firefox_path = os.path.expandvars(r"%APPDATA%\Mozilla\Firefox\Profiles")
+        # The folder itself changes when a profile is added or removed.
+        record_input(firefox_path)
         
         if not os.path.exists(firefox_path):
             return self._create_result(True, "Firefox Not Found (Windows)", "Mozilla Firefox browser profile folder not found. Please ensure Firefox is installed and used.", "N/A", "False Negative")
@@ -111,37 +159,17 @@ class BrowserSecurityCheck:
 
         profile_path = os.path.join(firefox_path, profile_dirs[0]) # Take the first default profile
         prefs_js_path = os.path.join(profile_path, "prefs.js")
+        record_input(prefs_js_path)
 
         if not os.path.exists(prefs_js_path):
             return self._create_result(True, "Firefox Config Unavailable (Windows)", "Firefox prefs.js file not found. Please ensure Firefox is installed and used.", "N/A", "False Negative")
 
+        # user.js overrides prefs.js on every start
+        record_input(os.path.join(profile_path, "user.js"))
+
         try:
-            issues = []
-            prefs_content = ""
-            with open(prefs_js_path, "r", encoding="utf-8", errors="ignore") as f:
-                prefs_content = f.read()
-
-            # Check HTTPS-Only Mode (network.http.security.enable_https_only_mode)
-            if 'user_pref("network.http.security.enable_https_only_mode", false);' in prefs_content:
-                issues.append("HTTPS-Only Mode is disabled.")
-
-            # Check Enhanced Tracking Protection (privacy.trackingprotection.enabled)
-            if 'user_pref("privacy.trackingprotection.enabled", false);' in prefs_content:
-                issues.append("Enhanced Tracking Protection is disabled.")
-            
-            # Check Secure DNS (network.trr.mode)
-            # 0=off, 1=opportunistic, 2=secure only, 3=secure only for certain domains
-            # We want mode 2 or 3 for strong security
-            if 'user_pref("network.trr.mode", 0);' in prefs_content or \
-               'user_pref("network.trr.mode", 1);' in prefs_content:
-                issues.append("Secure DNS (DNS-over-HTTPS/TLS) is not configured for 'secure only' mode.")
-
-            # Check Phishing and Malware Protection (browser.safeBrowse.enabled)
-            if 'user_pref("browser.safeBrowse.enabled", false);' in prefs_content or \
-               'user_pref("browser.safeBrowse.malware.enabled", false);' in prefs_content or \
-               'user_pref("browser.safeBrowse.phishing.enabled", false);' in prefs_content:
-                issues.append("Phishing and/or Malware Protection is disabled.")
-            
+            issues = _firefox_issues(load_profile_prefs(profile_path))
+
             if issues:
                 description = "Firefox security issues: \n" + "\n".join(issues)
                 return self._create_result(False, "Weak Firefox Security Settings (Windows)", description, self.solution, self.severity)
@@ -151,87 +179,61 @@ class BrowserSecurityCheck:
         except Exception as e:
             return self._create_result(False, "Firefox Config Read Error (Windows)", f"Could not read Firefox preferences: {e}", "Ensure Firefox is closed and try again, or check file permissions.", "Medium")
 
-    def _check_chrome_linux(self):
-        # Chrome settings on Linux are similar to Windows, stored in Preferences JSON.
-        # Path: ~/.config/google-chrome/Default/Preferences
-        chrome_path = os.path.expanduser("~/.config/google-chrome")
-        default_profile_path = os.path.join(chrome_path, "Default", "Preferences")
-
-        if not os.path.exists(default_profile_path):
-            return self._create_result(True, "Chrome Not Found/Config Unavailable (Linux)", "Google Chrome browser configuration file not found. Please ensure Chrome is installed and used.", "N/A", "Low")
-
-        try:
-            with open(default_profile_path, "r", encoding="utf-8") as f:
-                prefs = json.load(f)
-            
-            issues = []
-
-            safe_Browse_enabled = prefs.get("safeBrowse", {}).get("enabled", False)
-            if not safe_Browse_enabled:
-                issues.append("Safe Browse (Phishing/Malware protection) is disabled.")
-            
-            cookie_default = prefs.get("profile", {}).get("default_content_settings", {}).get("cookies", 0)
-            if cookie_default == 0:
-                issues.append("Third-party cookies are allowed (potential for tracking).")
-            
-            if issues:
-                description = "Chrome security issues: \n" + "\n".join(issues)
-                return self._create_result(False, "Weak Chrome Security Settings (Linux)", description, self.solution, self.severity)
-            else:
-                return self._create_result(True, "Chrome Security Settings Appear Good (Linux)", "Key Chrome security settings are enabled.", "N/A", "Low")
-
-        except Exception as e:
-            return self._create_result(False, "Chrome Config Read Error (Linux)", f"Could not read Chrome preferences: {e}", "Ensure Chrome is closed and try again, or check file permissions.", "Medium")
-
-    def _check_firefox_linux(self):
-        # Firefox settings on Linux are similar to Windows, in prefs.js
-        # Path: ~/.mozilla/firefox/<profile_id>/prefs.js
-        firefox_path = os.path.expanduser("~/.mozilla/firefox")
-        
-        if not os.path.exists(firefox_path):
-            return self._create_result(True, "Firefox Not Found (Linux)", "Mozilla Firefox browser profile folder not found. Please ensure Firefox is installed and used.", "N/A", "False Negative")
-        
-        profile_dirs = [d for d in os.listdir(firefox_path) if os.path.isdir(os.path.join(firefox_path, d)) and ".default" in d]
-        
-        if not profile_dirs:
-            return self._create_result(True, "Firefox Profile Not Found (Linux)", "No Firefox default profile found.", "N/A", "False Negative")
-
-        profile_path = os.path.join(firefox_path, profile_dirs[0])
-        prefs_js_path = os.path.join(profile_path, "prefs.js")
-
-        if not os.path.exists(prefs_js_path):
-            return self._create_result(True, "Firefox Config Unavailable (Linux)", "Firefox prefs.js file not found. Please ensure Firefox is installed and used.", "N/A", "False Negative")
-
+    def _check_linux_profiles(self):
+        # Every Firefox and Chromium-family profile of every user under /home, one finding per profile
+        # كل ملفات تعريف المتصفحات لكل المستخدمين، نتيجة واحدة لكل ملف تعريف
+        homes = user_homes()
+        for path in index_paths(homes):
+            record_input(path)
+        profiles = discover_profiles(homes)
+        for profile in profiles:
+            record_input(profile.prefs_path)
+            if profile.family == "firefox":
+                record_input(os.path.join(profile.path, "user.js"))
+        # Installation-wide Firefox defaults (syspref.js, defaults/pref/*.js), shared by every profile
+        system_paths = system_pref_paths()
+        for path in system_paths:
+            record_input(path)
+        if not profiles:
+            return self._create_result(True, "No Browser Profiles Found (Linux)", f"No Firefox or Chromium-family browser profiles were found in {len(homes)} home directories.", "N/A", "Low")
+
+        findings = [finding for profile, finding in evaluate_profiles(profiles, lambda profile: self._evaluate_profile(profile, system_paths))]
+        findings.sort(key=lambda finding: (finding["is_secure"], -SEVERITY_ORDER[finding["severity"]]))
+        weak = [finding for finding in findings if not finding["is_secure"]]
+        users = len({profile.user for profile in profiles})
+        if not weak:
+            return self._create_result(True, "All Browser Profiles Appear Secure (Linux)", f"Key security settings are enabled in all {len(profiles)} browser profiles of {users} users.", "N/A", "Low")
+
+        lines = [f"[{finding['severity']}] {finding['detail']}" for finding in weak[:MAX_DESCRIBED_FINDINGS]]
+        if len(weak) > MAX_DESCRIBED_FINDINGS:
+            lines.append(f"... and {len(weak) - MAX_DESCRIBED_FINDINGS} more.")
+        result = self._create_result(False, f"Weak Browser Settings in {len(weak)} of {len(profiles)} Profiles (Linux)", "\n".join(lines), self.solution, highest_severity(weak))
+        result["findings"] = findings
+        return result
+
+    def _evaluate_profile(self, profile, system_paths=()):
+        # Runs on a worker thread of evaluate_profiles(); parsed Firefox files are shared through the cache of core/firefox_prefs.py
+        subject = f"{profile.user}: {profile.browser} profile '{profile.name}'"
+        finding = {"id": "browser_profile", "subject": subject, "browser": profile.browser, "user": profile.user,
+                   "profile": profile.name, "path": profile.path, "is_secure": True, "severity": "Low", "issues": []}
         try:
-            issues = []
-            prefs_content = ""
-            with open(prefs_js_path, "r", encoding="utf-8", errors="ignore") as f:
-                prefs_content = f.read()
-
-            if 'user_pref("network.http.security.enable_https_only_mode", false);' in prefs_content:
-                issues.append("HTTPS-Only Mode is disabled.")
-
-            if 'user_pref("privacy.trackingprotection.enabled", false);' in prefs_content:
-                issues.append("Enhanced Tracking Protection is disabled.")
-            
-            if 'user_pref("network.trr.mode", 0);' in prefs_content or \
-               'user_pref("network.trr.mode", 1);' in prefs_content:
-                issues.append("Secure DNS (DNS-over-HTTPS/TLS) is not configured for 'secure only' mode.")
-
-            if 'user_pref("browser.safeBrowse.enabled", false);' in prefs_content or \
-               'user_pref("browser.safeBrowse.malware.enabled", false);' in prefs_content or \
-               'user_pref("browser.safeBrowse.phishing.enabled", false);' in prefs_content:
-                issues.append("Phishing and/or Malware Protection is disabled.")
-            
-            if issues:
-                description = "Firefox security issues: \n" + "\n".join(issues)
-                return self._create_result(False, "Weak Firefox Security Settings (Linux)", description, self.solution, self.severity)
+            if profile.family == "firefox":
+                finding["issues"] = _firefox_issues(load_profile_prefs(profile.path, system_paths))
             else:
-                return self._create_result(True, "Firefox Security Settings Appear Good (Linux)", "Key Firefox security settings are enabled.", "N/A", "Low")
-
-        except Exception as e:
-            return self._create_result(False, "Firefox Config Read Error (Linux)", f"Could not read Firefox preferences: {e}", "Ensure Firefox is closed and try again, or check file permissions.", "Medium")
-
+                with open(profile.prefs_path, "r", encoding="utf-8") as f:
+                    finding["issues"] = _chrome_issues(json.load(f))
+        except FileNotFoundError:
+            # Listed in profiles.ini / Local State but never started: nothing to judge yet
+            finding["detail"] = f"{subject}: no preferences file yet ({profile.prefs_path})."
+            return finding
+        except (OSError, ValueError, AttributeError) as e:
+            finding.update(is_secure=False, severity="Medium", detail=f"{subject}: could not read {profile.prefs_path}: {e}")
+            return finding
+        if finding["issues"]:
+            finding.update(is_secure=False, severity=self.severity, detail=f"{subject}: " + " ".join(finding["issues"]))
+        else:
+            finding["detail"] = f"{subject}: key security settings are enabled."
+        return finding
 
     def _create_result(self, is_secure, title, description, solution, severity):
         return {
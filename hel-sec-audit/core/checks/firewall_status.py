@@ -2,39 +2,126 @@
 # Checks the status of the system's firewall.
 
 from core.utils import run_command, is_linux, is_windows
+from core.async_utils import run_command_async
+from core.facts import FactProvider
+from core.fingerprints import record_input, mark_volatile
+from core.firewall_rules import DENY_VERDICTS, frontend_name
+
+# Read by core/registry.py without importing this module
+CHECK_INFO = {
+    "name": "Firewall Status",
+    "class": "FirewallStatusCheck",
+    "os": ["linux", "windows"],
+    "cost": "cheap",
+    "privileges": "root",
+    "order": 40
+}
+
+UFW_STATUS_COMMAND = ["sudo", "ufw", "status"]
+# Configuration read by 'ufw status' (ENABLED=yes/no and the user rule sets).
+UFW_CONFIG_FILES = ["/etc/default/ufw", "/etc/ufw/ufw.conf", "/etc/ufw/user.rules", "/etc/ufw/user6.rules"]
+WINDOWS_FIREWALL_COMMAND = ["netsh", "advfirewall", "show", "allprofiles"]
 
 class FirewallStatusCheck:
     def __init__(self):
-        self.check_name = "Firewall Status"
+        self.check_name = CHECK_INFO["name"]
         self.description = "Verifies if the system's firewall is active and properly configured to protect against unauthorized access."
         self.solution = "Ensure your system's firewall (e.g., Windows Defender Firewall, UFW, Firewalld) is enabled and configured to block unnecessary incoming connections."
         self.severity = "High"
+        # firewalld's state is only read when the ruleset cannot be; asking for it here just adds
+        # the unit to the scan's single batched 'systemctl show'.
+        self.required_facts = ["firewall_ruleset", "unit_state[firewalld]"]
+        self.cache_inputs = ["/etc/ufw", "/etc/firewalld"]
 
-    def run_check(self):
+    def run_check(self, facts=None):
         if is_linux():
-            return self._check_linux_firewall()
+            return self._check_linux_firewall(facts or FactProvider())
         elif is_windows():
             return self._check_windows_firewall()
         else:
             return self._create_result(False, "Unsupported OS", "The current operating system is not supported for this check.", "N/A", "Medium")
 
-    def _check_linux_firewall(self):
-        # Try checking UFW first (Ubuntu/Debian)
+    async def run_check_async(self, facts=None):
+        if is_linux():
+            facts = facts or FactProvider()
+            await facts.resolve_async(self.required_facts)
+            result = self._evaluate_ruleset(facts.get("firewall_ruleset"))
+            if result:
+                return result
+            result = self._evaluate_ufw(await run_command_async(UFW_STATUS_COMMAND))
+            if result:
+                return result
+            return self._evaluate_firewalld(facts.get("unit_state[firewalld]"))
+        elif is_windows():
+            stdout, stderr, return_code = await run_command_async(WINDOWS_FIREWALL_COMMAND)
+            return self._evaluate_windows_firewall(stdout, return_code)
+        else:
+            return self.run_check(facts)
+
+    def _check_linux_firewall(self, facts):
+        # The "firewall_ruleset" fact reads nftables/iptables once (see core/firewall_rules.py).
+        result = self._evaluate_ruleset(facts.get("firewall_ruleset"))
+        if result:
+            return result
+        # Without the ruleset (no nft, iptables-save or readable UFW files) ask the frontends instead.
+        # firewalld is only consulted when UFW is inconclusive, so a UFW-only system never
+        # depends on live unit state and can be skipped by an incremental rescan.
+        result = self._evaluate_ufw(run_command(UFW_STATUS_COMMAND))
+        if result:
+            return result
+        return self._evaluate_firewalld(facts.get("unit_state[firewalld]"))
+
+    def _evaluate_ruleset(self, loaded):
+        # Returns None when the ruleset could not be read at all.
+        if not loaded["ok"]:
+            return None
+        ruleset = loaded["ruleset"]
+        frontend = frontend_name(ruleset)
+
+        # Which chains filter incoming packets, and what happens to packets no rule matches
+        chains = []
+        default_deny = False
+        filters_anything = False
+        for chain in ruleset.input_chains():
+            reachable = ruleset.reachable_chains(chain)
+            verdict = ruleset.default_verdict(chain)
+            default_deny = default_deny or verdict in DENY_VERDICTS
+            filters_anything = filters_anything or verdict in DENY_VERDICTS or any(
+                rule.verdict in DENY_VERDICTS for c in reachable for rule in c.rules)
+            rule_count = sum(len(c.rules) for c in reachable)
+            chains.append(f"{chain.describe()} (default {verdict}, {rule_count} rules)")
+
+        source = f"Ruleset read from {ruleset.source}."
+        if not chains:
+            return self._create_result(False, "No firewall rules filter incoming traffic", f"No input filter chain is loaded, so every port is reachable. {source}", self.solution, "High")
+        if default_deny:
+            description = f"{frontend or 'The firewall'} filters incoming traffic and drops what is not explicitly allowed. Input chains: {'; '.join(chains)}. {source}"
+            return self._create_result(True, f"{frontend or 'Firewall'} is active", description, "N/A", "Low")
+        if filters_anything:
+            description = f"Incoming traffic is accepted unless a rule blocks it. Input chains: {'; '.join(chains)}. {source}"
+            return self._create_result(False, "Firewall accepts incoming traffic by default", description, "Set the default input policy to drop (e.g. 'sudo ufw default deny incoming') and allow only the services you need.", "Medium")
+        description = f"The input chains accept every packet. Input chains: {'; '.join(chains)}. {source}"
+        return self._create_result(False, "Firewall does not filter incoming traffic", description, self.solution, "High")
+
+    def _evaluate_ufw(self, ufw_probe):
+        # Try checking UFW first (Ubuntu/Debian); returns None when UFW is missing or its status is unclear.
         # محاولة التحقق من UFW أولاً (أوبونتو/دبيان)
-        stdout, stderr, return_code = run_command(["sudo", "ufw", "status"])
+        for path in UFW_CONFIG_FILES:
+            record_input(path)
+        stdout, stderr, return_code = ufw_probe
         if return_code == 0 and "Status: active" in stdout:
             return self._create_result(True, "UFW is active", "Uncomplicated Firewall (UFW) is enabled and providing protection.", "N/A", "Low")
         elif return_code == 0 and "Status: inactive" in stdout:
             return self._create_result(False, "UFW is inactive", "Uncomplicated Firewall (UFW) is disabled. Your system is exposed.", "Enable UFW: 'sudo ufw enable'", "High")
+        return None
 
+    def _evaluate_firewalld(self, firewalld_state):
         # If UFW not found or inactive, try Firewalld (Fedora/CentOS/RHEL)
         # إذا لم يتم العثور على UFW أو كان غير نشط، جرب Firewalld
-        stdout, stderr, return_code = run_command(["sudo", "systemctl", "is-active", "firewalld"])
-        if return_code == 0 and "active" in stdout:
+        # systemd also reports "inactive" for units that are not installed, so only "active" is conclusive.
+        if firewalld_state == "active":
             return self._create_result(True, "Firewalld is active", "Firewalld is enabled and providing protection.", "N/A", "Low")
-        elif return_code == 0 and "inactive" in stdout:
-            return self._create_result(False, "Firewalld is inactive", "Firewalld is disabled. Your system is exposed.", "Enable Firewalld: 'sudo systemctl start firewalld && sudo systemctl enable firewalld'", "High")
-        
+
         # Fallback if no known firewall detected or active
         # في حالة عدم اكتشاف جدار حماية معروف أو نشط
         return self._create_result(False, "Linux Firewall Status Unknown/Inactive", "Could not determine status of a common Linux firewall (UFW/Firewalld) or it is inactive.", self.solution, "Medium")
@@ -43,9 +130,11 @@ class FirewallStatusCheck:
     def _check_windows_firewall(self):
         # Use 'netsh advfirewall show allprofiles' to check Windows Defender Firewall status
         # استخدام 'netsh advfirewall show allprofiles' للتحقق من حالة Windows Defender Firewall
-        command = ["netsh", "advfirewall", "show", "allprofiles"]
-        stdout, stderr, return_code = run_command(command)
+        stdout, stderr, return_code = run_command(WINDOWS_FIREWALL_COMMAND)
+        return self._evaluate_windows_firewall(stdout, return_code)
 
+    def _evaluate_windows_firewall(self, stdout, return_code):
+        mark_volatile()
         if return_code != 0:
             return self._create_result(False, "Windows Firewall Check Failed", "Could not check Windows Firewall status (possibly due to insufficient permissions). Please run as administrator.", self.solution, "Medium")
 
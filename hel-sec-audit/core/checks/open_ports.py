@@ -2,69 +2,123 @@
 # Checks for open network ports that could be security vulnerabilities.
 
 from core.utils import run_command, is_linux, is_windows
+from core.async_utils import run_command_async
+from core.facts import FactProvider
+from core.fingerprints import mark_volatile
+from core.proc_net import format_endpoint
+from core.reachability import ReachabilityAnalyzer, EXPOSED, RESTRICTED, is_loopback_bound
+
+# Read by core/registry.py without importing this module
+CHECK_INFO = {
+    "name": "Open Network Ports",
+    "class": "OpenPortsCheck",
+    "os": ["linux", "windows"],
+    "cost": "cheap",
+    "privileges": "user",
+    "order": 30
+}
+
+NETSTAT_WINDOWS_COMMAND = ["netstat", "-an"]
 
 class OpenPortsCheck:
     def __init__(self):
-        self.check_name = "Open Network Ports"
+        self.check_name = CHECK_INFO["name"]
         self.description = "Identifies open network ports on your system that might expose services to unauthorized access."
         self.solution = "Close unnecessary open ports. Configure your firewall to block incoming connections to unused ports. Ensure only essential services are running and accessible."
         self.severity = "High"
+        self.required_facts = ["listening_sockets", "firewall_ruleset"]
+        self.cache_inputs = []
 
-    def run_check(self):
+    def run_check(self, facts=None):
         if is_linux():
-            return self._check_linux_open_ports()
+            return self._check_linux_open_ports(facts or FactProvider())
         elif is_windows():
             return self._check_windows_open_ports()
         else:
             return self._create_result(False, "Unsupported OS", "The current operating system is not supported for this check.", "N/A", "Medium")
 
-    def _check_linux_open_ports(self):
-        # Use 'ss -tuln' or 'netstat -tuln' to list listening TCP/UDP ports
-        # استخدام 'ss -tuln' أو 'netstat -tuln' لسرد منافذ TCP/UDP المستمعة
-        command = ["ss", "-tuln"]
-        stdout, stderr, return_code = run_command(command)
-
-        if return_code != 0:
-            # إذا فشل الأمر، جرب netstat كبديل (خاصة في الأنظمة القديمة)
-            command = ["netstat", "-tuln"]
-            stdout, stderr, return_code = run_command(command)
-            if return_code != 0:
-                return self._create_result(False, "Failed to check open ports", f"Could not run 'ss' or 'netstat' command: {stderr}", self.solution, "Medium")
-
-        open_ports = []
-        for line in stdout.splitlines():
-            # Lines like: tcp   LISTEN 0      128    127.0.0.1:631        0.0.0.0:*
-            # أو: tcp        0      0 0.0.0.0:22              0.0.0.0:* LISTEN     
-            if "LISTEN" in line:
-                # محاولة استخراج عنوان IP والمنفذ
-                parts = line.split()
-                # البحث عن الجزء الذي يحتوي على IP:Port
-                for part in parts:
-                    if ":" in part and "." in part and part.count(':') == 1: # Basic check for IP:Port
-                        # مثال: 0.0.0.0:22 أو 127.0.0.1:631
-                        if "*" in part: # إذا كان المنفذ يستمع على جميع الواجهات
-                            open_ports.append(f"*{part.split(':')[1]}") 
-                        else:
-                            open_ports.append(part)
-                        break # لقينا المنفذ، ننتقل للسطر التالي
-
-        # إزالة التكرارات
-        open_ports = sorted(list(set(open_ports)))
+    async def run_check_async(self, facts=None):
+        if is_linux():
+            facts = facts or FactProvider()
+            await facts.resolve_async(self.required_facts)
+            return self._check_linux_open_ports(facts)
+        elif is_windows():
+            stdout, stderr, return_code = await run_command_async(NETSTAT_WINDOWS_COMMAND)
+            return self._evaluate_windows_open_ports(stdout, stderr, return_code)
+        else:
+            return self.run_check(facts)
+
+    def _check_linux_open_ports(self, facts):
+        # The "listening_sockets" fact is read from /proc/net (see core/proc_net.py), and
+        # "firewall_ruleset" is the same parsed ruleset the Firewall Status check uses.
+        return self._evaluate_linux_open_ports(facts.get("listening_sockets"), facts.get("firewall_ruleset"))
+
+    def _evaluate_linux_open_ports(self, listening, firewall=None):
+        if not listening["ok"]:
+            return self._create_result(False, "Failed to check open ports", f"Could not read /proc/net: {listening['error']}", self.solution, "Medium")
+        # Raw sockets have no port: their "port" column is the IP protocol number
+        sockets = [sock for sock in listening["sockets"] if sock.protocol.startswith(("tcp", "udp"))]
+        if not firewall or not firewall["ok"]:
+            # Without the ruleset every listener not bound to loopback has to be treated as open
+            return self._report_listeners([sock for sock in sockets if not is_loopback_bound(sock)], len(sockets))
+
+        exposed = []
+        restricted = []
+        for reachability in ReachabilityAnalyzer(firewall["ruleset"]).analyze(sockets):
+            if reachability.status == EXPOSED:
+                exposed.append(self._format_socket(reachability.socket))
+            elif reachability.status == RESTRICTED:
+                restricted.append(f"{self._format_socket(reachability.socket)} only {'; or '.join(reachability.conditions)}")
+        exposed = sorted(set(exposed))
+        restricted = sorted(set(restricted))
+        not_reachable = len(sockets) - len(exposed) - len(restricted)
+
+        if exposed:
+            description = f"The following ports can be reached from other machines: {', '.join(exposed)}."
+            if restricted:
+                description += f" Also reachable from limited sources: {', '.join(restricted)}."
+            description += " Review them to ensure they are necessary."
+            return self._create_result(False, "Exposed Ports Detected", description, self.solution, "High")
+        if restricted:
+            description = f"The following ports are reachable only from limited sources: {', '.join(restricted)}. Make sure those sources are trusted."
+            return self._create_result(False, "Ports Reachable From Limited Sources", description, self.solution, "Medium")
+        # لا توجد منافذ مكشوفة: كل المنافذ المستمعة محلية أو محجوبة بالجدار الناري
+        description = f"No listening port can be reached from other machines ({not_reachable} listening sockets are bound to loopback or blocked by the firewall)."
+        return self._create_result(True, "No Exposed Ports Detected", description, "N/A", "Low")
+
+    def _report_listeners(self, sockets, total):
+        # sockets: the listeners not bound to loopback; total: all of them
+        open_ports = sorted(set(self._format_socket(sock) for sock in sockets))
+        loopback = total - len(sockets)
 
         if open_ports:
             # تم العثور على منافذ مفتوحة
             description = f"The following ports are open and listening: {', '.join(open_ports)}. Review them to ensure they are necessary."
+            if loopback:
+                description += f" ({loopback} more listening sockets are bound to loopback and not reachable from other machines.)"
             return self._create_result(False, "Open Ports Detected", description, self.solution, "High")
         else:
             # لا توجد منافذ مفتوحة (من خلال الفحص)
-            return self._create_result(True, "No Open Ports Detected", "No unauthorized open ports were found listening on your system.", "N/A", "Low")
+            description = "No unauthorized open ports were found listening on your system."
+            if loopback:
+                description = f"No listening port can be reached from other machines ({loopback} listening sockets are bound to loopback)."
+            return self._create_result(True, "No Open Ports Detected", description, "N/A", "Low")
+
+    def _format_socket(self, sock):
+        # مثال: 0.0.0.0:22/tcp (/usr/sbin/sshd) أو [::]:631/tcp6 (/usr/sbin/cupsd)
+        entry = f"{format_endpoint(sock)}/{sock.protocol}"
+        if sock.executable:
+            entry += f" ({sock.executable})"
+        return entry
 
     def _check_windows_open_ports(self):
         # Use 'netstat -an' to list all active connections and listening ports
         # استخدام 'netstat -an' لسرد جميع الاتصالات النشطة والمنافذ المستمعة
-        command = ["netstat", "-an"]
-        stdout, stderr, return_code = run_command(command)
+        stdout, stderr, return_code = run_command(NETSTAT_WINDOWS_COMMAND)
+        return self._evaluate_windows_open_ports(stdout, stderr, return_code)
 
+    def _evaluate_windows_open_ports(self, stdout, stderr, return_code):
+        mark_volatile()
         if return_code != 0:
             return self._create_result(False, "Failed to check open ports", f"Could not run 'netstat' command: {stderr}", self.solution, "Medium")
 
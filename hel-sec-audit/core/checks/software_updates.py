@@ -2,15 +2,38 @@
 # Checks for outdated installed software.
 
 from core.utils import run_command, is_windows, is_linux # تأكد من أن is_arch_linux() غير موجودة هنا
+from core.async_utils import run_in_thread
+from core.facts import FactProvider
+from core.fingerprints import mark_volatile
+from core.versions import compare_versions, sort_versions
+from core.config_manager import ConfigManager
+from core.advisories import highest_severity, PACKAGE_MANAGER_SCHEMES, SEVERITIES
 import os
 import re
 
+# Read by core/registry.py without importing this module
+CHECK_INFO = {
+    "name": "Installed Software Updates",
+    "class": "SoftwareUpdatesCheck",
+    "os": ["linux", "windows"],
+    "cost": "expensive",
+    "privileges": "user",
+    "order": 70
+}
+
 class SoftwareUpdatesCheck:
     def __init__(self):
-        self.check_name = "Installed Software Updates"
+        self.check_name = CHECK_INFO["name"]
         self.description = "Checks for outdated versions of common software applications that may have known vulnerabilities."
         self.solution = "Keep all installed software updated to their latest versions. Enable automatic updates where possible."
         self.severity = "High"
+        self.required_facts = ["package_manager", "upgradable_packages", "installed_packages"]
+        self.cache_inputs = ["/var/lib/pacman/local", "/var/lib/pacman/sync", "/var/lib/dpkg/status", "/var/lib/apt/lists"]
+        # Known vulnerabilities come from a local advisory dump when one is configured (see core/advisories.py)
+        self.advisory_dump = os.path.expanduser(ConfigManager().get_update_settings().get("advisory_dump") or "")
+        if self.advisory_dump:
+            self.required_facts.append(f"vulnerable_packages[{self.advisory_dump}]")
+            self.cache_inputs.append(self.advisory_dump)
 
         self.common_windows_software = {
             "VLC Media Player": {
@@ -39,15 +62,21 @@ class SoftwareUpdatesCheck:
             }
         }
 
-    def run_check(self):
+    def run_check(self, facts=None):
         if is_windows():
             return self._check_windows_software()
         elif is_linux():
-            return self._check_linux_software()
+            return self._check_linux_software(facts or FactProvider())
         else:
             return self._create_result(False, "Unsupported OS", "Software update checks are not fully supported on this operating system.", "N/A", "Medium")
 
+    async def run_check_async(self, facts=None):
+        # The update probes are few and long-running, so a worker thread is cheaper than porting them.
+        return await run_in_thread(self.run_check, facts)
+
     def _check_windows_software(self):
+        # Versions come from WMI queries, which have no file to fingerprint.
+        mark_volatile()
         issues = []
         
         for software_name, details in self.common_windows_software.items():
@@ -59,7 +88,8 @@ class SoftwareUpdatesCheck:
                     break
             
             if found_path:
-                command = ["wmic", "datafile", "where", f"name='{found_path.replace('\\', '\\\\')}'", "get", "Version", "/value"]
+                escaped_path = found_path.replace('\\', '\\\\') # WMI expects doubled backslashes
+                command = ["wmic", "datafile", "where", f"name='{escaped_path}'", "get", "Version", "/value"]
                 stdout, stderr, return_code = run_command(command)
                 
                 current_version = "N/A"
@@ -82,30 +112,17 @@ class SoftwareUpdatesCheck:
         else:
             return self._create_result(True, "All Monitored Software Up to Date (Windows)", "No outdated versions of common software were detected.", "N/A", "Low")
 
-    def _check_linux_software(self):
+    def _check_linux_software(self, facts):
         # On Linux, software updates are typically managed by package managers (apt, dnf, pacman).
-        # We need to detect the distribution's package manager and query it.
-        
+        # Detection and the upgradable list come from shared facts, so SystemUpdatesCheck and this
+        # check share a single read of the dpkg status file and apt lists / pacman sync databases per scan.
+        package_manager_found = facts.get("package_manager") is not None
+
         upgradable_packages = []
-        package_manager_found = False
-
-        # Check for apt (Debian/Ubuntu)
-        if os.path.exists("/usr/bin/apt"):
-            stdout, stderr, return_code = run_command(["sudo", "apt", "list", "--upgradable"])
-            if return_code == 0 and "Listing..." not in stdout and stdout.strip():
-                upgradable_packages = [line.split('/')[0].strip() for line in stdout.splitlines() if line and 'Listing...' not in line]
-            package_manager_found = True
-        
-        # Check for pacman (Arch Linux)
-        elif os.path.exists("/usr/bin/pacman"):
-            # pacman -Qu lists foreign and upgradable packages
-            # We want only explicitly installed packages and their updates
-            stdout, stderr, return_code = run_command(["sudo", "pacman", "-Qu"])
-            if return_code == 0 and stdout.strip():
-                # Each line is typically "package_name old_version -> new_version"
-                upgradable_packages = [line.split(' ')[0].strip() for line in stdout.splitlines() if line.strip()]
-            package_manager_found = True
-        
+        if package_manager_found:
+            upgradable = facts.get("upgradable_packages")
+            upgradable_packages = [package["name"] for package in upgradable["packages"]]
+
         # Add checks for other package managers like dnf (Fedora/RHEL) if needed
         # elif os.path.exists("/usr/bin/dnf"):
         #     stdout, stderr, return_code = run_command(["sudo", "dnf", "check-update"])
@@ -113,29 +130,74 @@ class SoftwareUpdatesCheck:
         #         upgradable_packages = [line.split(' ')[0].strip() for line in stdout.splitlines() if line and not line.startswith(('Last metadata expiration check:', 'Dependencies resolved.'))]
         #     package_manager_found = True
 
+        # Foreign packages (AUR, 'pacman -U', a local .deb, or dropped from the archive) are in no
+        # repository, so no update ever reaches them.
+        # الحزم الأجنبية (AUR) لا تصلها تحديثات مدير الحزم
+        foreign_note = ""
+        installed = facts.get("installed_packages") if package_manager_found else None
+        if installed and installed["ok"]:
+            foreign = sorted(name for name, package in installed["packages"].items() if package.foreign)
+            if foreign:
+                origin = "AUR or installed by hand" if facts.get("package_manager") == "pacman" else "installed from a local .deb or no longer in any repository"
+                foreign_note = f" {len(foreign)} of {len(installed['packages'])} installed packages are foreign ({origin}) and are not updated by the package manager: {', '.join(foreign[:5])}{'...' if len(foreign) > 5 else ''}"
+
+        # الثغرات المعروفة في الحزم المثبتة من ملف التنبيهات الأمنية المحلي
+        vulnerable = facts.get(f"vulnerable_packages[{self.advisory_dump}]") if package_manager_found and self.advisory_dump else None
+        if vulnerable and not vulnerable["ok"]:
+            foreign_note += f" The advisory dump could not be matched: {vulnerable['error']}"
+        elif vulnerable and vulnerable["vulnerabilities"]:
+            scheme = PACKAGE_MANAGER_SCHEMES[facts.get("package_manager")]
+            return self._vulnerability_result(vulnerable["vulnerabilities"], scheme, upgradable_packages, foreign_note)
+
         if upgradable_packages:
-            description = f"System packages require updates. Use your distribution's package manager to update. Packages: {', '.join(upgradable_packages[:5])}..."
+            description = f"System packages require updates. Use your distribution's package manager to update. Packages: {', '.join(upgradable_packages[:5])}...{foreign_note}"
             return self._create_result(False, "Pending System Package Updates (Linux)", description, "Run your package manager to update all installed software (e.g., 'sudo pacman -Syu' on Arch, 'sudo apt update && sudo apt upgrade' on Debian/Ubuntu).", self.severity)
         elif package_manager_found:
-            return self._create_result(True, "All System Packages Up to Date (Linux)", "No pending updates detected via system package manager.", "N/A", "Low")
+            return self._create_result(True, "All System Packages Up to Date (Linux)", "No pending updates detected via system package manager." + foreign_note, "N/A", "Low")
         else:
             return self._create_result(True, "Software Update Status (Linux)", "Could not detect a common package manager. Ensure your system's software is regularly updated.", "N/A", "Medium")
 
 
+    def _vulnerability_result(self, vulnerabilities, scheme, upgradable_packages, note):
+        # One line per package: "openssl 3.0.2-1: CVE-2023-0464, CVE-2023-0465 (High; fixed in 3.0.8-1)",
+        # where the fixed version is the newest one needed, which fixes all of them.
+        by_package = {}
+        for vulnerability in vulnerabilities:
+            by_package.setdefault((vulnerability.package, vulnerability.version), []).append(vulnerability)
+        lines = []
+        unfixed_packages = 0
+        # Most severe first, so the packages to upgrade first are the ones shown
+        ranks = {severity: rank for rank, severity in enumerate(SEVERITIES)}
+        for (package, version), found in sorted(by_package.items(), key=lambda item: ranks.get(highest_severity(item[1]), len(ranks))):
+            ids = []
+            for vulnerability in found:
+                cves = [alias for alias in vulnerability.advisory.aliases if alias.startswith("CVE-")]
+                ids.extend(cves or [vulnerability.advisory.id])
+            ids = list(dict.fromkeys(ids))
+            fixes = sort_versions({vulnerability.fixed for vulnerability in found if vulnerability.fixed}, scheme)
+            unfixed = sum(1 for vulnerability in found if vulnerability.fixed is None)
+            unfixed_packages += bool(unfixed)
+            details = [highest_severity(found) or "Unknown severity"]
+            if fixes:
+                details.append(f"fixed in {fixes[-1]}")
+            if unfixed:
+                details.append(f"{unfixed} without a fix yet")
+            more = f" (+{len(ids) - 5} more)" if len(ids) > 5 else ""
+            lines.append(f"{package} {version}: {', '.join(ids[:5])}{more} ({'; '.join(details)})")
+        description = f"{len(by_package)} installed packages are affected by {len({vulnerability.advisory.id for vulnerability in vulnerabilities})} known vulnerabilities:\n" + "\n".join(lines[:20])
+        if len(lines) > 20:
+            description += f"\n... and {len(lines) - 20} more packages."
+        if upgradable_packages:
+            description += f"\n{len(upgradable_packages)} package updates are pending."
+        description += note
+        solution = "Upgrade the affected packages to the fixed versions with your package manager (e.g., 'sudo pacman -Syu' on Arch, 'sudo apt update && sudo apt upgrade' on Debian/Ubuntu)."
+        if unfixed_packages:
+            solution += " For vulnerabilities without a fix yet, consider removing the package or limiting its exposure until one is released."
+        return self._create_result(False, "Known Vulnerabilities in Installed Packages (Linux)", description, solution, highest_severity(vulnerabilities) or self.severity)
+
     def _is_version_older(self, current, required):
-        current_parts = [int(p) for p in current.split('.')]
-        required_parts = [int(p) for p in required.split('.')]
-
-        max_len = max(len(current_parts), len(required_parts))
-        current_parts += [0] * (max_len - len(current_parts))
-        required_parts += [0] * (max_len - len(required_parts))
-
-        for i in range(max_len):
-            if current_parts[i] < required_parts[i]:
-                return True
-            elif current_parts[i] > required_parts[i]:
-                return False
-        return False # Versions are equal
+        # Debian ordering copes with what vendors put in file versions: "1.2.3-2", "2:1.0~rc1", "23.01b"
+        return compare_versions(current, required, "debian") < 0
 
     def _create_result(self, is_secure, title, description, solution, severity):
         return {
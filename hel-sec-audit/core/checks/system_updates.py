@@ -2,53 +2,125 @@
 # Checks if the system has pending security updates.
 
 from core.utils import run_command, is_linux, is_windows
+from core.async_utils import run_in_thread
+from core.facts import FactProvider
+from core.fingerprints import mark_volatile
+from core.config_manager import ConfigManager
+
+# Read by core/registry.py without importing this module
+CHECK_INFO = {
+    "name": "System Updates Status",
+    "class": "SystemUpdatesCheck",
+    "os": ["linux", "windows"],
+    "cost": "expensive",
+    "privileges": "user",
+    "order": 10
+}
+
+# Pending updates are computed from the local copy of the package databases, which is only as
+# recent as the last sync; older than this (see "update_settings" in the config), a refresh is suggested.
+DEFAULT_MAX_INDEX_AGE_DAYS = 7
+# The scan never refreshes the lists itself (network, root); this is what the user is told to run.
+REFRESH_COMMANDS = {"apt": "sudo apt update && sudo apt upgrade", "pacman": "sudo pacman -Syu"}
 
 class SystemUpdatesCheck:
     def __init__(self):
-        self.check_name = "System Updates Status"
+        self.check_name = CHECK_INFO["name"]
         self.description = "Checks if your operating system has all the latest security updates installed."
         self.solution = "Run system update commands (e.g., 'sudo apt update && sudo apt upgrade' on Debian/Ubuntu, or use 'pacman -Syu' on Arch Linux). For Windows, check 'Windows Update' settings."
         self.severity = "High" # Default severity
+        self.required_facts = ["package_manager", "upgradable_packages"]
+        # Paths whose modification invalidates a cached result (see core/result_cache.py)
+        self.cache_inputs = ["/var/lib/pacman/local", "/var/lib/pacman/sync", "/var/lib/dpkg/status", "/var/lib/apt/lists"]
+        self.max_index_age_days = ConfigManager().get_update_settings().get("max_index_age_days", DEFAULT_MAX_INDEX_AGE_DAYS)
 
-    def run_check(self):
+    def run_check(self, facts=None):
         # Runs the check based on the operating system.
         # تقوم بتشغيل الفحص بناءً على نظام التشغيل.
         if is_linux():
-            return self._check_linux_updates()
+            return self._check_linux_updates(facts or FactProvider())
         elif is_windows():
             return self._check_windows_updates()
         else:
             return self._create_result(False, "Unsupported OS", "The current operating system is not supported for this check.", "Install updates manually if available.", "Medium")
 
-    def _check_linux_updates(self):
-        # Placeholder for Linux update check (e.g., Arch Linux specific)
-        # هذا مكان فحص تحديثات Linux (خاصة بـ Arch Linux)
-        # For Arch Linux: `pacman -Qu` (queries for outdated packages)
-        # For Debian/Ubuntu: `sudo apt update && apt list --upgradable`
-        
-        # This is a dummy check for now. You'll replace it with actual commands.
-        # هذا فحص وهمي الآن. ستقوم باستبداله بأوامر فعلية.
-        stdout, stderr, return_code = run_command(["echo", "Simulating update check..."])
-        
-        # Example for Arch Linux:
-        # stdout, stderr, return_code = run_command(["pacman", "-Qu"])
-        # if return_code == 0 and not stdout: # No outdated packages
-        #     return self._create_result(True, "System is up-to-date", "No pending updates found.", "N/A", "Low")
-        # elif return_code == 0 and stdout: # Outdated packages found
-        #     return self._create_result(False, "Pending system updates", "Your system has pending updates that may include security patches.", self.solution, "High")
-        # else:
-        #     return self._create_result(False, "Update check failed", f"Could not check for updates: {stderr}", self.solution, "Medium")
-
-        # Dummy result: assume updates are needed
-        return self._create_result(False, "Pending system updates (Simulated)", "Your system has pending updates that may include security patches.", self.solution, "High")
+    async def run_check_async(self, facts=None):
+        # Dominated by a single package-manager call, so the blocking path runs on a worker thread.
+        return await run_in_thread(self.run_check, facts)
+
+    def _check_linux_updates(self, facts):
+        # The package manager and its pending updates are shared facts, so SoftwareUpdatesCheck reuses
+        # the same read of the dpkg status file and apt lists / pacman sync databases (no root needed).
+        # مدير الحزم والتحديثات المعلقة حقائق مشتركة بين الفحوصات
+        package_manager = facts.get("package_manager")
+        if package_manager is None:
+            # Fallback for other Linux distributions or if package manager not found
+            return self._create_result(False, "Linux update check failed", "No supported package manager (apt/pacman) found.", self.solution, "Medium")
+
+        upgradable = facts.get("upgradable_packages")
+        if not upgradable["ok"]:
+            return self._create_result(False, "Update check failed", f"Failed to check for updates: {upgradable['error']}", self.solution, "Medium")
+
+        sync_note = ""
+        stale = False
+        sync_age = upgradable.get("sync_age")
+        if sync_age is not None:
+            sync_days = int(sync_age // 86400)
+            stale = sync_days > self.max_index_age_days
+            sync_note = f" Package lists were last refreshed {sync_days} day(s) ago."
+        refresh_solution = f"Run '{REFRESH_COMMANDS[package_manager]}' to refresh the package lists and install the updates."
 
+        outdated_packages = [self._format_update(package) for package in upgradable["packages"]]
+        if outdated_packages:
+            security = sum(1 for package in upgradable["packages"] if package.get("security"))
+            security_note = f" {security} of them come from a security repository." if security else ""
+            description = f"Your system has {len(outdated_packages)} pending updates that may include security patches.{security_note} Examples: {', '.join(outdated_packages[:3])}...{sync_note}"
+            if stale:
+                description += " More updates may have been released since; refresh the package lists."
+            return self._create_result(False, "Pending system updates", description, refresh_solution if stale else self.solution, "High")
+        if upgradable.get("databases") == []:
+            description = "No pending updates found, but no package lists have been downloaded, so available updates cannot be seen."
+            return self._create_result(False, "Package lists have never been refreshed", description, refresh_solution, "Medium")
+        if stale:
+            description = f"No pending updates found, but the package lists were last refreshed {sync_days} days ago, so updates released since then are not visible."
+            return self._create_result(False, "Package lists are out of date", description, refresh_solution, "Low")
+        return self._create_result(True, "System is up to date", "No pending updates found." + sync_note, "N/A", "Low")
+
+    def _format_update(self, package):
+        # "openssl 3.0.2-1 -> 3.0.3-1 (core)", or the package manager's own line when the versions are unknown
+        if package.get("installed") and package.get("available"):
+            repository = f" ({package['repository']})" if package.get("repository") else ""
+            return f"{package['name']} {package['installed']} -> {package['available']}{repository}"
+        return package["line"]
 
     def _check_windows_updates(self):
-        # Placeholder for Windows update check
-        # هذا مكان فحص تحديثات Windows
-        # This is more complex and usually involves PowerShell cmdlets or WMI.
-        # يمكن استخدام PowerShell cmdlets مثل Get-WindowsUpdate.
-        return self._create_result(False, "Windows updates status (Simulated)", "Checking Windows updates is complex programmatically.", "Check Windows Update settings manually.", "Medium")
+        # Checking Windows updates programmatically is complex and requires admin privileges.
+        # This is a simplified check that tries to use a PowerShell command.
+        # This check might not work reliably without full administrative privileges and running the app as administrator.
+        mark_volatile()
+
+        # PowerShell command to get pending updates (requires admin)
+        powershell_command = [
+            "powershell.exe",
+            "-Command",
+            "Get-WindowsUpdate -ErrorAction SilentlyContinue | Where-Object {$_.IsDownloaded -eq $false -and $_.IsInstalled -eq $false}"
+        ]
+
+        stdout, stderr, return_code = run_command(powershell_command)
+
+        if return_code == 0 and stdout.strip():
+            update_lines = [line for line in stdout.splitlines() if line.strip() and "KB" in line]
+            if update_lines:
+                num_updates = len(update_lines)
+                description = f"Your Windows system has {num_updates} pending updates. Please check Windows Update manually."
+                return self._create_result(False, "Pending Windows Updates", description, self.solution, "High")
+            else:
+                return self._create_result(True, "Windows appears up to date (programmatic check)", "No pending updates found using programmatic check.", "N/A", "Low")
+        elif return_code != 0:
+            error_message = "Programmatic Windows update check failed. Ensure the application is run as administrator and check manually."
+            return self._create_result(False, "Windows Update Check Failed", error_message + f" (Error: {stderr[:100]}...)", self.solution, "Medium")
+        else:
+            return self._create_result(True, "Windows appears up to date", "No pending updates found using programmatic check.", "N/A", "Low")
 
     def _create_result(self, is_secure, title, description, solution, severity):
         # Helper to format the result.
@@ -60,4 +132,4 @@ class SystemUpdatesCheck:
             "description": description,
             "solution": solution,
             "severity": severity
-        }
\ No newline at end of file
+        }
@@ -1,15 +1,49 @@
 # core/checks/weak_passwords.py
 
-from core.utils import run_command, is_linux, is_windows
+from core.utils import run_command, is_linux, is_windows, SEVERITY_ORDER, highest_severity
+from core.async_utils import run_command_async, run_in_thread, gather
+from core.fingerprints import record_input, record_tree, mark_volatile
+from core.pam import PAM_DIR, PWQUALITY_CONF, FAILLOCK_CONF, PamConfig, audit_pam
+from core.accounts import (PASSWD_FILE, SHADOW_FILE, GROUP_FILE, LOGIN_DEFS_FILE,
+                           load_accounts, audit_accounts, read_login_defs)
+
+# Read by core/registry.py without importing this module
+CHECK_INFO = {
+    "name": "Weak Password Policies/Usage",
+    "class": "WeakPasswordsCheck",
+    "os": ["linux", "windows"],
+    "cost": "cheap",
+    "privileges": "root",
+    "order": 20
+}
+
+# Only used when the scan itself cannot open /etc/shadow. The hashes never leave the sudo'd awk:
+# field 2 is cut down to what hash_scheme() needs - "" (empty), "!" (locked), the "$id$" prefix,
+# or a same-length mask for the DES/BSDi forms that are told apart by length - so the stdout the
+# executor sees (and a recording executor stores) holds no hash or salt.
+SHADOW_READ_PROGRAM = (
+    'BEGIN { FS = OFS = ":" } {'
+    ' h = $2;'
+    ' if (h ~ /^[!*]/) h = "!";'
+    ' else if (match(h, /^\\$[^$]*\\$/)) h = substr(h, 1, RLENGTH);'
+    ' else if (h != "") { first = (substr(h, 1, 1) == "_") ? "_" : "x"; gsub(/./, "x", h); h = first substr(h, 2) }'
+    ' $2 = h; print }'
+)
+SHADOW_READ_COMMAND = ["awk", SHADOW_READ_PROGRAM, SHADOW_FILE]
+# How many findings are spelled out in the description; all of them are in result["findings"]
+MAX_DESCRIBED_FINDINGS = 15
+NET_ACCOUNTS_COMMAND = ["net", "accounts"]
 
 class WeakPasswordsCheck:
     def __init__(self):
-        self.check_name = "Weak Password Policies/Usage"
+        self.check_name = CHECK_INFO["name"]
         self.description = "Checks for weak password policies and common vulnerabilities related to user passwords."
         self.solution = "Implement strong password policies (e.g., minimum length, complexity, regular changes). Educate users about choosing strong, unique passwords and consider using a password manager. Ensure no empty passwords are used."
         self.severity = "High"
+        self.required_facts = []
+        self.cache_inputs = [PASSWD_FILE, SHADOW_FILE, GROUP_FILE, LOGIN_DEFS_FILE, PAM_DIR, PWQUALITY_CONF, FAILLOCK_CONF]
 
-    def run_check(self):
+    def run_check(self, facts=None):
         if is_linux():
             return self._check_linux_passwords()
         elif is_windows():
@@ -17,52 +51,93 @@ class WeakPasswordsCheck:
         else:
             return self._create_result(False, "Unsupported OS", "The current operating system is not supported for this check.", "N/A", "Medium")
 
+    async def run_check_async(self, facts=None):
+        if is_linux():
+            account_files, pam_findings = await gather(
+                run_in_thread(self._read_account_files),
+                run_in_thread(self._audit_pam)
+            )
+            return self._evaluate_linux_passwords(account_files, pam_findings)
+        elif is_windows():
+            stdout, stderr, return_code = await run_command_async(NET_ACCOUNTS_COMMAND)
+            return self._evaluate_windows_passwords(stdout, return_code)
+        else:
+            return self.run_check(facts)
+
     def _check_linux_passwords(self):
-        # Check for empty passwords in /etc/shadow
-        # فحص وجود كلمات مرور فارغة في ملف /etc/shadow
-        stdout, stderr, return_code = run_command(["sudo", "awk", "-F:", '($2 == "") {print}', "/etc/shadow"], sudo_required=True)
-        if return_code == 0 and stdout.strip():
-            empty_password_users = stdout.strip().splitlines()
-            description = f"Users with empty passwords found: {', '.join([user.split(':')[0] for user in empty_password_users])}. This is a critical security vulnerability."
-            return self._create_result(False, "Empty Passwords Found", description, "Set strong passwords for these users immediately. Run 'sudo passwd <username>' for each.", "Critical")
-        
+        return self._evaluate_linux_passwords(self._read_account_files(), self._audit_pam())
+
+    def _read_account_files(self):
+        # Returns (passwd, group, shadow or None, login.defs values); read natively, one pass per file.
+        for path in (PASSWD_FILE, GROUP_FILE, SHADOW_FILE, LOGIN_DEFS_FILE):
+            record_input(path)
+        passwd_text = _read_text(PASSWD_FILE) or ""
+        group_text = _read_text(GROUP_FILE) or ""
+        try:
+            with open(SHADOW_FILE, "r", encoding="utf-8", errors="replace") as f:
+                shadow_text = f.read()
+        except PermissionError:
+            # Not running as root: one sudo'd read, with the hashes masked (SHADOW_READ_COMMAND)
+            stdout, stderr, return_code = run_command(SHADOW_READ_COMMAND, sudo_required=True)
+            shadow_text = stdout if return_code == 0 else None
+        except OSError:
+            shadow_text = None
+        return passwd_text, group_text, shadow_text, read_login_defs(LOGIN_DEFS_FILE)
+
+    def _audit_pam(self):
+        # The effective password and login stacks, with @include/include/substack resolved (core/pam.py)
+        record_tree(PAM_DIR)
+        record_input(PWQUALITY_CONF)
+        record_input(FAILLOCK_CONF)
+        # A fresh PamConfig per scan re-resolves the include graph; parsed files stay cached by mtime.
+        return audit_pam(PamConfig())
+
+    def _evaluate_linux_passwords(self, account_files, pam_findings):
+        passwd_text, group_text, shadow_text, login_defs = account_files
+
+        # Every account problem at once: empty/unlocked hashes, weak hash schemes, extra UID 0
+        # accounts, aging policy violations and system accounts with a login shell.
+        # كل مشاكل الحسابات دفعة واحدة بدلاً من التوقف عند أول مشكلة
+        table = load_accounts(passwd_text, group_text, shadow_text)
+        findings = audit_accounts(table, login_defs, shadow_read=shadow_text is not None)
+
         # Check for system-wide password policy using /etc/login.defs
         # فحص سياسة كلمة المرور على مستوى النظام باستخدام /etc/login.defs
-        min_len_found = False
-        min_len_val = 0
-        try:
-            with open("/etc/login.defs", "r") as f:
-                for line in f:
-                    if line.strip().startswith("PASS_MIN_LEN"):
-                        parts = line.strip().split()
-                        if len(parts) > 1 and parts[1].isdigit():
-                            min_len_val = int(parts[1])
-                            min_len_found = True
-                            break
-        except FileNotFoundError:
-            # If login.defs is not found, cannot determine policy easily
-            pass
-        except Exception as e:
-            print(f"Error reading /etc/login.defs: {e}") # لغرض التصحيح المؤقت، يمكن إزالته لاحقًا
-
-        if min_len_found and min_len_val < 8: # Recommended minimum length is 8 characters or more
-            description = f"Password minimum length (PASS_MIN_LEN) is set to {min_len_val} in /etc/login.defs, which is too short. Recommended 8 or more characters."
-            return self._create_result(False, "Weak Password Minimum Length Policy", description, "Edit /etc/login.defs and set PASS_MIN_LEN to at least 8.", "High")
-        
-        # Check for password complexity requirements (more advanced, often done by pam)
-        # هذا فحص مبدئي وقد يتطلب فحص PAM بشكل أعمق للمزيد من الدقة
-        stdout_pam, stderr_pam, return_code_pam = run_command(["grep", "-r", "pam_pwquality.so", "/etc/pam.d/"])
-        if return_code_pam != 0 or not stdout_pam:
-             description = "No clear indication of a strong password quality module (like pam_pwquality.so) being enforced."
-             return self._create_result(False, "Potential Lack of Password Complexity Policy", description, "Ensure PAM modules like 'pam_pwquality.so' are configured to enforce complexity requirements (e.g., mixtlf, dcredit, ucredit, ocredit).", "Medium")
-
-        return self._create_result(True, "Linux Password Policies Appear Adequate", "No critical weak password policy issues or empty passwords detected.", "N/A", "Low")
+        min_len = login_defs.get("PASS_MIN_LEN", "")
+        if min_len.isdigit() and int(min_len) < 8: # Recommended minimum length is 8 characters or more
+            findings.append({"id": "pass_min_len", "severity": "High", "subject": LOGIN_DEFS_FILE,
+                             "detail": f"Password minimum length (PASS_MIN_LEN) is set to {min_len} in /etc/login.defs, which is too short. Recommended 8 or more characters."})
+
+        # Password complexity and lockout, from the effective PAM stacks
+        # تعقيد كلمات المرور وقفل الحسابات من إعدادات PAM الفعلية
+        findings.extend(pam_findings)
+
+        if not findings:
+            return self._create_result(True, "Linux Password Policies Appear Adequate", f"No weak password policies or account issues found in {len(table.accounts)} accounts.", "N/A", "Low")
+
+        findings.sort(key=lambda finding: -SEVERITY_ORDER[finding["severity"]])
+        severity = highest_severity(findings)
+        empty = [f["subject"] for f in findings if f["id"] == "empty_password"]
+        title = "Empty Passwords Found" if empty else f"{len(findings)} Password and Account Issues Found"
+        lines = [f"[{f['severity']}] {f['detail']}" for f in findings[:MAX_DESCRIBED_FINDINGS]]
+        if len(findings) > MAX_DESCRIBED_FINDINGS:
+            lines.append(f"... and {len(findings) - MAX_DESCRIBED_FINDINGS} more.")
+        solution = self.solution
+        if empty:
+            solution = f"Set strong passwords for {', '.join(empty)} immediately ('sudo passwd <username>'). " + solution
+        result = self._create_result(False, title, "\n".join(lines), solution, severity)
+        result["findings"] = findings
+        return result
 
     def _check_windows_passwords(self):
         # Check Windows Password Policy using 'net accounts'
         # فحص سياسة كلمة المرور في ويندوز باستخدام 'net accounts'
-        stdout, stderr, return_code = run_command(["net", "accounts"])
+        stdout, stderr, return_code = run_command(NET_ACCOUNTS_COMMAND)
+        return self._evaluate_windows_passwords(stdout, return_code)
 
+    def _evaluate_windows_passwords(self, stdout, return_code):
+        # The policy lives in the SAM database, which has no file we can fingerprint.
+        mark_volatile()
         if return_code != 0:
             return self._create_result(False, "Windows Password Policy Check Failed", "Could not retrieve password policy (possibly due to insufficient permissions). Please run as administrator.", self.solution, "Medium")
 
@@ -108,3 +183,10 @@ class WeakPasswordsCheck:
             "solution": solution,
             "severity": severity
         }
+
+def _read_text(path):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
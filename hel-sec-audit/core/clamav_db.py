@@ -0,0 +1,107 @@
+# core/clamav_db.py
+# Reads the headers of ClamAV's signature databases (main, daily, bytecode) directly, so how current
+# they are is known without running 'freshclam' (which starts a network update and needs root).
+#
+# Every .cvd file, and the .cld file freshclam keeps after applying incremental updates, starts with a
+# 512-byte ASCII header padded with spaces:
+#   ClamAV-VDB:<build time>:<version>:<signatures>:<functionality level>:<md5>:<signature>:<builder>:<build time, epoch>
+# e.g. "ClamAV-VDB:14 Oct 2023 07-43 +0000:27062:2043939:90:...:...:raynman:1697269392".
+# The files are world-readable; only the header is read, not the compressed signatures after it.
+
+import datetime
+import os
+import time
+from collections import namedtuple
+
+CLAMAV_DB_DIR = "/var/lib/clamav"
+# Debian/Ubuntu, then Arch/Fedora; "DatabaseDirectory" there overrides CLAMAV_DB_DIR
+FRESHCLAM_CONFS = ["/etc/clamav/freshclam.conf", "/etc/freshclam.conf"]
+DATABASES = ("main", "daily", "bytecode")
+HEADER_SIZE = 512
+HEADER_MAGIC = b"ClamAV-VDB:"
+
+DatabaseHeader = namedtuple("DatabaseHeader", ["name", "path", "build_time", "version", "signatures", "functionality_level", "builder"])
+# build_time: seconds since the epoch; functionality_level: the oldest engine able to load the database
+
+class DatabaseHeaderError(Exception):
+    pass
+
+def _parse_build_time(text):
+    # Headers without the epoch field: the human-readable time, written with "-" so it contains no ":"
+    try:
+        return datetime.datetime.strptime(text.strip(), "%d %b %Y %H-%M %z").timestamp()
+    except ValueError:
+        return None
+
+def parse_header(data, path="", name=""):
+    """
+    :param data: The first HEADER_SIZE bytes of a .cvd / .cld file.
+    :return: DatabaseHeader
+    :raises DatabaseHeaderError: If the header is missing or malformed.
+    """
+    if not data.startswith(HEADER_MAGIC):
+        raise DatabaseHeaderError(f"{path}: not a ClamAV database")
+    fields = data[:HEADER_SIZE].decode("ascii", "replace").rstrip(" \x00\n").split(":")
+    if len(fields) < 5 or not fields[2].isdigit() or not fields[3].isdigit():
+        raise DatabaseHeaderError(f"{path}: malformed database header")
+    build_time = int(fields[8]) if len(fields) > 8 and fields[8].strip().isdigit() else _parse_build_time(fields[1])
+    if build_time is None:
+        raise DatabaseHeaderError(f"{path}: unreadable build time '{fields[1]}'")
+    return DatabaseHeader(
+        name=name,
+        path=path,
+        build_time=build_time,
+        version=int(fields[2]),
+        signatures=int(fields[3]),
+        functionality_level=int(fields[4]) if fields[4].isdigit() else 0,
+        builder=fields[7] if len(fields) > 7 else "",
+    )
+
+def read_header(path, name=""):
+    """
+    :return: DatabaseHeader of one database file.
+    :raises OSError: If the file cannot be read.
+    :raises DatabaseHeaderError: If it is not a ClamAV database.
+    """
+    with open(path, "rb") as f:
+        return parse_header(f.read(HEADER_SIZE), path, name)
+
+def database_directory(conf_paths=FRESHCLAM_CONFS):
+    """:return: The DatabaseDirectory set in freshclam.conf, or CLAMAV_DB_DIR."""
+    for conf_path in conf_paths:
+        try:
+            with open(conf_path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    parts = line.split(None, 1)
+                    if len(parts) == 2 and parts[0] == "DatabaseDirectory":
+                        return parts[1].strip().strip("\"'")
+        except OSError:
+            continue
+    return CLAMAV_DB_DIR
+
+def database_paths(directory=CLAMAV_DB_DIR):
+    """:return: The .cvd / .cld files of DATABASES that exist in the directory."""
+    return [os.path.join(directory, name + suffix) for name in DATABASES for suffix in (".cvd", ".cld")
+            if os.path.isfile(os.path.join(directory, name + suffix))]
+
+def load_databases(directory=CLAMAV_DB_DIR):
+    """
+    :return: ({name: DatabaseHeader}, [error strings]). When both a .cvd and a .cld exist, the newer version is used, as clamd does.
+    """
+    headers, errors = {}, []
+    for path in database_paths(directory):
+        name = os.path.basename(path)[:-len(".cvd")]
+        try:
+            header = read_header(path, name)
+        except (OSError, DatabaseHeaderError) as e:
+            errors.append(str(e))
+            continue
+        if name not in headers or header.version > headers[name].version:
+            headers[name] = header
+    return headers, errors
+
+def signature_age(headers, now=None):
+    """:return: Seconds since the newest database was built (the daily one, normally), or None without databases."""
+    if not headers:
+        return None
+    return max(0.0, (now or time.time()) - max(header.build_time for header in headers.values()))
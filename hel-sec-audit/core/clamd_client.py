@@ -0,0 +1,331 @@
+# core/clamd_client.py
+# On-demand file scans through a running clamd, over its UNIX socket with the INSTREAM command.
+#
+# 'clamscan' loads the whole signature database (hundreds of MB) on every run; clamd has it loaded
+# already. Files are streamed to it in chunks ("<4-byte big-endian length><data>", ended by a zero
+# length) over a small pool of persistent connections, each kept open in an IDSESSION so one
+# connection serves many files. A walker thread lists the files while the pool scans them, and
+# results are yielded as they come back:
+#
+#   pool = ConnectionPool(socket_path(), size=4)
+#   for result in scan_paths(["/home"], pool):
+#       if result.status == "found":
+#           print(result.path, result.signature)
+
+import fnmatch
+import os
+import queue
+import socket
+import stat
+import struct
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Debian/Ubuntu, Fedora, Arch; "LocalSocket" there is where clamd listens
+CLAMD_CONFS = ["/etc/clamav/clamd.conf", "/etc/clamd.d/scan.conf", "/etc/clamd.conf"]
+DEFAULT_SOCKET = "/run/clamav/clamd.ctl"
+CHUNK_SIZE = 64 * 1024
+# clamd's default StreamMaxLength; it cuts longer streams off with "INSTREAM size limit exceeded"
+DEFAULT_MAX_FILE_SIZE = 25 * 1024 * 1024
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TIMEOUT = 120
+# Pseudo filesystems: nothing to scan, and reading some of their files blocks
+DEFAULT_EXCLUDED_DIRS = ("/proc", "/sys", "/dev", "/run")
+
+ScanResult = namedtuple("ScanResult", ["path", "status", "signature", "detail"])
+# status: "found", "clean", "skipped" or "error"; signature: the virus name when found; detail: why skipped / the error
+
+class ClamdError(Exception):
+    pass
+
+def socket_path(conf_paths=CLAMD_CONFS):
+    """:return: The LocalSocket set in clamd.conf, or DEFAULT_SOCKET."""
+    for conf_path in conf_paths:
+        try:
+            with open(conf_path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    parts = line.split(None, 1)
+                    if len(parts) == 2 and parts[0] == "LocalSocket":
+                        return parts[1].strip().strip("\"'")
+        except OSError:
+            continue
+    return DEFAULT_SOCKET
+
+def parse_reply(reply):
+    """
+    "stream: Win.Test.EICAR_HDB-1 FOUND" -> ("found", "Win.Test.EICAR_HDB-1", "")
+    :return: (status, signature or None, detail) of an INSTREAM reply.
+    """
+    if reply.endswith(" FOUND"):
+        return "found", reply[:-len(" FOUND")].split(": ", 1)[-1], ""
+    if reply.endswith(": OK"):
+        return "clean", None, ""
+    return "error", None, reply[:-len(" ERROR")] if reply.endswith(" ERROR") else reply
+
+class ClamdConnection:
+    def __init__(self, path, timeout=DEFAULT_TIMEOUT):
+        """
+        Opens a connection and starts an IDSESSION on it, so it serves many commands.
+        :raises ClamdError: If clamd cannot be reached.
+        """
+        self.path = path
+        self.closed = False
+        self._buffer = b""
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(path)
+            self._socket.sendall(b"zIDSESSION\0")
+        except OSError as e:
+            self._socket.close()
+            self.closed = True
+            raise ClamdError(f"Cannot connect to clamd at {path}: {e}")
+
+    def _read_reply(self):
+        # Replies end with NUL; in a session they are prefixed with the command's number, "1: PONG"
+        while b"\0" not in self._buffer:
+            data = self._socket.recv(4096)
+            if not data:
+                raise ClamdError("clamd closed the connection")
+            self._buffer += data
+        reply, self._buffer = self._buffer.split(b"\0", 1)
+        reply = reply.decode("utf-8", "replace")
+        number, sep, text = reply.partition(": ")
+        return text if sep and number.isdigit() else reply
+
+    @contextmanager
+    def _exchange(self):
+        # Any failure mid-command leaves the session in an unknown state: the connection is dropped
+        try:
+            yield
+        except (OSError, ClamdError) as e:
+            self.close(graceful=False)
+            raise ClamdError(str(e) or e.__class__.__name__)
+
+    def ping(self):
+        """:return: True if clamd answered PONG."""
+        with self._exchange():
+            self._socket.sendall(b"zPING\0")
+            return self._read_reply() == "PONG"
+
+    def version(self):
+        """:return: "ClamAV 1.0.5/27062/Sat Oct 14 07:43:00 2023": engine, daily database version and its date."""
+        with self._exchange():
+            self._socket.sendall(b"zVERSION\0")
+            return self._read_reply()
+
+    def instream(self, f, max_size=DEFAULT_MAX_FILE_SIZE):
+        """
+        Streams an open file to clamd, at most max_size bytes of it.
+        :return: The reply, e.g. "stream: OK".
+        :raises ClamdError: If the connection fails; it is closed then.
+        :raises OSError: If the file cannot be read. The stream is still ended, so the connection stays usable.
+        """
+        read_error = None
+        with self._exchange():
+            self._socket.sendall(b"zINSTREAM\0")
+            remaining = max_size
+            while remaining > 0:
+                try:
+                    data = f.read(min(CHUNK_SIZE, remaining))
+                except OSError as e:
+                    read_error = e
+                    break
+                if not data:
+                    break
+                self._socket.sendall(struct.pack("!L", len(data)) + data)
+                remaining -= len(data)
+            self._socket.sendall(struct.pack("!L", 0))
+            reply = self._read_reply()
+        if read_error:
+            raise read_error
+        return reply
+
+    def close(self, graceful=True):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if graceful:
+                self._socket.sendall(b"zEND\0")
+        except OSError:
+            pass
+        self._socket.close()
+
+class ConnectionPool:
+    def __init__(self, path, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        """
+        At most size connections to clamd, opened when first needed and reused until closed.
+        clamd serves each connection with one of its MaxThreads, so the pool should stay below that.
+        """
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection, waiting while all of them are in use. A connection that failed is not returned to the pool."""
+        self._slots.acquire()
+        connection = None
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = ClamdConnection(self.path, self.timeout)
+            yield connection
+        finally:
+            if connection is not None and not connection.closed:
+                self._idle.put(connection)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _excluded(path, name, exclude):
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern) for pattern in exclude)
+
+def iter_files(paths, max_file_size=DEFAULT_MAX_FILE_SIZE, exclude=(), excluded_dirs=DEFAULT_EXCLUDED_DIRS, cross_filesystems=False):
+    """
+    Walks the paths without following symlinks.
+    :param exclude: fnmatch patterns matched against names and full paths, e.g. "*.iso" or "/home/*/.cache".
+    :param cross_filesystems: Descend into other mounted filesystems (network shares, removable media).
+    :return: Yields (path, None) for every file to scan and (path, reason) for every file skipped by the rules;
+             symlinks, empty files, FIFOs, sockets and devices are left out silently.
+    """
+    excluded_dirs = tuple(os.path.normpath(directory) for directory in excluded_dirs)
+    for top in paths:
+        top = os.path.abspath(top)
+        try:
+            top_stat = os.stat(top)
+        except OSError as e:
+            yield top, f"error: {e.strerror}"
+            continue
+        if stat.S_ISREG(top_stat.st_mode):
+            yield top, None if top_stat.st_size <= max_file_size else f"larger than {max_file_size} bytes"
+            continue
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                yield directory, f"error: {e.strerror}"
+                continue
+            for entry in entries:
+                if _excluded(entry.path, entry.name, exclude):
+                    yield entry.path, "excluded"
+                    continue
+                try:
+                    entry_stat = entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    yield entry.path, f"error: {e.strerror}"
+                    continue
+                if stat.S_ISDIR(entry_stat.st_mode):
+                    if entry.path in excluded_dirs or (not cross_filesystems and entry_stat.st_dev != top_stat.st_dev):
+                        continue
+                    stack.append(entry.path)
+                elif stat.S_ISREG(entry_stat.st_mode) and entry_stat.st_size:
+                    yield entry.path, None if entry_stat.st_size <= max_file_size else f"larger than {max_file_size} bytes"
+
+def scan_file(pool, path, max_file_size=DEFAULT_MAX_FILE_SIZE):
+    """:return: ScanResult of one file; a connection that broke (idle timeout, clamd restart) is replaced once."""
+    try:
+        f = open(path, "rb")
+    except OSError as e:
+        return ScanResult(path, "error", None, e.strerror)
+    with f:
+        for attempt in (1, 2):
+            try:
+                with pool.connection() as connection:
+                    status, signature, detail = parse_reply(connection.instream(f, max_file_size))
+                return ScanResult(path, status, signature, detail)
+            except ClamdError as e:
+                if attempt == 2:
+                    return ScanResult(path, "error", None, str(e))
+                f.seek(0)
+            except OSError as e:
+                return ScanResult(path, "error", None, e.strerror)
+
+_DONE = object()
+
+def scan_paths(paths, pool, max_file_size=DEFAULT_MAX_FILE_SIZE, exclude=(), excluded_dirs=DEFAULT_EXCLUDED_DIRS, cross_filesystems=False):
+    """
+    Scans files and directories with one worker per pooled connection while the walker lists more files.
+    :return: Yields a ScanResult for every file, in the order they finish (skipped ones included).
+    :raises ClamdError: Before scanning anything, if clamd does not answer.
+    """
+    with pool.connection() as connection:
+        if not connection.ping():
+            raise ClamdError(f"clamd at {pool.path} did not answer PING")
+
+    files = queue.Queue(maxsize=pool.size * 4)
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def put(target, item):
+        # Gives up once the consumer has stopped iterating
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def walk():
+        try:
+            for path, skipped in iter_files(paths, max_file_size, exclude, excluded_dirs, cross_filesystems):
+                if skipped is None:
+                    if not put(files, path):
+                        return
+                elif skipped.startswith("error: "):
+                    results.put(ScanResult(path, "error", None, skipped[len("error: "):]))
+                else:
+                    results.put(ScanResult(path, "skipped", None, skipped))
+        finally:
+            for _ in range(pool.size):
+                put(files, _DONE)
+
+    def work():
+        try:
+            while not stop.is_set():
+                try:
+                    path = files.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if path is _DONE:
+                    return
+                results.put(scan_file(pool, path, max_file_size))
+        finally:
+            results.put(_DONE)
+
+    threads = [threading.Thread(target=walk, name="clamd-walker", daemon=True)]
+    threads += [threading.Thread(target=work, name=f"clamd-scan-{n}", daemon=True) for n in range(pool.size)]
+    for thread in threads:
+        thread.start()
+    try:
+        running = pool.size
+        while running:
+            result = results.get()
+            # The walker queues its last result before the workers can see the end of the files
+            if result is _DONE:
+                running -= 1
+            else:
+                yield result
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -3,6 +3,7 @@
 
 import json
 import os
+import sys
 from pathlib import Path
 
 class ConfigManager:
@@ -22,6 +23,41 @@ class ConfigManager:
             },
             "general_settings": {
                 "dark_mode": False
+            },
+            "scan_settings": {
+                # Run checks on a bounded worker pool instead of one after another.
+                "concurrent": True,
+                "max_workers": 4,
+                # Wall-clock limit (seconds) for a single check before it is reported as timed out.
+                "check_timeout": 300,
+                # Cap on child processes running at once when checks use the asyncio engine.
+                "max_processes": 16
+            },
+            "update_settings": {
+                # Pending updates are read from the package lists already on disk; the scan never
+                # refreshes them. Older than this (days), the report suggests refreshing them.
+                "max_index_age_days": 7,
+                # Local security advisory dump matched against the installed packages: the Arch security
+                # tracker's all.json, or an OSV export such as Debian/all.zip. Empty disables the matching.
+                "advisory_dump": ""
+            },
+            "antivirus_settings": {
+                # ClamAV signatures built longer ago than this (days) are reported as outdated.
+                "max_signature_age_days": 7
+            },
+            "cache_settings": {
+                # Reuse results from earlier scans while they are younger than their TTL (seconds)
+                # and the files they depend on have not changed. 0 disables caching for a check.
+                "enabled": True,
+                "ttl": {
+                    "System Updates Status": 6 * 60 * 60,
+                    "Installed Software Updates": 6 * 60 * 60,
+                    "Antivirus Status": 60 * 60,
+                    "Weak Password Policies/Usage": 60 * 60,
+                    "Browser Security Settings": 10 * 60,
+                    "Firewall Status": 5 * 60,
+                    "Open Network Ports": 60
+                }
             }
         }
 
@@ -40,7 +76,7 @@ class ConfigManager:
                             merged_config[key] = value
                     return merged_config
             except json.JSONDecodeError:
-                print(f"Warning: Corrupted config file '{self.config_path}'. Using default settings.")
+                print(f"Warning: Corrupted config file '{self.config_path}'. Using default settings.", file=sys.stderr)
                 return self.default_config
         return self.default_config
 
@@ -49,7 +85,7 @@ class ConfigManager:
             with open(self.config_path, "w") as f:
                 json.dump(self.config, f, indent=4)
         except Exception as e:
-            print(f"Error saving config file: {e}")
+            print(f"Error saving config file: {e}", file=sys.stderr)
 
     def get_setting(self, category, key):
         return self.config.get(category, {}).get(key)
@@ -63,6 +99,18 @@ class ConfigManager:
     def get_all_check_settings(self):
         return self.config.get("checks_enabled", {})
     
+    def get_scan_settings(self):
+        return self.config.get("scan_settings", {})
+
+    def get_cache_settings(self):
+        return self.config.get("cache_settings", {})
+
+    def get_update_settings(self):
+        return self.config.get("update_settings", {})
+
+    def get_antivirus_settings(self):
+        return self.config.get("antivirus_settings", {})
+
     def set_check_enabled(self, check_name, enabled):
         if "checks_enabled" not in self.config:
             self.config["checks_enabled"] = {}
@@ -0,0 +1,291 @@
+# core/dpkg_db.py
+# Reads dpkg's status file and apt's downloaded Packages indexes directly, so pending upgrades are
+# computed without 'apt update' (network, root) or 'apt list' (no stable CLI interface).
+#
+# Both files are deb822 stanzas; they are memory-mapped and only the few fields needed are looked
+# up inside each stanza with bytes.find(), so a 60 MB Packages file is not split into lines.
+# Indexes are kept per path, keyed by mtime and size, so repeat scans skip unchanged files.
+# /etc/apt/preferences pins are not evaluated; only the default pin priorities (500, NotAutomatic
+# suites 1, ButAutomaticUpgrades 100) are applied, so every source apt would upgrade from by default is used.
+
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+import time
+from collections import namedtuple
+
+from core.versions import compare_versions
+
+DPKG_STATUS_FILE = "/var/lib/dpkg/status"
+APT_LISTS_DIR = "/var/lib/apt/lists"
+# Written by apt.systemd.daily after every successful update
+APT_UPDATE_STAMP = "/var/lib/apt/periodic/update-success-stamp"
+
+# apt's default pin priorities: regular suites, the installed version, NotAutomatic suites (experimental)
+DEFAULT_PRIORITY = 500
+INSTALLED_PRIORITY = 100
+NOT_AUTOMATIC_PRIORITY = 1
+
+INDEX_SUFFIXES = {"_Packages": None, "_Packages.gz": gzip.decompress, "_Packages.xz": lzma.decompress, "_Packages.bz2": bz2.decompress}
+
+InstalledPackage = namedtuple("InstalledPackage", ["name", "version", "architecture", "status", "held", "foreign", "source", "source_version"])
+# foreign: installed but in none of the indexes (obsolete, or installed from a local .deb)
+# source / source_version: the source package it was built from, which Debian security advisories are filed against
+PackageIndex = namedtuple("PackageIndex", ["path", "suite", "origin", "priority", "packages", "updated"])
+# packages: {(name, architecture): version}; priority: apt's default pin priority of the suite
+PendingUpgrade = namedtuple("PendingUpgrade", ["name", "architecture", "installed", "available", "suite", "security", "held"])
+
+# path -> ((mtime_ns, size), PackageIndex)
+_index_cache = {}
+
+class PackageIndexError(Exception):
+    pass
+
+def iter_stanza_fields(data, fields):
+    """
+    Yields a tuple with the values of the given fields (None when missing) for every stanza of a deb822 file.
+    :param data: bytes or mmap of the whole file.
+    :param fields: Field names as bytes, e.g. (b"Package", b"Version").
+    """
+    needles = [b"\n" + field + b": " for field in fields]
+    end = len(data)
+    position = 0
+    while position < end:
+        stanza_end = data.find(b"\n\n", position)
+        if stanza_end == -1:
+            stanza_end = end
+        if stanza_end > position:
+            # Searching from the newline before the stanza lets its first field match as well
+            start = position - 1 if position else 0
+            values = []
+            for field, needle in zip(fields, needles):
+                if start == 0 and data[:len(field) + 2] == field + b": ":
+                    found = len(field) + 2
+                else:
+                    found = data.find(needle, start, stanza_end)
+                    if found != -1:
+                        found += len(needle)
+                if found == -1:
+                    values.append(None)
+                    continue
+                line_end = data.find(b"\n", found, stanza_end)
+                values.append(data[found:line_end if line_end != -1 else stanza_end].decode("utf-8", "replace").strip())
+            yield tuple(values)
+        position = stanza_end + 2
+
+def _map(path):
+    """:return: (bytes-like contents, closer) with the file memory-mapped when it is not compressed."""
+    for suffix, decompress in INDEX_SUFFIXES.items():
+        if path.endswith(suffix) and decompress:
+            with open(path, "rb") as f:
+                return decompress(f.read()), None
+    f = open(path, "rb")
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b"", None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+    return mapped, mapped.close
+
+def read_status(path=DPKG_STATUS_FILE):
+    """
+    :return: [(name, version, architecture, status, held, source, source_version)] of every installed package
+             (status "installed", "half-configured", ...; not "config-files" or "not-installed").
+    :raises OSError: If the file cannot be read.
+    """
+    data, close = _map(path)
+    try:
+        packages = []
+        for name, status, version, architecture, source in iter_stanza_fields(data, (b"Package", b"Status", b"Version", b"Architecture", b"Source")):
+            if not name or not version or not status:
+                continue
+            # "install ok installed" / "hold ok installed": want, error flag, state
+            parts = status.split()
+            if len(parts) != 3 or parts[2] in ("not-installed", "config-files"):
+                continue
+            # "Source: openssl" or, when binNMU'd / versioned differently, "Source: openssl (3.0.11-1)"
+            source_name, _, source_version = (source or name).partition(" (")
+            packages.append((name, version, architecture or "all", parts[2], parts[0] == "hold", source_name, source_version.rstrip(")") or version))
+        return packages
+    finally:
+        if close:
+            close()
+
+def read_release(path):
+    """:return: The header fields of a Release/InRelease file ("Suite", "Origin", "NotAutomatic", ...)."""
+    fields = {}
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("-----BEGIN PGP SIGNATURE"):
+                break
+            if line[:1] in (" ", "\t", "-") or ": " not in line:
+                continue
+            key, value = line.rstrip("\n").split(": ", 1)
+            fields.setdefault(key, value.strip())
+    return fields
+
+def _index_files(lists_dir):
+    """:return: {Packages index path: path of its Release/InRelease file, or None}"""
+    names = sorted(os.listdir(lists_dir))
+    releases = [name for name in names if name.endswith(("_InRelease", "_Release"))]
+    indexes = {}
+    for name in names:
+        if not name.endswith(tuple(INDEX_SUFFIXES)) and not name.endswith("_Packages.lz4"):
+            continue
+        # The Release file sits at the longest prefix of the index name ("..._dists_bookworm-security_")
+        release = max((candidate for candidate in releases if name.startswith(candidate.rsplit("_", 1)[0] + "_")), key=len, default=None)
+        indexes[os.path.join(lists_dir, name)] = os.path.join(lists_dir, release) if release else None
+    return indexes
+
+def read_package_index(path, release_path=None):
+    """
+    :return: PackageIndex of one Packages file. Unchanged files come from the cache.
+    :raises OSError: If the file cannot be read.
+    :raises PackageIndexError: If it is compressed with a format the stdlib cannot read or is corrupt.
+    """
+    stat = os.stat(path)
+    file_key = (stat.st_mtime_ns, stat.st_size)
+    cached = _index_cache.get(path)
+    if cached and cached[0] == file_key:
+        return cached[1]
+    if path.endswith(".lz4"):
+        raise PackageIndexError(f"{path}: lz4-compressed indexes are not supported by this Python")
+
+    release = {}
+    if release_path:
+        try:
+            release = read_release(release_path)
+        except OSError:
+            pass
+    try:
+        data, close = _map(path)
+    except (EOFError, lzma.LZMAError, OSError, ValueError) as e:
+        raise PackageIndexError(f"{path}: {e}")
+    try:
+        packages = {}
+        for name, version, architecture in iter_stanza_fields(data, (b"Package", b"Version", b"Architecture")):
+            if not name or not version:
+                continue
+            key = (name, architecture or "all")
+            current = packages.get(key)
+            if current is None or compare_versions(version, current, "debian") > 0:
+                packages[key] = version
+    finally:
+        if close:
+            close()
+
+    # Backports are NotAutomatic with ButAutomaticUpgrades: never chosen on their own, but followed once installed
+    priority = DEFAULT_PRIORITY
+    if release.get("NotAutomatic", "").lower() == "yes":
+        priority = INSTALLED_PRIORITY if release.get("ButAutomaticUpgrades", "").lower() == "yes" else NOT_AUTOMATIC_PRIORITY
+    index = PackageIndex(path, release.get("Suite") or release.get("Codename") or "", release.get("Origin", ""), priority, packages, stat.st_mtime)
+    _index_cache[path] = (file_key, index)
+    return index
+
+def load_package_indexes(lists_dir=APT_LISTS_DIR):
+    """
+    :return: ([PackageIndex], [error strings])
+    :raises OSError: If the lists directory cannot be listed.
+    """
+    indexes, errors = [], []
+    for path, release_path in _index_files(lists_dir).items():
+        try:
+            indexes.append(read_package_index(path, release_path))
+        except (OSError, PackageIndexError) as e:
+            errors.append(str(e))
+    return indexes, errors
+
+def _native_architecture(rows):
+    # The architecture dpkg itself was built for ('dpkg --print-architecture')
+    for name, version, architecture, status, held, source, source_version in rows:
+        if name == "dpkg":
+            return architecture
+    return None
+
+def _display_name(name, architecture, native):
+    # As dpkg-query shows them: "libc6" for the native architecture, "libc6:i386" for others
+    return name if architecture in ("all", native) else f"{name}:{architecture}"
+
+def available_versions(indexes, name, architecture, native):
+    """:return: [(version, PackageIndex)] of a package in all indexes; looked up per package, the indexes hold the whole archive."""
+    # A package can move between "all" and an architecture from one version to the next
+    keys = [(name, architecture)] + [(name, other) for other in ("all", native) if other and other != architecture]
+    found = []
+    for index in indexes:
+        for key in keys:
+            version = index.packages.get(key)
+            if version is not None:
+                found.append((version, index))
+    return found
+
+def candidate_version(installed_version, available):
+    """
+    Picks the version apt would install, as its policy does with default pins: versions older than
+    the installed one are ignored (downgrades need a pin over 1000), then the highest priority wins
+    and the highest version among those. The installed version has priority 100, or its source's.
+    :param available: [(version, PackageIndex)]
+    :return: (version, PackageIndex or None for the installed version)
+    """
+    installed_priority = max([index.priority for version, index in available if version == installed_version] + [INSTALLED_PRIORITY])
+    best = (installed_version, None)
+    best_priority = installed_priority
+    for version, index in available:
+        if index.priority < best_priority or compare_versions(version, installed_version, "debian") <= 0:
+            continue
+        if index.priority > best_priority or compare_versions(version, best[0], "debian") > 0:
+            best, best_priority = (version, index), index.priority
+    return best
+
+def load_installed_packages(status_path=DPKG_STATUS_FILE, indexes=()):
+    """
+    :param indexes: [PackageIndex] used to tell which packages are foreign; without them none are.
+    :return: {name or "name:arch": InstalledPackage}
+    :raises OSError: If the status file cannot be read.
+    """
+    rows = read_status(status_path)
+    native = _native_architecture(rows)
+    packages = {}
+    for name, version, architecture, status, held, source, source_version in rows:
+        foreign = bool(indexes) and not available_versions(indexes, name, architecture, native)
+        packages[_display_name(name, architecture, native)] = InstalledPackage(name, version, architecture, status, held, foreign, source, source_version)
+    return packages
+
+def pending_upgrades(installed, indexes):
+    """
+    Installed packages with a newer candidate version (what 'apt list --upgradable' lists).
+    :param installed: {key: InstalledPackage} from load_installed_packages()
+    :return: [PendingUpgrade] sorted by name.
+    """
+    natives = [package.architecture for package in installed.values() if package.name == "dpkg"]
+    native = natives[0] if natives else None
+    upgrades = []
+    for key in sorted(installed):
+        package = installed[key]
+        available = available_versions(indexes, package.name, package.architecture, native)
+        if not available:
+            continue
+        version, index = candidate_version(package.version, available)
+        if index is None:
+            continue
+        upgrades.append(PendingUpgrade(key, package.architecture, package.version, version, index.suite,
+                                       index.suite.endswith("-security") or "security" in os.path.basename(index.path), package.held))
+    return upgrades
+
+def lists_age(lists_dir=APT_LISTS_DIR, stamp=APT_UPDATE_STAMP, now=None):
+    """
+    :return: Seconds since the package lists were last refreshed, or None if that cannot be told.
+             apt dates downloaded files with the server's Last-Modified time, so the update stamp and the
+             directories apt touches on every run are used instead of the index files themselves.
+    """
+    times = []
+    for path in (stamp, lists_dir, os.path.join(lists_dir, "partial")):
+        try:
+            times.append(os.stat(path).st_mtime)
+        except OSError:
+            continue
+    if not times:
+        return None
+    return max(0.0, (now or time.time()) - max(times))
@@ -0,0 +1,150 @@
+# core/executors.py
+# Pluggable backends behind core.utils.run_command:
+#   LiveExecutor   - spawns the command (the default).
+#   RecordExecutor - spawns the command and saves argv -> (stdout, stderr, return_code) to a JSON fixture.
+#   ReplayExecutor - answers from a fixture without spawning anything, so parsers can be run
+#                    deterministically against another machine's output (see benchmarks/).
+#
+# The mode can also be chosen without code changes:
+#   HEL_SEC_AUDIT_EXECUTOR=record:/tmp/arch.json python main.py
+#   HEL_SEC_AUDIT_EXECUTOR=replay:/tmp/arch.json python main.py
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from core.instrumentation import TimedPopen, record_command
+
+EXECUTOR_ENV_VAR = "HEL_SEC_AUDIT_EXECUTOR"
+
+class LiveExecutor:
+    # True when run() starts real processes; run_command_async only asks replaying executors directly.
+    spawns = True
+
+    def run(self, command):
+        """
+        Runs a command and captures its output and return code.
+        :param command: A list of strings representing the command and its arguments.
+        :return: Tuple of (stdout, stderr, return_code).
+        """
+        try:
+            # Use shell=True for windows commands that are not direct executables
+            # but rely on shell features (e.g., 'dir', 'type').
+            # However, for security and consistency, it's generally better to avoid shell=True
+            # unless absolutely necessary. For simple commands like 'apt' or 'pacman',
+            # shell=False is preferred.
+            started = time.perf_counter()
+            # TimedPopen keeps the child's resource usage for the per-check timing block (core/instrumentation.py)
+            process = TimedPopen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,  # Decode stdout/stderr as text
+                encoding='utf-8', # Specify encoding
+                errors='ignore' # Ignore decoding errors
+            )
+            stdout, stderr = process.communicate()
+            # Decoded length; the same as the byte count for the ASCII output of the tools we run.
+            record_command(command, time.perf_counter() - started, process.cpu_time, len(stdout) + len(stderr), process.returncode)
+            return stdout, stderr, process.returncode
+        except FileNotFoundError:
+            return "", f"Error: Command '{command[0]}' not found.", 127
+        except Exception as e:
+            return "", f"An error occurred while running command: {e}", 1
+
+    def record(self, command, result):
+        """Called with the outcome of every command that was run outside run() (e.g. by run_command_async)."""
+        pass
+
+class RecordExecutor(LiveExecutor):
+    def __init__(self, fixture_path):
+        self.fixture_path = fixture_path
+        self.entries = load_fixture(fixture_path) if os.path.exists(fixture_path) else {}
+        self._lock = threading.Lock()
+
+    def run(self, command):
+        result = super().run(command)
+        self.record(command, result)
+        return result
+
+    def record(self, command, result):
+        with self._lock:
+            self.entries[tuple(command)] = tuple(result)
+            # A scan runs only a handful of commands, so saving after each one is cheap and survives a crash.
+            save_fixture(self.fixture_path, self.entries)
+
+class ReplayExecutor:
+    spawns = False
+
+    def __init__(self, fixture):
+        """
+        :param fixture: Path of a fixture written by RecordExecutor, or a dict {tuple(argv): (stdout, stderr, return_code)}.
+        """
+        self.entries = load_fixture(fixture) if isinstance(fixture, str) else dict(fixture)
+
+    def run(self, command):
+        result = self.entries.get(tuple(command))
+        if result is None:
+            # Same shape as a missing binary, so checks report it like any other failed probe.
+            return "", f"Error: No recorded output for command '{' '.join(command)}'.", 127
+        return result
+
+    def record(self, command, result):
+        pass
+
+def load_fixture(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        tuple(entry["argv"]): (entry["stdout"], entry["stderr"], entry["return_code"])
+        for entry in data.get("commands", [])
+    }
+
+def save_fixture(path, entries):
+    data = {
+        "commands": [
+            {"argv": list(argv), "stdout": stdout, "stderr": stderr, "return_code": return_code}
+            for argv, (stdout, stderr, return_code) in entries.items()
+        ]
+    }
+    # Write to a temporary file first so a crash never leaves a half-written fixture behind.
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    os.replace(temp_path, path)
+
+def executor_from_environment():
+    """:return: The executor selected by $HEL_SEC_AUDIT_EXECUTOR ("live", "record:<path>" or "replay:<path>")."""
+    value = os.environ.get(EXECUTOR_ENV_VAR, "live")
+    mode, _, path = value.partition(":")
+    if mode == "record" and path:
+        return RecordExecutor(path)
+    if mode == "replay" and path:
+        return ReplayExecutor(path)
+    if mode != "live":
+        print(f"Warning: Unknown {EXECUTOR_ENV_VAR} value '{value}'. Running commands live.", file=sys.stderr)
+    return LiveExecutor()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = executor_from_environment()
+        return _executor
+
+def set_executor(executor):
+    """
+    Replaces the executor used by run_command and run_command_async for the whole process.
+    :return: The previous executor, so callers can restore it.
+    """
+    global _executor
+    with _executor_lock:
+        previous = _executor
+        _executor = executor
+    return previous
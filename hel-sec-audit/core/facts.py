@@ -0,0 +1,399 @@
+# core/facts.py
+# Shared system facts (package manager, pending updates, unit states, sockets, firewall rules) computed once per scan.
+# Checks declare the facts they need in self.required_facts and read them through a FactProvider,
+# so an expensive probe like reading the apt lists or 'nft -j list ruleset' runs at most once no matter how many checks use it.
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from core.utils import run_command, is_linux
+from core.async_utils import run_in_thread
+from core.fingerprints import recording_inputs, replay_inputs, record_input, record_tree, mark_volatile
+from core.instrumentation import timing_scope, record_fact
+from core.proc_net import read_listening_sockets
+from core import firewall_rules
+from core.systemd_units import UnitStates
+from core import advisories, dpkg_db, pacman_db, pacman_sync
+
+# name -> (function, dependencies). Parametrized facts are looked up as "family[param]", e.g. "unit_state[ufw]".
+_FACT_DEFINITIONS = {}
+
+def fact(name, depends_on=()):
+    """Registers a fact function. The function is called as func(facts, param) and its value is memoized per provider."""
+    def decorator(func):
+        _FACT_DEFINITIONS[name] = (func, tuple(depends_on))
+        return func
+    return decorator
+
+def _split_fact_name(name):
+    # "unit_state[ufw]" -> ("unit_state", "ufw"); "package_manager" -> ("package_manager", None)
+    if name.endswith("]") and "[" in name:
+        family, param = name[:-1].split("[", 1)
+        return family, param
+    return name, None
+
+class FactProvider:
+    def __init__(self, preset=None):
+        """
+        :param preset: Optional {fact name: value} used instead of computing those facts,
+                       e.g. package_manager when replaying another machine's recorded output.
+        """
+        self._futures = {}
+        for name, value in (preset or {}).items():
+            future = Future()
+            future.set_result(value)
+            self._futures[name] = future
+        # Files each fact read while it was computed, handed on to every check that uses the fact.
+        self._inputs = {}
+        # Commands each fact ran, reported once as a shared cost (see core/instrumentation.py).
+        self._timings = {}
+        # Every fact name asked for so far, so batched facts know what to fetch (see "unit_states").
+        self._requested = set()
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        Returns the value of a fact, computing it on first use.
+        Concurrent callers asking for the same fact wait for a single computation.
+        """
+        with self._lock:
+            self._requested.add(name)
+            future = self._futures.get(name)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._futures[name] = future
+
+        if is_owner:
+            with recording_inputs() as recorder:
+                with timing_scope() as timing:
+                    try:
+                        value = self._compute(name)
+                    except Exception as e:
+                        error = e
+                    else:
+                        error = None
+                self._inputs[name] = recorder
+                self._timings[name] = timing.to_dict()
+                if error is None:
+                    future.set_result(value)
+                else:
+                    future.set_exception(error)
+        value = future.result()
+        replay_inputs(self._inputs.get(name))
+        record_fact(name, self._timings.get(name))
+        return value
+
+    def resolve(self, names, max_workers=4):
+        """
+        Computes the given facts and everything they depend on.
+        Facts are grouped into dependency levels; each level runs in parallel once the previous one is done.
+        """
+        with self._lock:
+            self._requested.update(names)
+        levels = self._dependency_levels(names)
+        if max_workers <= 1:
+            for level in levels:
+                for name in level:
+                    self.get(name)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hel-sec-fact") as executor:
+            for level in levels:
+                # Errors are re-raised to whichever check reads the fact, not here.
+                list(executor.map(self._get_quietly, level))
+
+    def requested_params(self, family):
+        """:return: Parameters of every "family[param]" fact asked for so far, e.g. the units of "unit_state[...]"."""
+        with self._lock:
+            names = list(self._requested)
+        return sorted({param for family_name, param in map(_split_fact_name, names) if family_name == family and param})
+
+    async def resolve_async(self, names):
+        await run_in_thread(self.resolve, names)
+
+    def _get_quietly(self, name):
+        try:
+            self.get(name)
+        except Exception:
+            pass
+
+    def _compute(self, name):
+        family, param = _split_fact_name(name)
+        if family not in _FACT_DEFINITIONS:
+            raise KeyError(f"Unknown fact: {name}")
+        func, depends_on = _FACT_DEFINITIONS[family]
+        return func(self, param)
+
+    def _dependency_levels(self, names):
+        depth = {}
+
+        def visit(name, stack=()):
+            if name in depth:
+                return depth[name]
+            if name in stack:
+                raise ValueError(f"Circular fact dependency: {' -> '.join(stack + (name,))}")
+            family, param = _split_fact_name(name)
+            func, depends_on = _FACT_DEFINITIONS.get(family, (None, ()))
+            depth[name] = 1 + max((visit(dep, stack + (name,)) for dep in depends_on), default=-1)
+            return depth[name]
+
+        for name in names:
+            visit(name)
+
+        levels = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for name, level in depth.items():
+            levels[level].append(name)
+        return levels
+
+
+@fact("package_manager")
+def _package_manager(facts, param):
+    # Detected from the filesystem only, no process needed.
+    if not is_linux():
+        return None
+    record_input("/usr/bin/apt")
+    record_input("/usr/bin/pacman")
+    if os.path.exists("/usr/bin/apt"):
+        return "apt"
+    if os.path.exists("/usr/bin/pacman"):
+        return "pacman"
+    return None
+
+@fact("package_indexes", depends_on=["package_manager"])
+def _package_indexes(facts, param):
+    """
+    apt's downloaded Packages indexes, read as they are: refreshing them ('apt update') needs the
+    network and root, so the scan stays read-only and reports how old they are instead.
+    :return: {"indexes": [dpkg_db.PackageIndex], "errors": [str], "age": seconds or None}, or None when not on apt.
+    """
+    if facts.get("package_manager") != "apt":
+        return None
+    record_tree(dpkg_db.APT_LISTS_DIR)
+    record_input(dpkg_db.APT_UPDATE_STAMP)
+    try:
+        indexes, errors = dpkg_db.load_package_indexes()
+    except OSError as e:
+        indexes, errors = [], [str(e)]
+    return {"indexes": indexes, "errors": errors, "age": dpkg_db.lists_age()}
+
+@fact("installed_packages", depends_on=["package_manager", "package_indexes"])
+def _installed_packages(facts, param):
+    """
+    Read from the package manager's database directly (see core/pacman_db.py and core/dpkg_db.py),
+    so no 'pacman -Q' / 'dpkg-query' process is spawned.
+    :return: {"ok": bool, "packages": {name: pacman_db.InstalledPackage | dpkg_db.InstalledPackage}, "error": str},
+             or None without a known package manager. Both package types have "name", "version" and "foreign".
+    """
+    package_manager = facts.get("package_manager")
+    try:
+        if package_manager == "pacman":
+            record_input(pacman_db.PACMAN_LOCAL_DIR)
+            record_tree(pacman_db.PACMAN_SYNC_DIR)
+            return {"ok": True, "packages": pacman_db.load_installed_packages(), "error": ""}
+        if package_manager == "apt":
+            record_input(dpkg_db.DPKG_STATUS_FILE)
+            return {"ok": True, "packages": dpkg_db.load_installed_packages(indexes=facts.get("package_indexes")["indexes"]), "error": ""}
+    except OSError as e:
+        return {"ok": False, "packages": {}, "error": str(e)}
+    return None
+
+def _split_apt_line(line):
+    # "openssl/jammy-updates 3.0.2-0ubuntu1.15 amd64 [upgradable from: 3.0.2-0ubuntu1.14]" -> ("openssl", "3.0.2-0ubuntu1.15", "3.0.2-0ubuntu1.14")
+    parts = line.split()
+    name = line.split("/")[0].strip()
+    available = parts[1] if len(parts) > 1 else None
+    installed = parts[-1].rstrip("]") if "from:" in line else None
+    return name, available, installed
+
+def _split_pacman_line(line):
+    # "linux 6.9.1.arch1-1 -> 6.9.2.arch1-1" -> ("linux", "6.9.1.arch1-1", "6.9.2.arch1-1")
+    parts = line.split()
+    if len(parts) >= 4 and parts[2] == "->":
+        return parts[0], parts[1], parts[3]
+    return (parts[0] if parts else ""), None, None
+
+@fact("upgradable_packages", depends_on=["package_manager", "package_indexes", "installed_packages"])
+def _upgradable_packages(facts, param):
+    """
+    :return: {"ok": bool, "packages": [{"name", "line", "installed", "available"[, "repository", "reason", "foreign", "ignored",
+             "security", "held"]}], "error": str[, "databases", "sync_age"]}, or None without a known package manager.
+             Versions are None when a line could not be split. The list is computed from the package databases
+             (see core/pacman_sync.py and core/dpkg_db.py); "databases" then lists [{"repository", "packages", "updated"}]
+             and "sync_age" is the seconds since they were last refreshed (None if unknown). An empty "databases"
+             list means no package list was ever downloaded.
+    """
+    package_manager = facts.get("package_manager")
+
+    if package_manager == "apt":
+        record_input(dpkg_db.DPKG_STATUS_FILE)
+        record_tree(dpkg_db.APT_LISTS_DIR)
+        installed = facts.get("installed_packages")
+        lists = facts.get("package_indexes")
+        if installed["ok"] and lists["indexes"] and not lists["errors"]:
+            packages = []
+            for upgrade in dpkg_db.pending_upgrades(installed["packages"], lists["indexes"]):
+                packages.append({
+                    "name": upgrade.name,
+                    "line": f"{upgrade.name}/{upgrade.suite} {upgrade.available} {upgrade.architecture} [upgradable from: {upgrade.installed}]",
+                    "installed": upgrade.installed, "available": upgrade.available, "repository": upgrade.suite,
+                    "security": upgrade.security, "held": upgrade.held,
+                })
+            return {"ok": True, "packages": packages, "error": "",
+                    "databases": [{"repository": index.suite or os.path.basename(index.path), "packages": len(index.packages), "updated": index.updated} for index in lists["indexes"]],
+                    "sync_age": lists["age"]}
+
+        # Indexes the stdlib cannot read (lz4) or no lists at all: let apt compute it from the same lists.
+        stdout, stderr, return_code = run_command(["apt", "list", "--upgradable"])
+        lines = [line for line in stdout.splitlines() if "upgradable" in line and not line.startswith("Listing...")]
+        packages = [dict(zip(("name", "available", "installed"), _split_apt_line(line)), line=line) for line in lines]
+        if lists["indexes"] or lists["errors"]:
+            return {"ok": return_code == 0, "packages": packages, "error": stderr}
+        # No lists at all: apt has nothing to compare against either, so an empty list here is not "up to date"
+        return {"ok": return_code == 0, "packages": packages, "error": stderr, "databases": [], "sync_age": lists["age"]}
+
+    if package_manager == "pacman":
+        record_input(pacman_db.PACMAN_LOCAL_DIR)
+        record_tree(pacman_sync.PACMAN_SYNC_DIR)
+        record_input(pacman_sync.PACMAN_CONF)
+        installed = facts.get("installed_packages")
+        try:
+            databases, errors = pacman_sync.load_sync_databases()
+        except OSError as e:
+            databases, errors = [], [str(e)]
+        if installed["ok"] and databases and not errors:
+            _, ignored = pacman_sync.read_pacman_conf()
+            packages = []
+            for update in pacman_sync.pending_updates(installed["packages"], databases, ignored):
+                package = installed["packages"][update.name]
+                packages.append({
+                    "name": update.name,
+                    "line": f"{update.name} {update.installed} -> {update.available}" + (" [ignored]" if update.ignored else ""),
+                    "installed": update.installed, "available": update.available, "repository": update.repository,
+                    "reason": package.reason, "foreign": package.foreign, "ignored": update.ignored,
+                })
+            return {"ok": True, "packages": packages, "error": "",
+                    "databases": [{"repository": database.repository, "packages": len(database.packages), "updated": database.updated} for database in databases],
+                    "sync_age": pacman_sync.database_age(databases)}
+
+        # A database the stdlib cannot read (zstd) or no local index: let pacman compute it.
+        stdout, stderr, return_code = run_command(["pacman", "-Qu"])
+        # pacman -Qu exits with 1 when there is simply nothing to upgrade.
+        ok = return_code == 0 or (return_code == 1 and not stdout.strip() and not stderr.strip())
+        # Each line is typically "package_name old_version -> new_version"
+        lines = [line for line in stdout.splitlines() if line.strip()]
+        packages = []
+        for line in lines:
+            name, old_version, new_version = _split_pacman_line(line)
+            package = {"name": name, "line": line, "installed": old_version, "available": new_version}
+            if name in installed["packages"]:
+                package["reason"] = installed["packages"][name].reason
+                package["foreign"] = installed["packages"][name].foreign
+            packages.append(package)
+        return {"ok": ok, "packages": packages, "error": stderr}
+
+    return None
+
+@fact("vulnerable_packages", depends_on=["package_manager", "installed_packages"])
+def _vulnerable_packages(facts, dump_path):
+    """
+    Installed packages matched against a local advisory dump (see core/advisories.py), e.g. "vulnerable_packages[/path/all.json]".
+    :return: {"ok": bool, "vulnerabilities": [advisories.Vulnerability], "advisories": int, "error": str},
+             or None without a dump or a known package manager.
+    """
+    scheme = advisories.PACKAGE_MANAGER_SCHEMES.get(facts.get("package_manager"))
+    installed = facts.get("installed_packages")
+    if not dump_path or scheme is None or installed is None:
+        return None
+    record_input(dump_path)
+    if not installed["ok"]:
+        return {"ok": False, "vulnerabilities": [], "advisories": 0, "error": installed["error"]}
+    # OSV dumps hold every release's fixed versions; only the running one's apply
+    ecosystem = None
+    if scheme == "debian":
+        record_input(advisories.OS_RELEASE)
+        ecosystem = advisories.os_release_ecosystem()
+    try:
+        index = advisories.load_index(dump_path, scheme, ecosystem)
+    except (OSError, advisories.AdvisoryDumpError) as e:
+        return {"ok": False, "vulnerabilities": [], "advisories": 0, "error": str(e)}
+    return {"ok": True, "vulnerabilities": advisories.match_installed(index, installed["packages"]),
+            "advisories": len(index.advisories), "error": ""}
+
+@fact("unit_states")
+def _unit_states(facts, param):
+    """
+    :return: systemd_units.UnitStates, already holding every unit asked for as "unit_state[...]" so far,
+             fetched with one 'systemctl show'. Units asked for later are fetched on demand.
+    """
+    mark_volatile()
+    states = UnitStates()
+    states.load(facts.requested_params("unit_state"))
+    return states
+
+@fact("unit_state", depends_on=["unit_states"])
+def _unit_state(facts, unit):
+    """:return: The unit's ActiveState ("active", "inactive", "failed", ... as 'systemctl is-active' prints it), or None."""
+    return facts.get("unit_states").active_state(unit)
+
+@fact("listening_sockets")
+def _listening_sockets(facts, param):
+    """
+    Read from /proc/net directly, so no 'ss' or 'netstat' process is spawned.
+    :return: {"ok": bool, "sockets": [proc_net.ListeningSocket], "error": str}
+    """
+    mark_volatile()
+    try:
+        return {"ok": True, "sockets": read_listening_sockets(), "error": ""}
+    except OSError as e:
+        return {"ok": False, "sockets": [], "error": str(e)}
+
+@fact("firewall_ruleset")
+def _firewall_ruleset(facts, param):
+    """
+    One read of the packet filter ruleset: 'nft -j list ruleset', else 'iptables-save'/'ip6tables-save'
+    (legacy iptables rules are invisible to nft), else UFW's rule files when UFW is enabled.
+    :return: {"ok": bool, "ruleset": firewall_rules.Ruleset or None, "error": str}
+    """
+    errors = []
+    nft_ruleset = None
+    stdout, stderr, return_code = run_command(firewall_rules.NFT_RULESET_COMMAND, sudo_required=True)
+    if return_code == 0:
+        mark_volatile()
+        try:
+            nft_ruleset = firewall_rules.parse_nft_json(stdout)
+        except ValueError as e:
+            errors.append(f"nft: {e}")
+        else:
+            if nft_ruleset.by_hook:
+                return {"ok": True, "ruleset": nft_ruleset, "error": ""}
+    else:
+        errors.append(f"nft: {stderr.strip() or f'exit code {return_code}'}")
+
+    stdout, stderr, return_code = run_command(firewall_rules.IPTABLES_SAVE_COMMAND, sudo_required=True)
+    if return_code == 0:
+        mark_volatile()
+        ruleset = firewall_rules.parse_iptables_save(stdout, "ip")
+        stdout, stderr, return_code = run_command(firewall_rules.IP6TABLES_SAVE_COMMAND, sudo_required=True)
+        if return_code == 0:
+            firewall_rules.parse_iptables_save(stdout, "ip6", ruleset)
+        return {"ok": True, "ruleset": ruleset, "error": ""}
+    errors.append(f"iptables-save: {stderr.strip() or f'exit code {return_code}'}")
+    if nft_ruleset is not None:
+        # nft works and there is simply no base chain
+        return {"ok": True, "ruleset": nft_ruleset, "error": ""}
+
+    for path in [firewall_rules.UFW_ENABLED_FILE, firewall_rules.UFW_DEFAULTS_FILE, *firewall_rules.UFW_RULE_FILES.values()]:
+        record_input(path)
+    try:
+        ufw_ruleset = firewall_rules.load_ufw_files()
+    except OSError as e:
+        errors.append(f"ufw: {e}")
+    else:
+        if ufw_ruleset.input_chains():
+            return {"ok": True, "ruleset": ufw_ruleset, "error": ""}
+        # A disabled UFW says nothing about firewalld or other rules the live ruleset would have shown,
+        # so the checks still get to ask the frontends
+        errors.append("ufw: UFW is disabled")
+    return {"ok": False, "ruleset": None, "error": "; ".join(errors)}
@@ -0,0 +1,82 @@
+# core/fingerprints.py
+# Records which files a check consumed, as (path, inode, size, mtime_ns) fingerprints,
+# so an incremental rescan can skip checks whose inputs did not change.
+#
+# Checks call record_input()/record_tree() for every file they read and mark_volatile() when
+# they depend on live state that no file captures (running services, open sockets).
+# The scanner wraps each check in recording_inputs() to collect them.
+
+import contextvars
+import os
+from contextlib import contextmanager
+
+_current_recorder = contextvars.ContextVar("hel_sec_audit_input_recorder", default=None)
+
+class InputRecorder:
+    def __init__(self):
+        self.files = {}
+        self.volatile = False
+
+    def add(self, fingerprint):
+        self.files[fingerprint[0]] = fingerprint
+
+    def merge(self, other):
+        self.files.update(other.files)
+        self.volatile = self.volatile or other.volatile
+
+    def to_dict(self):
+        return {"files": list(self.files.values()), "volatile": self.volatile}
+
+def file_fingerprint(path):
+    """:return: [path, inode, size, mtime_ns]; the last three are None when the path does not exist."""
+    try:
+        st = os.stat(path)
+        return [path, st.st_ino, st.st_size, st.st_mtime_ns]
+    except OSError:
+        return [path, None, None, None]
+
+def record_input(path):
+    """Records a file (or directory) the current check read. Missing paths are recorded too, so their creation is noticed."""
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.add(file_fingerprint(path))
+
+def record_tree(path):
+    """Records a directory and every file below it, e.g. /etc/pam.d before grepping it."""
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return
+    recorder.add(file_fingerprint(path))
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            recorder.add(file_fingerprint(os.path.join(root, name)))
+
+def mark_volatile():
+    """Marks the current check as depending on live state, so its result is never reused without re-running it."""
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.volatile = True
+
+def replay_inputs(recorder):
+    """Adds inputs recorded elsewhere (e.g. while computing a shared fact) to the current check."""
+    current = _current_recorder.get()
+    if current is not None and recorder is not None:
+        current.merge(recorder)
+
+@contextmanager
+def recording_inputs():
+    recorder = InputRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+def inputs_unchanged(inputs):
+    """
+    :param inputs: The {"files": [...], "volatile": bool} block stored with a previous result.
+    :return: True when the previous result can be reused as-is.
+    """
+    if not inputs or inputs.get("volatile") or not inputs.get("files"):
+        return False
+    return all(file_fingerprint(fingerprint[0]) == list(fingerprint) for fingerprint in inputs["files"])
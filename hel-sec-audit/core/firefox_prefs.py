@@ -0,0 +1,246 @@
+# core/firefox_prefs.py
+# Tokenizer and parser for Firefox preference files (prefs.js, user.js, syspref.js and the
+# defaults/pref/*.js files of an installation), and the effective preferences of a profile.
+#
+# A preference file is a list of statements such as
+#   user_pref("network.trr.mode", 3);
+#   pref("dom.security.https_only_mode", true, locked);   // default value, locked
+#   lockPref("browser.safebrowsing.malware.enabled", true);
+# with //, # and /* */ comments and arbitrary whitespace. Like Firefox, the parser skips a
+# malformed statement and carries on with the next one.
+#
+# Layering, lowest first: pref()/sticky_pref() set the default value, user_pref() the user value,
+# later files and later statements override earlier ones (user.js is read after prefs.js, so it
+# wins), and a locked preference always has its default value.
+#
+# Parsed files are kept in a bounded LRU cache keyed by (path, size, mtime_ns): prefs.js often grows
+# to several MB, and a repeat scan of an unchanged file costs one stat call.
+
+import glob
+import os
+import re
+import threading
+from collections import ChainMap, namedtuple, OrderedDict
+
+# Installation-wide defaults: Debian/Ubuntu, Fedora, Arch and the ESR builds
+SYSTEM_PREF_PATTERNS = [
+    "/etc/firefox/syspref.js",
+    "/etc/firefox/pref/*.js",
+    "/etc/firefox-esr/*.js",
+    "/usr/lib/firefox/defaults/pref/*.js",
+    "/usr/lib/firefox/browser/defaults/preferences/*.js",
+    "/usr/lib64/firefox/defaults/pref/*.js",
+    "/usr/lib64/firefox/browser/defaults/preferences/*.js",
+    "/usr/lib/firefox-esr/defaults/pref/*.js",
+]
+PROFILE_PREF_FILES = ("prefs.js", "user.js")
+
+# Bounds of the parse cache: whichever is reached first evicts the least recently used file
+CACHE_MAX_FILES = 4096
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+PrefsFile = namedtuple("PrefsFile", ["defaults", "user", "locked", "errors"])
+# defaults / user: {name: value}, value a str, int or bool; locked: {name}; errors: statements skipped as malformed
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|\#[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<number>[-+]?\d+)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<punct>[(),;])
+  | (?P<error>.)
+""", re.VERBOSE | re.DOTALL)
+# The usual one-statement-per-line form, matched whole; anything else goes through the tokenizer
+_STATEMENT = re.compile(r"""
+    \s*(user_pref|pref|lockPref|sticky_pref)\s*\(\s*
+    ("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')\s*,\s*
+    ("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|[-+]?\d+|true|false)\s*
+    (?:,\s*(sticky|locked)\s*)?\)\s*;
+""", re.VERBOSE | re.DOTALL)
+_ESCAPE = re.compile(r"\\(?:x([0-9A-Fa-f]{2})|u([0-9A-Fa-f]{4})|(.))", re.DOTALL)
+_SIMPLE_ESCAPES = {"n": "\n", "r": "\r", "t": "\t"}
+_STATEMENTS = {"pref", "user_pref", "sticky_pref", "lockPref"}
+_ATTRIBUTES = {"sticky", "locked"}
+
+# path -> ((size, mtime_ns), PrefsFile), least recently used first
+_file_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+def _token(match):
+    kind = match.lastgroup
+    value = match.group()
+    if kind == "string":
+        value = _unescape(value[1:-1])
+    elif kind == "number":
+        value = int(value)
+    return kind, value
+
+def tokenize(text):
+    """
+    'user_pref("a", 1);' -> ("name", "user_pref"), ("punct", "("), ("string", "a"), ("punct", ","), ...
+    :return: Yields (kind, value) tokens; strings are unescaped, numbers converted, whitespace and comments dropped.
+    """
+    for match in _TOKEN.finditer(text):
+        if match.lastgroup != "space" and match.lastgroup != "comment":
+            yield _token(match)
+
+def _unescape_one(match):
+    hex_code, unicode_code, char = match.groups()
+    if hex_code or unicode_code:
+        return chr(int(hex_code or unicode_code, 16))
+    return _SIMPLE_ESCAPES.get(char, char)
+
+def _unescape(text):
+    if "\\" not in text:
+        return text
+    text = _ESCAPE.sub(_unescape_one, text)
+    # Characters outside the BMP are written as two \u escapes: join the surrogate pairs
+    return text.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+
+def _parse_statement(tokens):
+    # kind ( "name" , value [, attribute]* )  ->  (kind, name, value, {attributes}), or None if malformed
+    if (len(tokens) < 6 or len(tokens) % 2 or tokens[0][0] != "name" or tokens[0][1] not in _STATEMENTS
+            or tokens[1] != ("punct", "(") or tokens[2][0] != "string" or tokens[3] != ("punct", ",") or tokens[-1] != ("punct", ")")):
+        return None
+    kind, value = tokens[4]
+    if kind == "name" and value in ("true", "false"):
+        value = value == "true"
+    elif kind not in ("string", "number"):
+        return None
+    attributes = set()
+    for position in range(5, len(tokens) - 1, 2):
+        attribute = tokens[position + 1]
+        if tokens[position] != ("punct", ",") or attribute[0] != "name" or attribute[1] not in _ATTRIBUTES:
+            return None
+        attributes.add(attribute[1])
+    return tokens[0][1], tokens[2][1], value, attributes
+
+def _tokenize_statement(text, pos):
+    # :return: (tokens up to the next ";", position after it, whether a ";" was found)
+    tokens = []
+    end = len(text)
+    while pos < end:
+        match = _TOKEN.match(text, pos)
+        pos = match.end()
+        if match.lastgroup == "space" or match.lastgroup == "comment":
+            continue
+        token = _token(match)
+        if token == ("punct", ";"):
+            return tokens, pos, True
+        tokens.append(token)
+    return tokens, pos, False
+
+def parse_prefs(text):
+    """:return: PrefsFile of a preference file's text."""
+    defaults, user, locked = {}, {}, set()
+    errors = 0
+    pos, end = 0, len(text)
+    while pos < end:
+        match = _STATEMENT.match(text, pos)
+        if match:
+            pos = match.end()
+            kind, name, value, attribute = match.groups()
+            name = _unescape(name[1:-1])
+            if value[0] in "\"'":
+                value = _unescape(value[1:-1])
+            elif value == "true" or value == "false":
+                value = value == "true"
+            else:
+                value = int(value)
+            attributes = {attribute} if attribute else ()
+        else:
+            tokens, pos, terminated = _tokenize_statement(text, pos)
+            if not tokens:
+                continue
+            parsed = _parse_statement(tokens) if terminated else None
+            if parsed is None:
+                # Skipped up to its ";", as Firefox does after a syntax error
+                errors += 1
+                continue
+            kind, name, value, attributes = parsed
+        if kind == "user_pref":
+            user[name] = value
+        else:
+            defaults[name] = value
+            if kind == "lockPref" or "locked" in attributes:
+                locked.add(name)
+    return PrefsFile(defaults, user, locked, errors)
+
+def read_prefs_file(path):
+    """
+    :return: PrefsFile of a preference file; unchanged files (same size and mtime_ns) come from the cache.
+    :raises OSError: If the file cannot be read.
+    """
+    global _cache_bytes
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _cache_lock:
+        cached = _file_cache.get(path)
+        if cached and cached[0] == key:
+            _file_cache.move_to_end(path)
+            return cached[1]
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        # The key of what is actually read; a file rewritten after this is parsed again next time
+        stat = os.fstat(f.fileno())
+        key = (stat.st_size, stat.st_mtime_ns)
+        parsed = parse_prefs(f.read())
+
+    with _cache_lock:
+        previous = _file_cache.pop(path, None)
+        if previous:
+            _cache_bytes -= previous[0][0]
+        _file_cache[path] = (key, parsed)
+        _cache_bytes += key[0]
+        while len(_file_cache) > CACHE_MAX_FILES or (_cache_bytes > CACHE_MAX_BYTES and len(_file_cache) > 1):
+            evicted_key, evicted = _file_cache.popitem(last=False)[1]
+            _cache_bytes -= evicted_key[0]
+    return parsed
+
+def clear_cache():
+    global _cache_bytes
+    with _cache_lock:
+        _file_cache.clear()
+        _cache_bytes = 0
+
+def system_pref_paths(patterns=SYSTEM_PREF_PATTERNS):
+    """:return: The installation-wide default preference files that exist, distribution files before vendor files."""
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern)))
+    return paths
+
+def effective_prefs(files):
+    """
+    :param files: PrefsFile objects, lowest precedence first (system defaults, prefs.js, user.js).
+    :return: {name: value} as Firefox would see it: a ChainMap over the (cached) parsed files, nothing is copied.
+    """
+    defaults = ChainMap(*(prefs_file.defaults for prefs_file in reversed(files)))
+    locked = {name: defaults[name] for prefs_file in files for name in prefs_file.locked if name in defaults}
+    return ChainMap(locked, *(prefs_file.user for prefs_file in reversed(files)), defaults)
+
+def load_profile_prefs(profile_path, system_paths=()):
+    """
+    :param system_paths: Installation-wide default files, e.g. from system_pref_paths(); unreadable ones are skipped.
+    :return: {name: value} of the profile, from the system defaults, its prefs.js and its user.js.
+    :raises FileNotFoundError: If the profile has neither a prefs.js nor a user.js (it was never started).
+    :raises OSError: If one of them exists but cannot be read.
+    """
+    files = []
+    for path in system_paths:
+        try:
+            files.append(read_prefs_file(path))
+        except OSError:
+            continue
+    found = False
+    for name in PROFILE_PREF_FILES:
+        try:
+            files.append(read_prefs_file(os.path.join(profile_path, name)))
+            found = True
+        except FileNotFoundError:
+            continue
+    if not found:
+        raise FileNotFoundError(f"No {' or '.join(PROFILE_PREF_FILES)} in {profile_path}")
+    return effective_prefs(files)
@@ -0,0 +1,525 @@
+# core/firewall_rules.py
+# An in-memory model of the packet filter ruleset, read once per scan from 'nft -j list ruleset',
+# falling back to 'iptables-save'/'ip6tables-save' and finally to UFW's own rule files.
+#
+# Every source is turned into the same Ruleset of Chains and Rules, indexed by (family, table, name),
+# by table and by netfilter hook, so checks can ask "which chains filter input, and with what default
+# policy" without running any tool again. Rules carry the matches checks care about (protocol,
+# addresses, destination ports, input interface, conntrack state); anything else a rule matches on
+# marks it as opaque instead of being guessed at.
+
+import json
+import shlex
+import socket
+
+NFT_RULESET_COMMAND = ["nft", "-j", "list", "ruleset"]
+IPTABLES_SAVE_COMMAND = ["iptables-save"]
+IP6TABLES_SAVE_COMMAND = ["ip6tables-save"]
+
+UFW_ENABLED_FILE = "/etc/ufw/ufw.conf"
+UFW_DEFAULTS_FILE = "/etc/default/ufw"
+# family -> rule file written by 'ufw allow/deny'
+UFW_RULE_FILES = {"ip": "/etc/ufw/user.rules", "ip6": "/etc/ufw/user6.rules"}
+
+# Built-in iptables chains and the netfilter hooks they sit on
+IPTABLES_HOOKS = {
+    "PREROUTING": "prerouting",
+    "INPUT": "input",
+    "FORWARD": "forward",
+    "OUTPUT": "output",
+    "POSTROUTING": "postrouting",
+}
+# Hook priorities of the iptables tables, as nftables numbers them
+IPTABLES_PRIORITIES = {"raw": -300, "mangle": -150, "nat": -100, "filter": 0, "security": 50}
+IPTABLES_VERDICTS = {"ACCEPT": "accept", "DROP": "drop", "REJECT": "reject", "RETURN": "return"}
+
+DENY_VERDICTS = ("drop", "reject")
+TERMINAL_VERDICTS = ("accept", "drop", "reject")
+# nft statements that never change whether a packet matches or where it goes
+_NFT_PASSIVE_STATEMENTS = ("counter", "log", "comment", "notrack")
+
+class Rule:
+    __slots__ = ("chain", "position", "protocols", "sources", "destinations", "dports",
+                 "in_interfaces", "ct_states", "ct_statuses", "verdict", "target", "opaque")
+
+    def __init__(self, chain, position):
+        """
+        A match left as None matches everything.
+        :param chain: Key (family, table, name) of the chain holding the rule.
+        :param position: Index of the rule within its chain.
+        """
+        self.chain = chain
+        self.position = position
+        self.protocols = None      # {"tcp", "udp", ...}
+        self.sources = None        # [(4 or 6, first address, last address)] as integers
+        self.destinations = None   # same as sources
+        self.dports = None         # [(low, high)]
+        self.in_interfaces = None  # {"eth0", "lo", "wg+"} ("+" is an iptables prefix wildcard)
+        self.ct_states = None      # {"established", "related", "new", ...}
+        self.ct_statuses = None    # {"dnat", "snat", "confirmed", ...}: conntrack status bits, any of which matches
+        self.verdict = None        # "accept", "drop", "reject", "return", "jump", "goto" or None (no verdict)
+        self.target = None         # chain name for "jump" and "goto"
+        self.opaque = False        # matches on something this model does not understand
+
+    def is_unconditional(self):
+        return (not self.opaque and self.protocols is None and self.sources is None and self.destinations is None
+                and self.dports is None and self.in_interfaces is None and self.ct_states is None
+                and self.ct_statuses is None)
+
+class Chain:
+    __slots__ = ("family", "table", "name", "hook", "type", "priority", "policy", "rules")
+
+    def __init__(self, family, table, name, hook=None, chain_type=None, priority=0, policy=None):
+        """
+        :param family: "ip", "ip6", "inet", "arp", "bridge" or "netdev".
+        :param hook: Netfilter hook for base chains ("input", "forward", ...); None for regular chains.
+        :param policy: "accept" or "drop" for base chains.
+        """
+        self.family = family
+        self.table = table
+        self.name = name
+        self.hook = hook
+        self.type = chain_type
+        self.priority = priority
+        self.policy = policy
+        self.rules = []
+
+    @property
+    def key(self):
+        return (self.family, self.table, self.name)
+
+    def describe(self):
+        return f"{self.family} {self.table} {self.name}"
+
+class Ruleset:
+    def __init__(self, source):
+        """:param source: Where the rules were read from ("nft", "iptables-save" or "ufw-files")."""
+        self.source = source
+        self.chains = {}    # (family, table, name) -> Chain
+        self.by_table = {}  # (family, table) -> [Chain]
+        self.by_hook = {}   # hook -> [Chain], base chains only, in priority order
+
+    def add_chain(self, chain):
+        existing = self.chains.get(chain.key)
+        if existing:
+            return existing
+        self.chains[chain.key] = chain
+        self.by_table.setdefault((chain.family, chain.table), []).append(chain)
+        if chain.hook:
+            hooked = self.by_hook.setdefault(chain.hook, [])
+            hooked.append(chain)
+            hooked.sort(key=lambda c: c.priority)
+        return chain
+
+    def chain(self, family, table, name):
+        return self.chains.get((family, table, name))
+
+    def rule_count(self):
+        return sum(len(chain.rules) for chain in self.chains.values())
+
+    def base_chains(self, hook, chain_type="filter"):
+        """:return: Base chains on a hook (e.g. "input"), in the order packets traverse them."""
+        return [chain for chain in self.by_hook.get(hook, []) if chain_type is None or chain.type == chain_type]
+
+    def input_chains(self):
+        """:return: The filter chains incoming packets pass through (ip, ip6 and inet families)."""
+        return [chain for chain in self.base_chains("input") if chain.family in ("ip", "ip6", "inet")]
+
+    def jump_target(self, chain, rule):
+        """:return: The Chain a jump/goto rule leads to, or None."""
+        if rule.verdict not in ("jump", "goto") or not rule.target:
+            return None
+        return self.chains.get((chain.family, chain.table, rule.target))
+
+    def reachable_chains(self, chain):
+        """:return: The chain and every chain reachable from it through jump/goto, each once."""
+        seen = {chain.key: chain}
+        pending = [chain]
+        while pending:
+            current = pending.pop()
+            for rule in current.rules:
+                target = self.jump_target(current, rule)
+                if target and target.key not in seen:
+                    seen[target.key] = target
+                    pending.append(target)
+        return list(seen.values())
+
+    def default_verdict(self, chain):
+        """
+        :return: What happens to a packet no conditional rule of the chain decides on: the first
+                 unconditional accept/drop/reject (following unconditional jumps), else the policy.
+        """
+        verdict = self._unconditional_verdict(chain, set())
+        return verdict or chain.policy or "accept"
+
+    def _unconditional_verdict(self, chain, visiting):
+        if chain.key in visiting:
+            return None
+        visiting.add(chain.key)
+        for rule in chain.rules:
+            if not rule.is_unconditional():
+                continue
+            if rule.verdict in TERMINAL_VERDICTS:
+                return rule.verdict
+            if rule.verdict == "return":
+                return None
+            target = self.jump_target(chain, rule)
+            if target:
+                verdict = self._unconditional_verdict(target, visiting)
+                if verdict or rule.verdict == "goto":
+                    return verdict
+        return None
+
+# ---- nftables JSON ----
+
+def parse_nft_json(text):
+    """
+    :param text: Output of 'nft -j list ruleset'.
+    :return: Ruleset with source "nft".
+    :raises ValueError: If the text is not nft JSON.
+    """
+    document = json.loads(text)
+    if not isinstance(document, dict) or "nftables" not in document:
+        raise ValueError("not an 'nft -j' document")
+
+    ruleset = Ruleset("nft")
+    pending_rules = []
+    for item in document["nftables"]:
+        if "chain" in item:
+            data = item["chain"]
+            ruleset.add_chain(Chain(data["family"], data["table"], data["name"], hook=data.get("hook"),
+                                    chain_type=data.get("type"), priority=_nft_priority(data.get("prio", 0)),
+                                    policy=data.get("policy")))
+        elif "rule" in item:
+            pending_rules.append(item["rule"])
+
+    # 'nft list ruleset' prints a table's chains before its rules, but do not depend on it.
+    for data in pending_rules:
+        chain = (ruleset.chain(data["family"], data["table"], data["chain"])
+                 or ruleset.add_chain(Chain(data["family"], data["table"], data["chain"])))
+        rule = Rule(chain.key, len(chain.rules))
+        for statement in data.get("expr", []):
+            _apply_nft_statement(rule, statement)
+        chain.rules.append(rule)
+    return ruleset
+
+def _nft_priority(value):
+    # Named priorities ("filter", "dstnat") show up with some nft versions
+    if isinstance(value, int):
+        return value
+    return {"raw": -300, "mangle": -150, "dstnat": -100, "filter": 0, "security": 50, "srcnat": 100}.get(value, 0)
+
+def _apply_nft_statement(rule, statement):
+    if not isinstance(statement, dict) or len(statement) != 1:
+        rule.opaque = True
+        return
+    (kind, value), = statement.items()
+    if kind == "match":
+        _apply_nft_match(rule, value)
+    elif kind in ("accept", "drop", "reject", "return"):
+        rule.verdict = kind
+    elif kind in ("jump", "goto"):
+        rule.verdict = kind
+        rule.target = value.get("target")
+    elif kind not in _NFT_PASSIVE_STATEMENTS:
+        # limit, quota, meter, set updates, NAT, ... all decide which packets go on
+        rule.opaque = True
+
+def _apply_nft_match(rule, match):
+    if match.get("op", "==") not in ("==", "in"):
+        rule.opaque = True
+        return
+    left = match.get("left")
+    values = _nft_values(match.get("right"))
+    if values is None or not isinstance(left, dict):
+        rule.opaque = True
+        return
+
+    if "payload" in left:
+        payload = left["payload"]
+        protocol, field = payload.get("protocol"), payload.get("field")
+        if field == "dport" and protocol in ("tcp", "udp", "sctp", "dccp", "th"):
+            if protocol != "th":
+                _narrow_protocols(rule, {protocol})
+            ports = _port_ranges(values)
+            if ports is None:
+                rule.opaque = True
+            else:
+                rule.dports = ports if rule.dports is None else _intersect_ranges(rule.dports, ports)
+            return
+        if field in ("saddr", "daddr") and protocol in ("ip", "ip6"):
+            networks = _networks(values)
+            if networks is None:
+                rule.opaque = True
+            elif field == "saddr":
+                rule.sources = networks
+            else:
+                rule.destinations = networks
+            return
+        if (protocol, field) in (("ip", "protocol"), ("ip6", "nexthdr")):
+            _narrow_protocols(rule, {str(v) for v in values})
+            return
+    elif "meta" in left:
+        key = left["meta"].get("key")
+        if key == "l4proto":
+            _narrow_protocols(rule, {str(v) for v in values})
+            return
+        if key in ("iifname", "iif") and all(isinstance(v, str) for v in values):
+            # nft writes a wildcard as "eth*"; stored the iptables way as "eth+"
+            rule.in_interfaces = {v[:-1] + "+" if v.endswith("*") else v for v in values}
+            return
+    elif "ct" in left:
+        key = left["ct"].get("key")
+        if key in ("state", "status") and all(isinstance(v, str) for v in values):
+            if key == "state":
+                rule.ct_states = set(values)
+            else:
+                # firewalld's "ct status dnat accept" in filter_INPUT
+                rule.ct_statuses = set(values)
+            return
+    rule.opaque = True
+
+def _nft_values(right):
+    """Flattens a match's right-hand side into a list of scalars, ("range", low, high) and ("prefix", addr, len)."""
+    if isinstance(right, (int, str)):
+        if isinstance(right, str) and right.startswith("@"):
+            return None # named set, contents not in the rule
+        return [right]
+    if isinstance(right, list):
+        values = []
+        for item in right:
+            flattened = _nft_values(item)
+            if flattened is None:
+                return None
+            values.extend(flattened)
+        return values
+    if isinstance(right, dict):
+        if "set" in right:
+            return _nft_values(right["set"])
+        if "range" in right:
+            low, high = right["range"]
+            return [("range", low, high)]
+        if "prefix" in right:
+            return [("prefix", right["prefix"]["addr"], right["prefix"]["len"])]
+    return None
+
+def _narrow_protocols(rule, protocols):
+    protocols = {p.lower() for p in protocols}
+    rule.protocols = protocols if rule.protocols is None else rule.protocols & protocols
+
+def _port_number(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        if value.isdigit():
+            return int(value)
+        try:
+            return socket.getservbyname(value)
+        except OSError:
+            return None
+    return None
+
+def _port_ranges(values):
+    ranges = []
+    for value in values:
+        if isinstance(value, tuple) and value[0] == "range":
+            low, high = _port_number(value[1]), _port_number(value[2])
+        else:
+            low = high = _port_number(value)
+        if low is None or high is None:
+            return None
+        ranges.append((low, high))
+    return ranges
+
+def _intersect_ranges(first, second):
+    return [(max(a, c), min(b, d)) for a, b in first for c, d in second if max(a, c) <= min(b, d)]
+
+def address_range(text, prefix_length=None):
+    """
+    :param text: "10.0.0.0/8", "2001:db8::1" or a bare address with prefix_length given separately.
+    :return: (4 or 6, first, last) with the addresses as integers, or None if the text is not an address.
+    """
+    if prefix_length is None and "/" in text:
+        text, prefix_length = text.split("/", 1)
+    family, bits, version = (socket.AF_INET6, 128, 6) if ":" in text else (socket.AF_INET, 32, 4)
+    try:
+        first = int.from_bytes(socket.inet_pton(family, text), "big")
+        prefix_length = bits if prefix_length is None else int(prefix_length)
+    except (OSError, ValueError):
+        return None
+    if not 0 <= prefix_length <= bits:
+        return None
+    host_mask = (1 << (bits - prefix_length)) - 1
+    first &= ~host_mask
+    return (version, first, first | host_mask)
+
+def _networks(values):
+    networks = []
+    for value in values:
+        if isinstance(value, tuple) and value[0] == "prefix":
+            network = address_range(str(value[1]), value[2])
+        elif isinstance(value, tuple) and value[0] == "range":
+            low, high = address_range(str(value[1])), address_range(str(value[2]))
+            network = (low[0], low[1], high[2]) if low and high and low[0] == high[0] else None
+        elif isinstance(value, str):
+            network = address_range(value)
+        else:
+            network = None
+        if network is None:
+            return None
+        networks.append(network)
+    return networks
+
+# ---- iptables-save ----
+
+def parse_iptables_save(text, family="ip", ruleset=None, source="iptables-save"):
+    """
+    :param text: Output of 'iptables-save' (family "ip") or 'ip6tables-save' (family "ip6"), or a UFW rules file.
+    :param ruleset: Existing Ruleset to add the chains to, so IPv4 and IPv6 end up in one model.
+    :return: The Ruleset.
+    """
+    ruleset = ruleset or Ruleset(source)
+    table = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("*"):
+            table = line[1:]
+        elif line == "COMMIT":
+            table = None
+        elif line.startswith(":") and table:
+            # :INPUT DROP [0:0]  or  :ufw-user-input - [0:0]
+            parts = line[1:].split()
+            name = parts[0]
+            policy = parts[1].lower() if len(parts) > 1 and parts[1] != "-" else None
+            hook = IPTABLES_HOOKS.get(name)
+            ruleset.add_chain(Chain(family, table, name, hook=hook,
+                                    chain_type=("filter" if table == "filter" else table) if hook else None,
+                                    priority=IPTABLES_PRIORITIES.get(table, 0), policy=policy))
+        elif line.startswith("-A ") and table:
+            # Quoting only shows up around --comment values; plain split is much cheaper than shlex.
+            tokens = shlex.split(line) if '"' in line else line.split()
+            chain = ruleset.chain(family, table, tokens[1]) or ruleset.add_chain(Chain(family, table, tokens[1]))
+            rule = Rule(chain.key, len(chain.rules))
+            _apply_iptables_options(rule, tokens[2:], family, table, ruleset)
+            chain.rules.append(rule)
+    return ruleset
+
+def _apply_iptables_options(rule, tokens, family, table, ruleset):
+    i = 0
+    while i < len(tokens):
+        option = tokens[i]
+        if option == "!":
+            # Negated matches are not modelled
+            rule.opaque = True
+            i += 1
+            continue
+        # Every option takes the tokens up to the next one starting with "-" (or "!") as its arguments.
+        j = i + 1
+        while j < len(tokens) and not tokens[j].startswith("-") and tokens[j] != "!":
+            j += 1
+        args = tokens[i + 1:j]
+        value = args[0] if args else ""
+        i = j
+
+        if option in ("-p", "--protocol"):
+            if value.lower() != "all":
+                _narrow_protocols(rule, {value})
+        elif option in ("-s", "--source", "-d", "--destination"):
+            networks = _networks(value.split(","))
+            if networks is None:
+                rule.opaque = True
+            elif option in ("-s", "--source"):
+                rule.sources = networks
+            else:
+                rule.destinations = networks
+        elif option in ("-i", "--in-interface"):
+            rule.in_interfaces = {value}
+        elif option in ("--dport", "--destination-port", "--dports", "--destination-ports"):
+            ports = _port_ranges([("range",) + tuple(part.split(":", 1)) if ":" in part else part
+                                  for part in value.split(",")])
+            if ports is None:
+                rule.opaque = True
+            else:
+                rule.dports = ports
+        elif option in ("--ctstate", "--state"):
+            rule.ct_states = {state.lower() for state in value.split(",")}
+        elif option == "--ctstatus":
+            rule.ct_statuses = {status.lower() for status in value.split(",")}
+        elif option in ("-m", "--match", "--comment"):
+            # Match modules only matter through their own options (tcp, multiport, conntrack, ...)
+            continue
+        elif option in ("-j", "--jump", "-g", "--goto"):
+            if value in IPTABLES_VERDICTS:
+                rule.verdict = IPTABLES_VERDICTS[value]
+            elif ruleset.chain(family, table, value):
+                rule.verdict = "goto" if option in ("-g", "--goto") else "jump"
+                rule.target = value
+            elif value not in ("LOG", "NFLOG", "ULOG"):
+                # Other extension targets (MARK, NFQUEUE, REDIRECT, ...); logging ones let the packet carry on.
+                rule.verdict = value.lower()
+            # iptables-save prints the target last; what follows are its own options (--log-prefix, ...).
+            break
+        else:
+            rule.opaque = True
+
+# ---- UFW rule files ----
+
+def read_key_values(path):
+    """Reads a shell-style KEY=value file like /etc/default/ufw; quotes are stripped."""
+    values = {}
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if "=" in line and not line.startswith("#"):
+                key, value = line.split("=", 1)
+                values[key.strip()] = value.strip().strip("\"'")
+    return values
+
+def load_ufw_files():
+    """
+    Rebuilds UFW's input path from its configuration files, for when the live ruleset cannot be read.
+    UFW's INPUT chain lets loopback and established traffic through, runs the user rules
+    ('ufw allow ...') and then applies DEFAULT_INPUT_POLICY.
+    :return: Ruleset with source "ufw-files"; it has no input chains when UFW is disabled.
+    :raises OSError: If UFW is not installed or its files cannot be read.
+    """
+    enabled = read_key_values(UFW_ENABLED_FILE).get("ENABLED", "no").lower() == "yes"
+    defaults = read_key_values(UFW_DEFAULTS_FILE)
+    ruleset = Ruleset("ufw-files")
+    if not enabled:
+        return ruleset
+
+    policy = defaults.get("DEFAULT_INPUT_POLICY", "DROP").lower()
+    families = ["ip", "ip6"] if defaults.get("IPV6", "yes").lower() == "yes" else ["ip"]
+    for family in families:
+        try:
+            with open(UFW_RULE_FILES[family], "r", encoding="utf-8") as f:
+                parse_iptables_save(f.read(), family, ruleset)
+        except FileNotFoundError:
+            pass
+        chain = ruleset.add_chain(Chain(family, "filter", "INPUT", hook="input", chain_type="filter",
+                                        policy="accept" if policy == "accept" else "drop"))
+        loopback = Rule(chain.key, 0)
+        loopback.in_interfaces = {"lo"}
+        loopback.verdict = "accept"
+        established = Rule(chain.key, 1)
+        established.ct_states = {"related", "established"}
+        established.verdict = "accept"
+        user_rules = Rule(chain.key, 2)
+        user_rules.verdict = "jump"
+        user_rules.target = "ufw-user-input"
+        chain.rules = [loopback, established]
+        if ruleset.chain(family, "filter", "ufw-user-input"):
+            chain.rules.append(user_rules)
+    return ruleset
+
+def frontend_name(ruleset):
+    """:return: "UFW", "Firewalld" or None, guessed from the table and chain names."""
+    for family, table, name in ruleset.chains:
+        if table == "firewalld":
+            return "Firewalld"
+        if name.startswith("ufw-"):
+            return "UFW"
+    return None
@@ -0,0 +1,165 @@
+# core/instrumentation.py
+# Measures where scan time goes: wall time, child CPU time, subprocess count and output size
+# of every command a check runs. core.utils.run_command and core.async_utils.run_command_async
+# report each command here; the scanner wraps every check (and FactProvider every fact) in
+# timing_scope() and stores the collected block as result["timing"].
+
+import contextvars
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+_current_timing = contextvars.ContextVar("hel_sec_audit_timing", default=None)
+
+# How many commands the "Slowest commands" section of the summary table lists.
+SLOWEST_COMMANDS_SHOWN = 10
+
+class TimingRecorder:
+    def __init__(self):
+        self.wall_time = 0.0
+        self.commands = []
+        self.facts = {}
+        # Commands of one check can finish on several threads or tasks at once.
+        self._lock = threading.Lock()
+
+    def add_command(self, entry):
+        with self._lock:
+            self.commands.append(entry)
+
+    def add_fact(self, name, timing):
+        with self._lock:
+            self.facts[name] = timing
+
+    def to_dict(self):
+        with self._lock:
+            commands = list(self.commands)
+            facts = dict(self.facts)
+        cpu_times = [entry["cpu_time"] for entry in commands if entry["cpu_time"] is not None]
+        return {
+            "wall_time": self.wall_time,
+            # None when no child CPU time could be measured (Windows, asyncio subprocesses).
+            "child_cpu_time": sum(cpu_times) if cpu_times else None,
+            "subprocess_count": len(commands),
+            "bytes_read": sum(entry["bytes_read"] for entry in commands),
+            "commands": commands,
+            "facts": facts
+        }
+
+@contextmanager
+def timing_scope():
+    """
+    Collects the commands run inside the block. Scopes do not nest additively:
+    a command is only counted in the innermost scope (e.g. the fact that ran it, not the check).
+    """
+    recorder = TimingRecorder()
+    token = _current_timing.set(recorder)
+    started = time.perf_counter()
+    try:
+        yield recorder
+    finally:
+        recorder.wall_time = time.perf_counter() - started
+        _current_timing.reset(token)
+
+def record_command(command, wall_time, cpu_time, bytes_read, return_code):
+    """
+    Reports one finished command to the current timing scope, if any.
+    :param cpu_time: User + system CPU seconds of the child, or None when unknown.
+    """
+    recorder = _current_timing.get()
+    if recorder is not None:
+        recorder.add_command({
+            "command": " ".join(command),
+            "wall_time": wall_time,
+            "cpu_time": cpu_time,
+            "bytes_read": bytes_read,
+            "return_code": return_code
+        })
+
+def record_fact(name, timing):
+    """Notes that the current check used a shared fact; its cost is reported once, not per check."""
+    recorder = _current_timing.get()
+    if recorder is not None and timing is not None:
+        recorder.add_fact(name, timing)
+
+# TimedPopen overrides Popen._try_wait(self, wait_flags), a CPython internal on POSIX. Only do so while it
+# still exists with that signature; otherwise commands run with plain Popen and report no CPU time.
+_original_try_wait = getattr(subprocess.Popen, "_try_wait", None)
+WAIT4_RUSAGE = (hasattr(os, "wait4") and callable(_original_try_wait)
+                and getattr(getattr(_original_try_wait, "__code__", None), "co_argcount", None) == 2)
+
+class TimedPopen(subprocess.Popen):
+    """
+    Popen that reaps its child with os.wait4 to keep the child's resource usage.
+    Falls back to plain Popen behaviour (cpu_time None) where wait4 or Popen._try_wait is unavailable (Windows,
+    other Python implementations or versions).
+    """
+    rusage = None
+
+    if WAIT4_RUSAGE:
+        def _try_wait(self, wait_flags):
+            try:
+                pid, status, rusage = os.wait4(self.pid, wait_flags)
+            except ChildProcessError:
+                # Already reaped elsewhere (e.g. SIGCHLD set to SIG_IGN); same fallback as Popen.
+                return self.pid, 0
+            if pid == self.pid:
+                self.rusage = rusage
+            return pid, status
+
+    @property
+    def cpu_time(self):
+        if self.rusage is None:
+            return None
+        return self.rusage.ru_utime + self.rusage.ru_stime
+
+def format_timing_table(results):
+    """
+    Builds a plain-text summary of where the scan spent its time.
+    :param results: Scan results as returned by SecurityScanner.run_all_checks.
+    :return: The table as a string (monospace layout).
+    """
+    lines = [f"{'Check':<32} {'Wall (s)':>9} {'CPU (s)':>9} {'Procs':>6} {'Bytes read':>11}"]
+    commands = []
+    facts = {}
+    for result in results:
+        timing = result.get("timing")
+        name = result.get("check_name", "N/A")[:32]
+        if result.get("cached") or not timing:
+            lines.append(f"{name:<32} {'cached' if result.get('cached') else 'n/a':>9}")
+            continue
+        lines.append(
+            f"{name:<32} {timing['wall_time']:>9.2f} {_format_seconds(timing['child_cpu_time']):>9} "
+            f"{timing['subprocess_count']:>6} {timing['bytes_read']:>11}"
+        )
+        commands.extend(timing["commands"])
+        _collect_facts(timing, facts)
+
+    if facts:
+        # Shared facts are computed once per scan, so they are listed apart from the checks that used them.
+        lines.append("")
+        lines.append(f"{'Shared fact':<32} {'Wall (s)':>9} {'CPU (s)':>9} {'Procs':>6} {'Bytes read':>11}")
+        for name, timing in sorted(facts.items(), key=lambda item: item[1]["wall_time"], reverse=True):
+            lines.append(
+                f"{name[:32]:<32} {timing['wall_time']:>9.2f} {_format_seconds(timing['child_cpu_time']):>9} "
+                f"{timing['subprocess_count']:>6} {timing['bytes_read']:>11}"
+            )
+            commands.extend(timing["commands"])
+
+    if commands:
+        lines.append("")
+        lines.append("Slowest commands:")
+        for entry in sorted(commands, key=lambda entry: entry["wall_time"], reverse=True)[:SLOWEST_COMMANDS_SHOWN]:
+            lines.append(f"  {entry['wall_time']:>7.2f}s  {entry['command'][:70]}")
+    return "\n".join(lines)
+
+def _collect_facts(timing, facts):
+    # Facts can depend on other facts (upgradable_packages -> installed_packages), so walk them all.
+    for name, fact_timing in timing.get("facts", {}).items():
+        if name not in facts:
+            facts[name] = fact_timing
+            _collect_facts(fact_timing, facts)
+
+def _format_seconds(value):
+    return "n/a" if value is None else f"{value:.2f}"
@@ -0,0 +1,138 @@
+# core/pacman_db.py
+# Reads pacman's local database (/var/lib/pacman/local/<name>-<version>/desc) directly and builds an
+# index of installed packages, instead of asking 'pacman -Q'.
+#
+# Parsing 2,000+ desc files costs one open() each, so the index is also stored on disk
+# (~/.config/hel-sec-audit/pacman_local.cache) keyed by the mtimes of the local and sync database
+# directories. Adding, removing or upgrading a package changes the local directory's mtime;
+# 'pacman -Sy' changes the sync databases. An unchanged system loads the index with one mmap'd read.
+
+import marshal
+import mmap
+import os
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+from core import pacman_sync
+
+PACMAN_LOCAL_DIR = "/var/lib/pacman/local"
+PACMAN_SYNC_DIR = pacman_sync.PACMAN_SYNC_DIR
+CACHE_FILENAME = "pacman_local.cache"
+# Bumped whenever the cached layout changes
+CACHE_FORMAT = 1
+
+InstalledPackage = namedtuple("InstalledPackage", [
+    "name", "version", "reason", "build_date", "install_date", "foreign", "validation", "packager"
+])
+# reason: "explicit" or "dependency"; foreign: not found in any sync database (AUR, built or installed by hand)
+
+def parse_desc(text):
+    """:return: {"NAME": ["linux"], "VERSION": ["6.9.1-1"], ...} from a desc file's %SECTION% blocks."""
+    sections = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith("%") and line.endswith("%") and len(line) > 2:
+            current = sections.setdefault(line[1:-1], [])
+        elif line and current is not None:
+            current.append(line)
+    return sections
+
+def _first_int(values):
+    return int(values[0]) if values and values[0].isdigit() else 0
+
+def _package_from_desc(sections, sync_names):
+    name = sections.get("NAME", [""])[0]
+    return InstalledPackage(
+        name=name,
+        version=sections.get("VERSION", [""])[0],
+        # %REASON% is only written for dependencies (1); explicit installs leave it out
+        reason="dependency" if sections.get("REASON", ["0"])[0] == "1" else "explicit",
+        build_date=_first_int(sections.get("BUILDDATE")),
+        install_date=_first_int(sections.get("INSTALLDATE")),
+        foreign=sync_names is not None and name not in sync_names,
+        validation=",".join(sections.get("VALIDATION", [])),
+        packager=sections.get("PACKAGER", [""])[0],
+    )
+
+def sync_package_names(sync_dir=PACMAN_SYNC_DIR):
+    """:return: Names of the packages in all sync databases, or None when none could be read."""
+    try:
+        databases, _ = pacman_sync.load_sync_databases(sync_dir)
+    except OSError:
+        return None
+    if not databases:
+        return None
+    return {name for database in databases for name in database.packages}
+
+def _directory_key(local_dir, sync_dir):
+    key = [os.stat(local_dir).st_mtime_ns]
+    try:
+        for entry in sorted(os.scandir(sync_dir), key=lambda entry: entry.name):
+            if entry.name.endswith(".db"):
+                stat = entry.stat()
+                key.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    except OSError:
+        pass
+    return tuple(key)
+
+def _default_cache_path():
+    return Path.home() / ".config" / "hel-sec-audit" / CACHE_FILENAME
+
+def _load_cache(cache_path, key):
+    try:
+        with open(cache_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            stored = marshal.loads(mapped)
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if not isinstance(stored, tuple) or len(stored) != 3 or stored[0] != CACHE_FORMAT or stored[1] != key:
+        return None
+    return {row[0]: InstalledPackage(*row) for row in stored[2]}
+
+def _save_cache(cache_path, key, packages):
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = cache_path.with_suffix(".tmp")
+        with open(temporary, "wb") as f:
+            marshal.dump((CACHE_FORMAT, key, [tuple(package) for package in packages.values()]), f)
+        os.replace(temporary, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write pacman index cache '{cache_path}': {e}", file=sys.stderr)
+
+def read_local_database(local_dir=PACMAN_LOCAL_DIR, sync_dir=PACMAN_SYNC_DIR):
+    """
+    Parses every desc file of the local database.
+    :return: {name: InstalledPackage}
+    :raises OSError: If the local database directory cannot be read.
+    """
+    sync_names = sync_package_names(sync_dir)
+    packages = {}
+    for entry in os.scandir(local_dir):
+        if not entry.is_dir():
+            continue # ALPM_DB_VERSION
+        try:
+            with open(os.path.join(entry.path, "desc"), "r", encoding="utf-8", errors="replace") as f:
+                package = _package_from_desc(parse_desc(f.read()), sync_names)
+        except OSError:
+            continue
+        if package.name:
+            packages[package.name] = package
+    return packages
+
+def load_installed_packages(local_dir=PACMAN_LOCAL_DIR, sync_dir=PACMAN_SYNC_DIR, cache_path=None):
+    """
+    The installed-package index, from the on-disk cache when the databases have not changed since it was written.
+    :param cache_path: Where to keep the index; None for ~/.config/hel-sec-audit/pacman_local.cache, False to disable.
+    :return: {name: InstalledPackage}
+    :raises OSError: If the local database directory cannot be read.
+    """
+    key = _directory_key(local_dir, sync_dir)
+    if cache_path is not False:
+        cache_path = Path(cache_path) if cache_path else _default_cache_path()
+        packages = _load_cache(cache_path, key)
+        if packages is not None:
+            return packages
+    packages = read_local_database(local_dir, sync_dir)
+    if cache_path is not False:
+        _save_cache(cache_path, key, packages)
+    return packages
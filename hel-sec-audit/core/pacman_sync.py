@@ -0,0 +1,225 @@
+# core/pacman_sync.py
+# Pending pacman updates computed offline from the sync databases (/var/lib/pacman/sync/<repo>.db).
+#
+# A sync database is a compressed tar archive with one "<name>-<pkgver>-<pkgrel>/" directory per
+# package. Like libalpm, the name and version are taken from that directory name, so only the tar
+# headers are needed: the archive is decompressed in chunks and the desc payloads are skipped,
+# nothing is extracted. Parsed databases are kept per path, keyed by mtime and size.
+
+import bz2
+import lzma
+import os
+import time
+import zlib
+from collections import namedtuple
+
+from core.versions import compare_batch
+
+PACMAN_SYNC_DIR = "/var/lib/pacman/sync"
+PACMAN_CONF = "/etc/pacman.conf"
+READ_CHUNK = 256 * 1024
+BLOCK = 512
+
+# packages: {name: version}; updated: mtime of the database file, i.e. the last 'pacman -Sy'
+SyncDatabase = namedtuple("SyncDatabase", ["repository", "path", "packages", "updated"])
+PendingUpdate = namedtuple("PendingUpdate", ["name", "installed", "available", "repository", "ignored"])
+
+# path -> ((mtime_ns, size), SyncDatabase)
+_database_cache = {}
+
+class SyncDatabaseError(Exception):
+    pass
+
+def _decompressor(magic):
+    if magic.startswith(b"\x1f\x8b"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if magic.startswith(b"BZh"):
+        return bz2.BZ2Decompressor()
+    if magic.startswith(b"\xfd7zXZ\x00"):
+        return lzma.LZMADecompressor()
+    if magic.startswith(b"\x28\xb5\x2f\xfd"):
+        raise SyncDatabaseError("zstd-compressed databases are not supported by this Python")
+    return None # uncompressed tar
+
+def _chunks(f):
+    """Yields the decompressed contents of an open database file in pieces."""
+    data = f.read(READ_CHUNK)
+    decompressor = _decompressor(data[:6])
+    while data:
+        if decompressor is None:
+            yield data
+        else:
+            output = decompressor.decompress(data)
+            if output:
+                yield output
+            # A gzip file may hold several members; each needs a fresh decompressor
+            unused = getattr(decompressor, "unused_data", b"")
+            if unused and decompressor.eof:
+                decompressor = _decompressor(unused[:6])
+                data = unused
+                continue
+        data = f.read(READ_CHUNK)
+
+def _octal(field):
+    if field[:1] == b"\x80":
+        # GNU base-256 for sizes beyond 8 GiB
+        return int.from_bytes(field[1:], "big")
+    field = field.strip(b" \x00")
+    return int(field, 8) if field else 0
+
+def _pax_path(payload):
+    # "<length> path=<value>\n" records
+    for record in payload.split(b"\n"):
+        key, sep, value = record.partition(b"=")
+        if sep and key.endswith(b" path"):
+            return value.decode("utf-8", "replace")
+    return None
+
+def iter_tar_names(chunks):
+    """Yields the member names of a tar stream, reading headers only (payloads are skipped)."""
+    buffer = bytearray()
+    skip = 0
+    long_name = None
+    for chunk in chunks:
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        buffer += memoryview(chunk)[skip:]
+        skip = 0
+        position = 0
+        while len(buffer) - position >= BLOCK:
+            header = buffer[position:position + BLOCK]
+            if header.count(0) == BLOCK:
+                position += BLOCK # end-of-archive padding
+                continue
+            size = _octal(bytes(header[124:136]))
+            padded = (size + BLOCK - 1) // BLOCK * BLOCK
+            typeflag = header[156:157]
+            if typeflag in (b"x", b"L"):
+                # pax extended header or GNU long name: the name is in the payload
+                if len(buffer) - position < BLOCK + padded:
+                    break
+                payload = bytes(buffer[position + BLOCK:position + BLOCK + size])
+                long_name = _pax_path(payload) if typeflag == b"x" else payload.rstrip(b"\x00").decode("utf-8", "replace")
+                position += BLOCK + padded
+                continue
+            if typeflag == b"g":
+                position += BLOCK + padded
+                continue
+            if long_name is not None:
+                name, long_name = long_name, None
+            else:
+                name = bytes(header[0:100]).split(b"\x00", 1)[0].decode("utf-8", "replace")
+                if header[257:262] == b"ustar" and header[345]:
+                    name = bytes(header[345:500]).split(b"\x00", 1)[0].decode("utf-8", "replace") + "/" + name
+            yield name
+            position += BLOCK
+            available = len(buffer) - position
+            if padded > available:
+                skip = padded - available
+                position = len(buffer)
+            else:
+                position += padded
+        del buffer[:position]
+
+def split_package_directory(directory):
+    """"openssl-3.3.1-1" -> ("openssl", "3.3.1-1"); epochs stay part of the version ("ffmpeg-2:7.0-1")."""
+    parts = directory.rsplit("-", 2)
+    if len(parts) != 3:
+        return None, None
+    return parts[0], parts[1] + "-" + parts[2]
+
+def read_sync_database(path, repository=None):
+    """
+    :return: SyncDatabase with {name: version} of every package in the database. Unchanged files come from the cache.
+    :raises OSError: If the file cannot be read.
+    :raises SyncDatabaseError: If it is compressed with a format the stdlib cannot read or is corrupt.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _database_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    repository = repository or os.path.basename(path)[:-len(".db")]
+    packages = {}
+    previous = None
+    with open(path, "rb") as f:
+        try:
+            for member in iter_tar_names(_chunks(f)):
+                directory = member.split("/", 1)[0]
+                if directory == previous:
+                    continue
+                previous = directory
+                name, version = split_package_directory(directory)
+                if name:
+                    packages[name] = version
+        except (zlib.error, lzma.LZMAError, OSError, EOFError, ValueError) as e:
+            raise SyncDatabaseError(f"{path}: {e}")
+    database = SyncDatabase(repository, path, packages, stat.st_mtime)
+    _database_cache[path] = (key, database)
+    return database
+
+def read_pacman_conf(path=PACMAN_CONF):
+    """:return: (repositories in the order pacman searches them, set of IgnorePkg names). Include= files are not followed."""
+    repositories = []
+    ignored = set()
+    section = None
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line.startswith("[") and line.endswith("]"):
+                    section = line[1:-1].strip()
+                    if section != "options":
+                        repositories.append(section)
+                elif section == "options" and "=" in line:
+                    key, value = (part.strip() for part in line.split("=", 1))
+                    if key == "IgnorePkg":
+                        ignored.update(value.split())
+    except OSError:
+        pass
+    return repositories, ignored
+
+def load_sync_databases(sync_dir=PACMAN_SYNC_DIR, conf_path=PACMAN_CONF):
+    """
+    :return: ([SyncDatabase] in pacman.conf order, [error strings]). Databases not listed in pacman.conf follow in name order.
+    :raises OSError: If the sync directory cannot be listed.
+    """
+    order, _ = read_pacman_conf(conf_path)
+    files = {entry.name[:-len(".db")]: entry.path for entry in os.scandir(sync_dir) if entry.name.endswith(".db") and entry.is_file()}
+    repositories = [repository for repository in order if repository in files] + sorted(set(files) - set(order))
+    databases, errors = [], []
+    for repository in repositories:
+        try:
+            databases.append(read_sync_database(files[repository], repository))
+        except (OSError, SyncDatabaseError) as e:
+            errors.append(str(e))
+    return databases, errors
+
+def sync_versions(databases):
+    """:return: {name: (version, repository)}, the first repository listing a package wins, as in pacman."""
+    versions = {}
+    for database in reversed(databases):
+        for name, version in database.packages.items():
+            versions[name] = (version, database.repository)
+    return versions
+
+def pending_updates(installed, databases, ignored=()):
+    """
+    Installed packages with a newer version in the sync databases (what 'pacman -Qu' lists).
+    :param installed: {name: version} or {name: pacman_db.InstalledPackage}
+    :return: [PendingUpdate] sorted by name.
+    """
+    versions = sync_versions(databases)
+    # Foreign packages have no sync entry
+    candidates = [(name, getattr(installed[name], "version", installed[name]), versions[name]) for name in sorted(installed) if name in versions]
+    newer = compare_batch([(entry[0], installed_version) for name, installed_version, entry in candidates], "pacman")
+    return [PendingUpdate(name, installed_version, entry[0], entry[1], name in ignored)
+            for (name, installed_version, entry), order in zip(candidates, newer) if order > 0]
+
+def database_age(databases, now=None):
+    """:return: Seconds since the least recently synced database was refreshed, or None without databases."""
+    if not databases:
+        return None
+    return max(0.0, (now or time.time()) - min(database.updated for database in databases))
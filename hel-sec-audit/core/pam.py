@@ -0,0 +1,311 @@
+# core/pam.py
+# Parser for the PAM configuration in /etc/pam.d, with include/substack resolution.
+#
+# Each file is parsed once and kept in a cache keyed by its mtime and size, so a repeat scan in the
+# same process skips unchanged files. Expanding a service's stack for one management group
+# ("auth", "account", "password", "session") is memoized per (file, group), so common-* files
+# included by every service are expanded once.
+
+import os
+from collections import namedtuple
+
+PAM_DIR = "/etc/pam.d"
+PWQUALITY_CONF = "/etc/security/pwquality.conf"
+FAILLOCK_CONF = "/etc/security/faillock.conf"
+
+MANAGEMENT_GROUPS = ("auth", "account", "password", "session")
+# Modules that enforce password quality and their lockout counterparts
+QUALITY_MODULES = ("pam_pwquality.so", "pam_cracklib.so", "pam_passwdqc.so")
+LOCKOUT_MODULES = ("pam_faillock.so", "pam_tally2.so")
+# Services people change passwords or log in through; every one present is evaluated
+PASSWORD_SERVICES = ("passwd", "system-auth", "common-password", "other")
+LOGIN_SERVICES = ("login", "sshd", "system-auth", "common-auth")
+
+# pwquality defaults (pwquality.conf(5))
+PWQUALITY_DEFAULTS = {"minlen": 8, "dcredit": 0, "ucredit": 0, "lcredit": 0, "ocredit": 0, "minclass": 0}
+# pam_cracklib(8) takes the same options, but has its own defaults and does not read pwquality.conf
+CRACKLIB_DEFAULTS = {"minlen": 9, "dcredit": 1, "ucredit": 1, "lcredit": 1, "ocredit": 1, "minclass": 0}
+# pam_passwdqc(8): min=N0,N1,N2,N3,N4 is the shortest password made of one character class, two classes,
+# a passphrase, three classes and four classes ("disabled" refuses that kind)
+PASSWDQC_DEFAULTS = {"min": "disabled,24,11,8,7", "enforce": "everyone"}
+FAILLOCK_DEFAULTS = {"deny": 3, "unlock_time": 600}
+MIN_PASSWORD_LENGTH = 8
+MAX_FAILLOCK_DENY = 10
+
+# One line of a stack. "path" and "line" point at where it was written, after include resolution.
+PamEntry = namedtuple("PamEntry", ["group", "control", "module", "args", "path", "line", "optional_module"])
+
+# path -> ((mtime_ns, size), [PamEntry | ("include", path, group, line) | ("substack", ...) | ("@include", path, line)])
+_file_cache = {}
+
+def _tokens(text):
+    """Splits a PAM line on whitespace, keeping "[...]" groups (controls and arguments may contain spaces) whole."""
+    tokens = []
+    current = ""
+    depth = 0
+    for char in text:
+        if char == "[" and not current:
+            depth += 1
+        elif char == "]" and depth:
+            depth -= 1
+        if char.isspace() and not depth:
+            if current:
+                tokens.append(current)
+                current = ""
+        else:
+            current += char
+    if current:
+        tokens.append(current)
+    return tokens
+
+def _logical_lines(text):
+    """Yields (line number, text) with comments stripped and backslash continuations joined."""
+    pending, start = "", 0
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.split("#", 1)[0].rstrip()
+        if not pending:
+            start = number
+        if line.endswith("\\"):
+            pending += line[:-1] + " "
+            continue
+        line = (pending + line).strip()
+        pending = ""
+        if line:
+            yield start, line
+
+def _resolve_path(name, pam_dir):
+    return name if os.path.isabs(name) else os.path.join(pam_dir, name)
+
+def parse_pam_file(path, pam_dir=PAM_DIR):
+    """
+    :return: The file's items in order: PamEntry for module lines, and ("include"/"substack", target path,
+             group, line) or ("@include", target path, None, line) for include directives.
+             Unchanged files come from the cache.
+    :raises OSError: If the file cannot be read.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _file_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    items = []
+    for number, line in _logical_lines(text):
+        tokens = _tokens(line)
+        if tokens[0] == "@include" and len(tokens) > 1:
+            # Debian's directive: every group of the other file
+            items.append(("@include", _resolve_path(tokens[1], pam_dir), None, number))
+            continue
+        if len(tokens) < 3:
+            continue
+        group, control, module = tokens[0], tokens[1], tokens[2]
+        # "-session optional pam_systemd.so": skip quietly if the module is not installed
+        optional_module = group.startswith("-")
+        group = group.lstrip("-").lower()
+        if group not in MANAGEMENT_GROUPS:
+            continue
+        if control in ("include", "substack"):
+            items.append((control, _resolve_path(module, pam_dir), group, number))
+        else:
+            items.append(PamEntry(group, control, os.path.basename(module), tokens[3:], path, number, optional_module))
+    _file_cache[path] = (key, items)
+    return items
+
+class PamConfig:
+    def __init__(self, pam_dir=PAM_DIR):
+        self.pam_dir = pam_dir
+        # (path, group) -> [PamEntry]
+        self._expanded = {}
+
+    def services(self):
+        try:
+            return sorted(entry.name for entry in os.scandir(self.pam_dir) if entry.is_file() and not entry.name.startswith("."))
+        except OSError:
+            return []
+
+    def stack(self, service, group):
+        """
+        :return: The effective list of PamEntry a service runs for one management group, with
+                 include, substack and @include resolved. Missing include targets are skipped.
+        """
+        return self._expand(_resolve_path(service, self.pam_dir), group, ())
+
+    def _expand(self, path, group, visiting):
+        memo_key = (path, group)
+        if memo_key in self._expanded:
+            return self._expanded[memo_key]
+        if path in visiting:
+            return [] # include loop
+        try:
+            items = parse_pam_file(path, self.pam_dir)
+        except OSError:
+            return []
+
+        entries = []
+        for item in items:
+            if isinstance(item, PamEntry):
+                if item.group == group:
+                    entries.append(item)
+            elif item[2] is None or item[2] == group:
+                # A substack's done/die only end the substack, but it runs the same modules.
+                entries.extend(self._expand(item[1], group, visiting + (path,)))
+        self._expanded[memo_key] = entries
+        return entries
+
+    def present_services(self, candidates):
+        """:return: The candidates that have a file in pam_dir, in the order given."""
+        available = set(self.services())
+        return [service for service in candidates if service in available]
+
+def module_arguments(entry):
+    """pam_pwquality.so minlen=12 retry=3 enforce_for_root -> {"minlen": "12", "retry": "3", "enforce_for_root": True}"""
+    arguments = {}
+    for argument in entry.args:
+        if "=" in argument:
+            key, value = argument.split("=", 1)
+            arguments[key] = value
+        else:
+            arguments[argument] = True
+    return arguments
+
+def read_conf(path):
+    """Reads a "key = value" file like pwquality.conf or faillock.conf; flags without a value map to True."""
+    values = {}
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                if "=" in line:
+                    key, value = line.split("=", 1)
+                    values[key.strip()] = value.strip()
+                else:
+                    values[line] = True
+    except OSError:
+        pass
+    return values
+
+def _settings(defaults, conf_values, arguments):
+    # Module arguments override the .conf file, which overrides the built-in defaults.
+    settings = dict(defaults)
+    for source in (conf_values, arguments):
+        for key, value in source.items():
+            if isinstance(value, str) and value.lstrip("-").isdigit():
+                value = int(value)
+            settings[key] = value
+    return settings
+
+def _finding(finding_id, severity, subject, detail, parameters=None):
+    finding = {"id": finding_id, "severity": severity, "subject": subject, "detail": detail}
+    if parameters is not None:
+        finding["parameters"] = parameters
+    return finding
+
+def _denies_everything(stack):
+    # Fedora's "other": nothing but pam_deny (and pam_warn), so the service cannot be used at all
+    return bool(stack) and all(entry.module in ("pam_deny.so", "pam_warn.so") for entry in stack)
+
+def _stack_subject(config, service, stack):
+    # Where a missing module belongs: the one file all of the stack comes from (common-auth for a
+    # login that only @includes it), so services sharing that file get one finding
+    paths = {entry.path for entry in stack}
+    return paths.pop() if len(paths) == 1 else f"{config.pam_dir}/{service}"
+
+def _password_findings(config, service, pwquality_conf):
+    stack = config.stack(service, "password")
+    if _denies_everything(stack):
+        return []
+    quality = [entry for entry in stack if entry.module in QUALITY_MODULES]
+    if not quality:
+        return [_finding("no_pwquality", "Medium", _stack_subject(config, service, stack),
+                         "The password stack does not run a password quality module (pam_pwquality.so, pam_cracklib.so or pam_passwdqc.so), so any password is accepted.")]
+    entry = quality[0]
+    if entry.module == "pam_passwdqc.so":
+        return _passwdqc_findings(entry)
+    findings = []
+    if entry.module == "pam_pwquality.so":
+        settings = _settings(PWQUALITY_DEFAULTS, read_conf(pwquality_conf), module_arguments(entry))
+    else:
+        settings = _settings(CRACKLIB_DEFAULTS, {}, module_arguments(entry))
+    subject = f"{entry.path}:{entry.line}"
+    parameters = {key: settings.get(key) for key in ("minlen", "dcredit", "ucredit", "lcredit", "ocredit", "minclass")}
+    if entry.control == "optional":
+        findings.append(_finding("pwquality_optional", "Medium", subject,
+                                 f"{entry.module} is 'optional' in the password stack, so a rejected password is still accepted. Use 'requisite'.", parameters))
+    if isinstance(settings["minlen"], int) and settings["minlen"] < MIN_PASSWORD_LENGTH:
+        findings.append(_finding("pwquality_minlen", "High", subject,
+                                 f"{entry.module} allows passwords shorter than {MIN_PASSWORD_LENGTH} characters (minlen={settings['minlen']}).", parameters))
+    credits = [settings.get(key) for key in ("dcredit", "ucredit", "lcredit", "ocredit")]
+    if all(not isinstance(value, int) or value >= 0 for value in credits) and (not isinstance(settings.get("minclass"), int) or settings["minclass"] < 2):
+        findings.append(_finding("pwquality_no_complexity", "Low", subject,
+                                 f"{entry.module} requires no character classes (no negative dcredit/ucredit/lcredit/ocredit, minclass < 2).", parameters))
+    return findings
+
+def _passwdqc_findings(entry):
+    settings = dict(PASSWDQC_DEFAULTS, **{key: value for key, value in module_arguments(entry).items() if isinstance(value, str)})
+    subject = f"{entry.path}:{entry.line}"
+    parameters = {"min": settings["min"], "enforce": settings["enforce"]}
+    limits = settings["min"].split(",")
+    if len(limits) != 5 or not all(limit == "disabled" or limit.isdigit() for limit in limits):
+        # Not something passwdqc itself accepts; left to the module to complain about
+        return []
+    findings = []
+    if entry.control == "optional" or settings["enforce"] == "none":
+        findings.append(_finding("pwquality_optional", "Medium", subject,
+                                 f"{entry.module} only warns about weak passwords ('{entry.control}', enforce={settings['enforce']}), so they are still accepted. Use 'requisite' and enforce=everyone.", parameters))
+    lengths = [int(limit) for limit in limits if limit != "disabled"]
+    if lengths and min(lengths) < MIN_PASSWORD_LENGTH:
+        findings.append(_finding("pwquality_minlen", "High", subject,
+                                 f"{entry.module} allows passwords shorter than {MIN_PASSWORD_LENGTH} characters (min={settings['min']}).", parameters))
+    if limits[0] != "disabled":
+        findings.append(_finding("pwquality_no_complexity", "Low", subject,
+                                 f"{entry.module} accepts passwords made of a single character class (the first min= value is not 'disabled').", parameters))
+    return findings
+
+def _lockout_findings(config, service, faillock_conf):
+    stack = config.stack(service, "auth")
+    if _denies_everything(stack):
+        return []
+    lockout = [entry for entry in stack if entry.module in LOCKOUT_MODULES]
+    if not lockout:
+        return [_finding("no_faillock", "Low", _stack_subject(config, service, stack),
+                         "The auth stack does not lock accounts after failed logins (pam_faillock.so), so passwords can be guessed indefinitely.")]
+    entry = lockout[0]
+    # pam_faillock reads faillock.conf; every call in the stack can override it, the first one counts here
+    settings = _settings(FAILLOCK_DEFAULTS, read_conf(faillock_conf) if entry.module == "pam_faillock.so" else {}, module_arguments(entry))
+    parameters = {"deny": settings.get("deny"), "unlock_time": settings.get("unlock_time")}
+    deny = settings.get("deny")
+    if isinstance(deny, int) and (deny == 0 or deny > MAX_FAILLOCK_DENY):
+        return [_finding("faillock_deny", "Low", f"{entry.path}:{entry.line}",
+                         f"{entry.module} locks an account only after {deny or 'unlimited'} failed logins (deny={deny}); use {MAX_FAILLOCK_DENY} or fewer.", parameters)]
+    return []
+
+def audit_pam(config=None, pwquality_conf=PWQUALITY_CONF, faillock_conf=FAILLOCK_CONF):
+    """
+    Evaluates the effective password stack (password quality) of every service in PASSWORD_SERVICES
+    and the auth stack (lockout) of every service in LOGIN_SERVICES that has a file in pam_dir.
+    :return: Findings in the same shape as core/accounts.py, plus finding["services"]: the services whose
+             stack has the problem. A line of a file several services include (common-password,
+             system-auth) is reported once for all of them. Module settings are in finding["parameters"].
+    """
+    config = config or PamConfig()
+    password_services = config.present_services(PASSWORD_SERVICES)
+    if not password_services:
+        return [_finding("no_pam_config", "Medium", config.pam_dir, f"No PAM configuration found in {config.pam_dir}, so password quality rules could not be checked.")]
+
+    # (id, subject) -> finding
+    merged = {}
+    checks = [(service, _password_findings(config, service, pwquality_conf)) for service in password_services]
+    checks += [(service, _lockout_findings(config, service, faillock_conf)) for service in config.present_services(LOGIN_SERVICES)]
+    for service, findings in checks:
+        for finding in findings:
+            finding = merged.setdefault((finding["id"], finding["subject"]), finding)
+            services = finding.setdefault("services", [])
+            if service not in services:
+                services.append(service)
+    for finding in merged.values():
+        finding["detail"] += f" Services: {', '.join(finding['services'])}."
+    return list(merged.values())
@@ -0,0 +1,153 @@
+# core/proc_net.py
+# Reads listening sockets straight from /proc/net/{tcp,tcp6,udp,udp6,raw,raw6} without spawning
+# ss or netstat, and finds the process owning each one through /proc/<pid>/fd.
+#
+# /proc/net/tcp line layout (addresses are hex, in host byte order per 32-bit word):
+#   sl  local_address rem_address   st tx_queue:rx_queue tr:tm->when retrnsmt  uid  timeout inode ...
+#    0: 0100007F:0277 00000000:0000 0A 00000000:00000000 00:00000000 00000000     0        0 12345 ...
+
+import os
+import socket
+import struct
+from collections import namedtuple
+
+# protocol -> (file under /proc/net, address family)
+PROC_NET_TABLES = {
+    "tcp": ("tcp", socket.AF_INET),
+    "tcp6": ("tcp6", socket.AF_INET6),
+    "udp": ("udp", socket.AF_INET),
+    "udp6": ("udp6", socket.AF_INET6),
+    "raw": ("raw", socket.AF_INET),
+    "raw6": ("raw6", socket.AF_INET6),
+}
+
+# Kernel socket states (include/net/tcp_states.h) as they appear in the "st" column.
+TCP_LISTEN = "0A"
+# Unconnected UDP and raw sockets sit in TCP_CLOSE; those are the ones receiving from anybody.
+UNCONNECTED = "07"
+
+ListeningSocket = namedtuple("ListeningSocket", ["protocol", "address", "port", "inode", "uid", "pid", "executable"])
+
+# The kernel prints each 32-bit word of the address as a number ("%08X"), so packing the words
+# back in native byte order restores the network-order bytes on any architecture.
+_big_endian_words = struct.Struct(">4I").unpack
+_native_words = struct.Struct("=4I").pack
+
+def _decode_ipv4(hex_address):
+    return socket.inet_ntop(socket.AF_INET, struct.pack("=I", int(hex_address, 16)))
+
+def _decode_ipv6(hex_address):
+    return socket.inet_ntop(socket.AF_INET6, _native_words(*_big_endian_words(bytes.fromhex(hex_address))))
+
+def _read_table(path, family, protocol, decoded):
+    """
+    Yields (protocol, address, port, inode, uid) for every listening/unconnected socket in one table.
+    :param decoded: Shared cache of hex address -> text; busy hosts repeat the same few addresses.
+    """
+    decode = _decode_ipv4 if family == socket.AF_INET else _decode_ipv6
+    wanted_state = TCP_LISTEN if protocol.startswith("tcp") else UNCONNECTED
+    with open(path, "r") as f:
+        lines = f.read().splitlines()
+    for line in lines[1:]: # skip the header
+        # Split only as far as the state column first: on a busy server nearly every row is an
+        # established connection and is rejected here.
+        fields = line.split(None, 4)
+        if len(fields) < 5 or fields[3] != wanted_state:
+            continue
+        # tx:rx tr:when retrnsmt uid timeout inode ...
+        rest = fields[4].split(None, 6)
+        if len(rest) < 6:
+            continue
+        hex_address, hex_port = fields[1].split(":")
+        address = decoded.get(hex_address)
+        if address is None:
+            address = decoded[hex_address] = decode(hex_address)
+        # For raw sockets the "port" column holds the IP protocol number.
+        yield protocol, address, int(hex_port, 16), int(rest[5]), int(rest[3])
+
+def _inode_owners(inodes, proc_root):
+    """
+    Maps socket inodes to the lowest PID holding them, by reading the /proc/<pid>/fd symlinks.
+    Stops as soon as every inode is found. Processes of other users are only visible to root.
+    """
+    owners = {}
+    remaining = set(inodes)
+    if not remaining:
+        return owners
+    try:
+        pids = sorted(int(entry.name) for entry in os.scandir(proc_root) if entry.name.isdigit())
+    except OSError:
+        return owners
+
+    for pid in pids:
+        fd_dir = os.path.join(proc_root, str(pid), "fd")
+        try:
+            fds = os.scandir(fd_dir)
+        except OSError:
+            continue # process gone, or not ours to look at
+        with fds:
+            for fd in fds:
+                try:
+                    target = os.readlink(fd.path)
+                except OSError:
+                    continue
+                # "socket:[12345]"
+                if target.startswith("socket:["):
+                    inode = int(target[8:-1])
+                    if inode in remaining:
+                        owners[inode] = pid
+                        remaining.discard(inode)
+        if not remaining:
+            break
+    return owners
+
+def _executable(pid, proc_root):
+    try:
+        return os.readlink(os.path.join(proc_root, str(pid), "exe"))
+    except OSError:
+        pass
+    # The exe link needs the same privileges as fd/; comm is world-readable but truncated to 15 characters.
+    try:
+        with open(os.path.join(proc_root, str(pid), "comm"), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def read_listening_sockets(proc_root="/proc", resolve_owners=True):
+    """
+    Reads every listening TCP socket and every unconnected UDP/raw socket in one pass over /proc/net.
+    :param proc_root: Root of the proc filesystem (a different path lets benchmarks feed recorded tables).
+    :param resolve_owners: If False, skip the /proc/<pid>/fd walk; pid and executable are then None.
+    :return: List of ListeningSocket, sorted by protocol, port and address.
+    :raises OSError: If none of the /proc/net tables can be read.
+    """
+    rows = []
+    decoded = {}
+    readable = 0
+    last_error = None
+    for protocol, (name, family) in PROC_NET_TABLES.items():
+        try:
+            rows.extend(_read_table(os.path.join(proc_root, "net", name), family, protocol, decoded))
+            readable += 1
+        except OSError as e:
+            # tcp6/udp6 are missing when IPv6 is disabled, raw6 on some minimal kernels.
+            last_error = e
+    if not readable:
+        raise last_error
+
+    owners = _inode_owners({row[3] for row in rows if row[3]}, proc_root) if resolve_owners else {}
+    executables = {}
+    sockets = []
+    for protocol, address, port, inode, uid in rows:
+        pid = owners.get(inode)
+        if pid is not None and pid not in executables:
+            executables[pid] = _executable(pid, proc_root)
+        sockets.append(ListeningSocket(protocol, address, port, inode, uid, pid, executables.get(pid)))
+    sockets.sort(key=lambda s: (s.protocol, s.port, s.address))
+    return sockets
+
+def format_endpoint(sock):
+    """'0.0.0.0:22', '[::]:22'"""
+    if ":" in sock.address:
+        return f"[{sock.address}]:{sock.port}"
+    return f"{sock.address}:{sock.port}"
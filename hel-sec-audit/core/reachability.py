@@ -0,0 +1,282 @@
+# core/reachability.py
+# Decides which listening sockets another machine can actually reach, by sending a "new connection
+# from outside" packet for each listener through the input chains of the firewall ruleset
+# (core/firewall_rules.py).
+#
+# Each chain's rules are indexed by destination port range and destination address range, so a
+# listener only visits the rules that can apply to it: thousands of sockets against thousands of
+# rules cost about (sockets x matching rules), not sockets x rules.
+
+import socket
+from collections import namedtuple
+
+from core.firewall_rules import DENY_VERDICTS
+
+EXPOSED = "exposed"        # accepted from any source
+RESTRICTED = "restricted"  # accepted only from some sources or interfaces, or under rules that cannot be evaluated
+BLOCKED = "blocked"        # dropped or rejected for every source
+LOOPBACK = "loopback"      # bound to a loopback address, never reachable from outside
+
+# Which result wins when a listener is evaluated for IPv4 and IPv6 (a dual-stack "::" socket)
+_STATUS_RANK = {EXPOSED: 3, RESTRICTED: 2, BLOCKED: 1, LOOPBACK: 0}
+
+_NO_MATCH, _PARTIAL, _FULL = 0, 1, 2
+
+# IP protocol numbers, for rules written as 'ip protocol 6'
+_PROTOCOL_NUMBERS = {"tcp": "6", "udp": "17"}
+_MAX_ADDRESS = {4: (1 << 32) - 1, 6: (1 << 128) - 1}
+_MAX_JUMP_DEPTH = 16
+
+Reachability = namedtuple("Reachability", ["socket", "status", "conditions"])
+
+class IntervalIndex:
+    """
+    Centered interval tree: finds every value whose closed interval [low, high] contains a point.
+    Built once in O(n log n); a query costs O(log n + matches).
+    """
+    def __init__(self, intervals):
+        """:param intervals: Iterable of (low, high, value)."""
+        intervals = sorted(intervals, key=lambda item: item[0])
+        self.size = len(intervals)
+        self._root = self._build(intervals)
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        # The median start always falls inside its own interval, so every level makes progress.
+        center = intervals[len(intervals) // 2][0]
+        left, here, right = [], [], []
+        for item in intervals:
+            if item[1] < center:
+                left.append(item)
+            elif item[0] > center:
+                right.append(item)
+            else:
+                here.append(item)
+        by_high = sorted(here, key=lambda item: item[1], reverse=True)
+        return (center, here, by_high, self._build(left), self._build(right))
+
+    def query(self, point):
+        found = []
+        node = self._root
+        while node:
+            center, by_low, by_high, left, right = node
+            if point < center:
+                for low, high, value in by_low:
+                    if low > point:
+                        break
+                    found.append(value)
+                node = left
+            elif point > center:
+                for low, high, value in by_high:
+                    if high < point:
+                        break
+                    found.append(value)
+                node = right
+            else:
+                found.extend(value for low, high, value in by_low)
+                break
+        return found
+
+class _ChainIndex:
+    def __init__(self, chain):
+        self.rules = chain.rules
+        # Rules without port or destination matches apply to every packet and are always candidates.
+        self.unindexed = []
+        self.destination_only = []
+        ports = []
+        destinations = {4: [], 6: []}
+        for rule in chain.rules:
+            if rule.dports is not None:
+                ports.extend((low, high, rule.position) for low, high in rule.dports)
+            elif rule.destinations is not None:
+                self.destination_only.append(rule.position)
+                for version, first, last in rule.destinations:
+                    destinations[version].append((first, last, rule.position))
+            else:
+                self.unindexed.append(rule.position)
+        self.ports = IntervalIndex(ports)
+        self.destinations = {version: IntervalIndex(items) for version, items in destinations.items()}
+
+    def candidates(self, port, version, address):
+        """:return: The chain's rules that may match the packet, in chain order."""
+        positions = set(self.unindexed)
+        positions.update(self.ports.query(port))
+        if address is None:
+            # A wildcard listener is reachable through any local address
+            positions.update(self.destination_only)
+        else:
+            positions.update(self.destinations[version].query(address))
+        return [self.rules[position] for position in sorted(positions)]
+
+class ReachabilityAnalyzer:
+    def __init__(self, ruleset):
+        """:param ruleset: A firewall_rules.Ruleset."""
+        self.ruleset = ruleset
+        self._indexes = {}
+        # (protocol, version, address, port) -> (status, conditions); tcp and tcp6 often share ports
+        self._memo = {}
+
+    def analyze(self, sockets):
+        """
+        :param sockets: proc_net.ListeningSocket list; raw sockets are skipped (they have no port).
+        :return: List of Reachability(socket, status, conditions), conditions being text like "from 10.0.0.0/8".
+        """
+        return [Reachability(sock, *self.evaluate(sock)) for sock in sockets if sock.protocol.startswith(("tcp", "udp"))]
+
+    def evaluate(self, sock):
+        protocol = sock.protocol.rstrip("6")
+        best = (LOOPBACK, [])
+        for version, address in _packet_destinations(sock.address):
+            result = self._memo.get((protocol, version, address, sock.port))
+            if result is None:
+                result = self._evaluate_packet((protocol, version, address, sock.port))
+                self._memo[(protocol, version, address, sock.port)] = result
+            if _STATUS_RANK[result[0]] > _STATUS_RANK[best[0]]:
+                best = result
+        return best
+
+    def _evaluate_packet(self, packet):
+        protocol, version, address, port = packet
+        if address is not None and _is_loopback(version, address):
+            return (LOOPBACK, [])
+
+        # The packet has to get through every input chain of its family, in priority order.
+        status, conditions = EXPOSED, []
+        for chain in self.ruleset.input_chains():
+            if chain.family != "inet" and chain.family != ("ip" if version == 4 else "ip6"):
+                continue
+            accepted = []
+            verdict = self._walk(chain, packet, [], accepted, 0)
+            if verdict is None:
+                verdict = chain.policy or "accept"
+            if verdict == "accept":
+                continue
+            if not accepted:
+                return (BLOCKED, [])
+            status = RESTRICTED
+            conditions.extend(condition for condition in accepted if condition not in conditions)
+        return (status, conditions)
+
+    def _walk(self, chain, packet, context, accepted, depth):
+        """
+        Follows the packet through one chain.
+        :param context: Conditions of the partial jumps that led here.
+        :param accepted: Collects conditions under which some of the packets are accepted.
+        :return: The verdict for packets no conditional rule took ("accept", "drop", ...), or None when they
+                 fall off the end of the chain or return.
+        """
+        if depth > _MAX_JUMP_DEPTH:
+            return None
+        index = self._indexes.get(chain.key)
+        if index is None:
+            index = self._indexes[chain.key] = _ChainIndex(chain)
+
+        for rule in index.candidates(packet[3], packet[1], packet[2]):
+            match = _match(rule, packet)
+            if match == _NO_MATCH:
+                continue
+            conditions = context if match == _FULL else context + _describe_conditions(rule, packet[1])
+
+            if rule.verdict in ("jump", "goto"):
+                target = self.ruleset.jump_target(chain, rule)
+                if target is None:
+                    continue
+                verdict = self._walk(target, packet, conditions, accepted, depth + 1)
+                if match == _FULL and (verdict is not None or rule.verdict == "goto"):
+                    return verdict
+            elif rule.verdict == "accept":
+                if match == _FULL and not context:
+                    return "accept"
+                accepted.append(" and ".join(conditions) or "for some packets")
+                if match == _FULL:
+                    return "accept"
+            elif rule.verdict in DENY_VERDICTS or rule.verdict == "return":
+                if match == _FULL:
+                    return None if rule.verdict == "return" else rule.verdict
+        return None
+
+def analyze(sockets, ruleset):
+    """Convenience wrapper: ReachabilityAnalyzer(ruleset).analyze(sockets)."""
+    return ReachabilityAnalyzer(ruleset).analyze(sockets)
+
+def is_loopback_bound(sock):
+    """:return: True if the socket only receives packets sent to a loopback address; no firewall data is needed for that."""
+    return all(address is not None and _is_loopback(version, address) for version, address in _packet_destinations(sock.address))
+
+def _packet_destinations(address):
+    """:return: [(ip version, address as integer or None for a wildcard bind)] a socket receives packets for."""
+    if address == "0.0.0.0":
+        return [(4, None)]
+    if address == "::":
+        # Dual-stack unless IPV6_V6ONLY is set, which /proc/net does not show
+        return [(6, None), (4, None)]
+    if ":" in address:
+        packed = socket.inet_pton(socket.AF_INET6, address)
+        if packed.startswith(b"\0" * 10 + b"\xff\xff"):
+            return [(4, int.from_bytes(packed[12:], "big"))] # ::ffff:a.b.c.d
+        return [(6, int.from_bytes(packed, "big"))]
+    return [(4, int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big"))]
+
+def _is_loopback(version, address):
+    if version == 4:
+        return address >> 24 == 127
+    return address == 1
+
+def _match(rule, packet):
+    protocol, version, address, port = packet
+    if rule.protocols is not None and protocol not in rule.protocols and _PROTOCOL_NUMBERS.get(protocol) not in rule.protocols:
+        return _NO_MATCH
+    if rule.dports is not None and not any(low <= port <= high for low, high in rule.dports):
+        return _NO_MATCH
+    if rule.ct_states is not None and "new" not in rule.ct_states:
+        # "established,related", "invalid", "untracked", ...: not the first packet of a connection
+        return _NO_MATCH
+    if rule.ct_statuses:
+        # The first packet of an inbound connection to a local socket was not NATed, has seen no
+        # reply and is not confirmed yet: it carries none of the status bits.
+        return _NO_MATCH
+
+    partial = rule.opaque
+    if rule.in_interfaces is not None:
+        if all(interface == "lo" for interface in rule.in_interfaces):
+            return _NO_MATCH
+        partial = True
+    if rule.destinations is not None:
+        ranges = [r for r in rule.destinations if r[0] == version]
+        if not ranges:
+            return _NO_MATCH
+        if address is None:
+            partial = True
+        elif not any(first <= address <= last for _, first, last in ranges):
+            return _NO_MATCH
+    if rule.sources is not None:
+        ranges = [r for r in rule.sources if r[0] == version]
+        if not ranges:
+            return _NO_MATCH
+        if not any(first == 0 and last == _MAX_ADDRESS[version] for _, first, last in ranges):
+            partial = True
+    return _PARTIAL if partial else _FULL
+
+def _describe_conditions(rule, version):
+    conditions = []
+    if rule.sources is not None:
+        conditions.append("from " + ", ".join(format_range(r) for r in rule.sources if r[0] == version))
+    if rule.in_interfaces is not None:
+        conditions.append("on " + ", ".join(sorted(rule.in_interfaces)))
+    if rule.destinations is not None:
+        conditions.append("via " + ", ".join(format_range(r) for r in rule.destinations if r[0] == version))
+    if rule.opaque:
+        conditions.append(f"if rule {rule.position + 1} of {rule.chain[2]} matches")
+    return conditions
+
+def format_range(address_range):
+    """(4, first, last) -> "10.0.0.0/8" (or "first-last" when the range is not a prefix)."""
+    version, first, last = address_range
+    family, size = (socket.AF_INET, 4) if version == 4 else (socket.AF_INET6, 16)
+    start = socket.inet_ntop(family, first.to_bytes(size, "big"))
+    span = last - first + 1
+    if span & (span - 1) == 0 and first % span == 0:
+        prefix = size * 8 - (span.bit_length() - 1)
+        return start if prefix == size * 8 else f"{start}/{prefix}"
+    return f"{start}-{socket.inet_ntop(family, last.to_bytes(size, 'big'))}"
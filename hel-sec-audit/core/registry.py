@@ -0,0 +1,164 @@
+# core/registry.py
+# Discovers security checks without importing them.
+#
+# A check module declares its metadata in a module-level CHECK_INFO dict literal, e.g.
+#
+#   CHECK_INFO = {
+#       "name": "Firewall Status",          # shown in the GUI, the CLI and the config file
+#       "class": "FirewallStatusCheck",     # the check class inside the module
+#       "os": ["linux", "windows"],         # platforms the check supports
+#       "cost": "cheap",                    # "cheap", "moderate" or "expensive" (network, package databases)
+#       "privileges": "root",               # "user" or "root" (uses sudo)
+#       "order": 40                         # position in scans and lists
+#   }
+#
+# Built-in checks are found by scanning core/checks/*.py; in-house checks can be shipped as separate
+# packages that register the module under the "hel_sec_audit.checks" entry point group:
+#
+#   [project.entry-points."hel_sec_audit.checks"]
+#   disk_encryption = "acme_checks.disk_encryption"
+#
+# CHECK_INFO is read with ast.literal_eval, so a check module is only imported once it actually runs.
+
+import ast
+import importlib
+import importlib.util
+import os
+import platform
+import re
+import sys
+
+ENTRY_POINT_GROUP = "hel_sec_audit.checks"
+
+_CHECK_INFO_START = re.compile(r"^CHECK_INFO\s*=\s*", re.MULTILINE)
+
+# Checks without an "order" sort after the built-in ones.
+DEFAULT_ORDER = 1000
+
+class CheckSpec:
+    def __init__(self, module, info, source):
+        """
+        :param module: Dotted module name, e.g. "core.checks.firewall_status".
+        :param info: The module's CHECK_INFO dict.
+        :param source: "builtin" or the name of the entry point that registered it.
+        """
+        self.module = module
+        self.name = info["name"]
+        self.class_name = info["class"]
+        self.os = list(info.get("os", ["linux", "windows"]))
+        self.cost = info.get("cost", "moderate")
+        self.privileges = info.get("privileges", "user")
+        self.order = info.get("order", DEFAULT_ORDER)
+        self.source = source
+
+    def supports_current_os(self):
+        return platform.system().lower() in self.os
+
+    def load(self):
+        """Imports the check's module and returns its class."""
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+    def create(self):
+        return self.load()()
+
+def read_check_info(path):
+    """
+    :return: The CHECK_INFO dict declared at the top level of the file, or None if there is none.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    match = _CHECK_INFO_START.search(source)
+    if not match:
+        return None
+    # Only the literal itself is parsed, not the whole module: it ends at the first line
+    # after which the text so far evaluates cleanly.
+    literal = ""
+    for line in source[match.end():].splitlines(keepends=True):
+        literal += line
+        try:
+            return ast.literal_eval(literal.strip())
+        except (SyntaxError, ValueError):
+            continue
+    return None
+
+def _builtin_specs():
+    checks_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checks")
+    specs = []
+    for entry in sorted(os.scandir(checks_dir), key=lambda entry: entry.name):
+        if not entry.name.endswith(".py") or entry.name.startswith("_"):
+            continue
+        info = read_check_info(entry.path)
+        if info:
+            specs.append(CheckSpec(f"core.checks.{entry.name[:-3]}", info, "builtin"))
+    return specs
+
+def _has_entry_point_plugins():
+    # importlib.metadata is slow to import (it drags in email, zipfile, ...), so first look for
+    # an installed distribution that declares the group at all. This is the common no-plugin case.
+    marker = f"[{ENTRY_POINT_GROUP}]"
+    for path in sys.path:
+        try:
+            entries = list(os.scandir(path or "."))
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.name.endswith((".dist-info", ".egg-info")):
+                continue
+            try:
+                with open(os.path.join(entry.path, "entry_points.txt"), "r", encoding="utf-8") as f:
+                    if marker in f.read():
+                        return True
+            except OSError:
+                continue
+    return False
+
+def _entry_point_specs():
+    if not _has_entry_point_plugins():
+        return []
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+    try:
+        points = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10 returns a dict of groups
+        points = entry_points().get(ENTRY_POINT_GROUP, [])
+
+    specs = []
+    for point in points:
+        module = point.value.split(":", 1)[0]
+        try:
+            # find_spec locates the file without executing the module (only its parent packages).
+            module_spec = importlib.util.find_spec(module)
+            info = read_check_info(module_spec.origin) if module_spec and module_spec.origin else None
+        except Exception as e:
+            print(f"Warning: Could not read security check plugin '{point.name}' ({point.value}): {e}", file=sys.stderr)
+            continue
+        if not info:
+            print(f"Warning: Security check plugin '{point.name}' ({point.value}) declares no CHECK_INFO; skipping it.", file=sys.stderr)
+            continue
+        specs.append(CheckSpec(module, info, point.name))
+    return specs
+
+_discovered = None
+
+def discover_checks():
+    """
+    :return: {check name: CheckSpec} for every built-in and plugin check, in scan order.
+             The result is computed once per process.
+    """
+    global _discovered
+    if _discovered is None:
+        specs = {}
+        for spec in _builtin_specs() + _entry_point_specs():
+            if spec.name in specs:
+                print(f"Warning: Security check '{spec.name}' from '{spec.source}' clashes with an existing check; skipping it.", file=sys.stderr)
+                continue
+            specs[spec.name] = spec
+        _discovered = dict(sorted(specs.items(), key=lambda item: item[1].order))
+    return _discovered
+
+def check_names():
+    """:return: Names of the checks that can run on this platform, in scan order."""
+    return [name for name, spec in discover_checks().items() if spec.supports_current_os()]
@@ -13,6 +13,8 @@
 import os
 from datetime import datetime
 
+from core.instrumentation import format_timing_table
+
 class ReportGenerator:
     @staticmethod
     def generate(scan_results, output_path="data/reports/security_report.pdf"):
@@ -48,8 +50,20 @@ class ReportGenerator:
                 f.write(f"Status: {'Secure' if result.get('is_secure', True) else 'Vulnerable'}\n")
                 f.write(f"Severity: {result.get('severity', 'N/A')}\n")
                 f.write(f"Description: {result.get('description', 'No description.')}\n")
+                # Checks that report several problems at once list each one (the description may be shortened)
+                # الفحوصات التي تعيد عدة مشاكل تسرد كل واحدة منها
+                if result.get('findings'):
+                    f.write("Findings:\n")
+                    for finding in result['findings']:
+                        f.write(f"  - [{finding.get('severity', 'N/A')}] {finding.get('detail', '')}\n")
                 f.write(f"Solution: {result.get('solution', 'No solution provided.')}\n\n")
 
+            # Where the scan spent its time, per check, per shared fact and per command
+            # ملخص زمن الفحص لكل فحص ولكل أمر
+            f.write("-------------------------------------\n")
+            f.write("Scan Timing:\n")
+            f.write(format_timing_table(scan_results) + "\n")
+
         print(f"Basic text report generated at {text_report_path}. Replace with actual PDF generation code.")
 
         # To implement actual PDF generation using ReportLab:
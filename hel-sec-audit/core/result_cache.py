@@ -0,0 +1,107 @@
+# core/result_cache.py
+# Persists check results between scans so unchanged checks do not re-run slow probes
+# (apt update, freshclam, ...). Stored next to the ConfigManager file:
+# ~/.config/hel-sec-audit/result_cache.json
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from core.fingerprints import inputs_unchanged
+
+def path_fingerprint(paths):
+    """
+    Cheap change detector for a check's inputs: the mtime of each path (None when missing).
+    For directories such as /var/lib/pacman/local the mtime changes whenever an entry is added or removed.
+    """
+    fingerprint = {}
+    for path in paths:
+        try:
+            fingerprint[path] = os.stat(os.path.expanduser(path)).st_mtime_ns
+        except OSError:
+            fingerprint[path] = None
+    return fingerprint
+
+class ResultCache:
+    def __init__(self, cache_filename="result_cache.json"):
+        cache_dir = Path.home() / ".config" / "hel-sec-audit"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self.cache_path = cache_dir / cache_filename
+        self._lock = threading.Lock()
+        self.entries = self._load_cache()
+
+    def _load_cache(self):
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, "r") as f:
+                    entries = json.load(f)
+                    if isinstance(entries, dict):
+                        return entries
+            except (json.JSONDecodeError, OSError):
+                print(f"Warning: Corrupted result cache '{self.cache_path}'. Starting with an empty cache.", file=sys.stderr)
+        return {}
+
+    def get(self, check_name, ttl, fingerprint):
+        """
+        Returns the cached result for a check, or None when it is missing, older than ttl seconds,
+        or was stored under a different input fingerprint.
+        """
+        if not ttl or ttl <= 0:
+            return None
+        with self._lock:
+            entry = self.entries.get(check_name)
+        if not entry:
+            return None
+        if time.time() - entry.get("stored_at", 0) > ttl:
+            return None
+        if entry.get("fingerprint") != fingerprint:
+            return None
+        # Files the check actually read, e.g. a prefs.js below a cache_inputs directory whose own mtime did not move.
+        inputs = entry.get("inputs")
+        if inputs and inputs.get("files") and not inputs.get("volatile") and not inputs_unchanged(inputs):
+            return None
+        return dict(entry["result"], cached=True)
+
+    def get_unchanged(self, check_name):
+        """
+        Returns the last result of a check, whatever its age, if none of the files it read
+        (see core/fingerprints.py) changed since. Used by incremental rescans.
+        """
+        with self._lock:
+            entry = self.entries.get(check_name)
+        if not entry or not inputs_unchanged(entry.get("inputs")):
+            return None
+        return dict(entry["result"], cached=True)
+
+    def put(self, check_name, result, fingerprint, inputs=None):
+        with self._lock:
+            self.entries[check_name] = {
+                "stored_at": time.time(),
+                "fingerprint": fingerprint,
+                "inputs": inputs,
+                # Timings describe one particular run, so they are not replayed with a cached result.
+                "result": {key: value for key, value in result.items() if key not in ("cached", "timing")}
+            }
+
+    def invalidate(self, check_name=None):
+        with self._lock:
+            if check_name is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(check_name, None)
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.entries, indent=4)
+        # Write to a temporary file first so a crash never leaves a half-written cache behind.
+        temp_path = self.cache_path.with_suffix(".tmp")
+        try:
+            with open(temp_path, "w") as f:
+                f.write(data)
+            os.replace(temp_path, self.cache_path)
+        except Exception as e:
+            print(f"Error saving result cache: {e}", file=sys.stderr)
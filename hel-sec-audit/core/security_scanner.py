@@ -1,44 +1,341 @@
 # core/security_scanner.py
 # Orchestrates the execution of various security checks.
 
-from core.checks.system_updates import SystemUpdatesCheck
-from core.checks.weak_passwords import WeakPasswordsCheck
-from core.checks.open_ports import OpenPortsCheck
-from core.checks.firewall_status import FirewallStatusCheck
-from core.checks.antivirus_status import AntivirusStatusCheck
-from core.checks.browser_security import BrowserSecurityCheck
-from core.checks.software_updates import SoftwareUpdatesCheck # <--- استيراد الفحص الجديد
+import queue
+import threading
+import time
+from collections.abc import Mapping
+
 from core.config_manager import ConfigManager
+from core.registry import discover_checks
+from core.async_utils import set_max_concurrency
+from core.facts import FactProvider
+from core.result_cache import ResultCache, path_fingerprint
+from core.fingerprints import recording_inputs
+from core.instrumentation import timing_scope
+
+# How often (seconds) the concurrent runner wakes up to look for checks that ran past their timeout
+# or for a cancellation request.
+TIMEOUT_POLL_INTERVAL = 0.25
+
+# Results with these titles describe a failure of the scan itself and are never cached.
+UNCACHEABLE_TITLES = ("Timed out", "Check Failed")
 
 class SecurityScanner:
     def __init__(self):
         self.config_manager = ConfigManager()
-        self.all_checks = {
-            "System Updates Status": SystemUpdatesCheck(),
-            "Weak Password Policies/Usage": WeakPasswordsCheck(),
-            "Open Network Ports": OpenPortsCheck(),
-            "Firewall Status": FirewallStatusCheck(),
-            "Antivirus Status": AntivirusStatusCheck(),
-            "Browser Security Settings": BrowserSecurityCheck(),
-            "Installed Software Updates": SoftwareUpdatesCheck() # <--- إضافة الفحص الجديد هنا
-        }
+        self.result_cache = ResultCache()
+        # Checks are discovered through core/registry.py (built-in ones and "hel_sec_audit.checks" plugins)
+        # الفحوصات تُكتشف تلقائياً ولا تُستورد إلا عند تشغيلها
+        self.check_specs = discover_checks()
+        self.all_checks = _LazyChecks(self.check_specs)
+
+    def run_all_checks(self, progress_callback=None, max_workers=None, check_timeout=None, force_refresh=False, incremental=False,
+                       result_callback=None, cancel_event=None, check_names=None):
+        """
+        Runs every enabled check and returns their results in configuration order.
+        :param progress_callback: Called as progress_callback(percentage, message) each time a check finishes.
+        :param max_workers: Maximum number of checks running at once (defaults to the "scan_settings" config).
+        :param check_timeout: Per-check wall-clock limit in seconds; None or 0 disables it.
+        :param force_refresh: If True, ignore cached results and re-run every check.
+        :param incremental: If True, reuse the previous result of every check whose input files did not change.
+        :param result_callback: Called with each result as soon as its check finishes (cached results first).
+        :param cancel_event: threading.Event; once set, checks that have not finished are dropped from the scan.
+        :param check_names: Run exactly these checks instead of the ones enabled in the configuration.
+        :return: List of result dictionaries (without the checks that were cancelled).
+        """
+        scan_settings = self.config_manager.get_scan_settings()
+        if max_workers is None:
+            max_workers = scan_settings.get("max_workers", 4) if scan_settings.get("concurrent", True) else 1
+        if check_timeout is None:
+            check_timeout = scan_settings.get("check_timeout")
+
+        scan = _Scan(self, self._enabled_checks(check_names), progress_callback, force_refresh, incremental, result_callback)
+        if scan.pending:
+            if max_workers <= 1 and not check_timeout:
+                self._run_sequentially(scan, cancel_event)
+            else:
+                self._run_concurrently(scan, max(1, max_workers), check_timeout, cancel_event)
+        return scan.finish()
+
+    def iter_checks(self, progress_callback=None, max_workers=None, check_timeout=None, force_refresh=False, incremental=False,
+                    check_names=None):
+        """
+        Generator version of run_all_checks: yields each result as soon as its check finishes.
+        The scan runs on a background thread; closing the generator (or breaking out of the loop)
+        cancels the checks that are still running.
+        """
+        results = queue.Queue()
+        cancel_event = threading.Event()
+        finished = object()
+        errors = []
+
+        def run():
+            try:
+                self.run_all_checks(progress_callback, max_workers, check_timeout, force_refresh, incremental,
+                                    result_callback=results.put, cancel_event=cancel_event, check_names=check_names)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                results.put(finished)
+
+        threading.Thread(target=run, name="hel-sec-scan", daemon=True).start()
+        try:
+            while True:
+                result = results.get()
+                if result is finished:
+                    break
+                yield result
+        finally:
+            cancel_event.set()
+        if errors:
+            raise errors[0]
+
+    async def run_all_checks_async(self, progress_callback=None, check_timeout=None, force_refresh=False, incremental=False,
+                                   result_callback=None, check_names=None):
+        """
+        Runs every enabled check on the running event loop through each check's run_check_async.
+        Child processes are capped by core.async_utils instead of by a thread pool.
+        To stop a scan early, cancel the task running this coroutine.
+        :param progress_callback: Called as progress_callback(percentage, message) each time a check finishes.
+        :param check_timeout: Per-check wall-clock limit in seconds; None or 0 disables it.
+        :param force_refresh: If True, ignore cached results and re-run every check.
+        :param incremental: If True, reuse the previous result of every check whose input files did not change.
+        :param result_callback: Called with each result as soon as its check finishes (cached results first).
+        :param check_names: Run exactly these checks instead of the ones enabled in the configuration.
+        :return: List of result dictionaries in configuration order.
+        """
+        # Imported here so the synchronous scan (GUI, CLI) does not pay for loading asyncio.
+        import asyncio
+
+        scan_settings = self.config_manager.get_scan_settings()
+        if check_timeout is None:
+            check_timeout = scan_settings.get("check_timeout")
+        set_max_concurrency(scan_settings.get("max_processes", 16))
 
-    def run_all_checks(self, progress_callback=None):
-        results = []
+        scan = _Scan(self, self._enabled_checks(check_names), progress_callback, force_refresh, incremental, result_callback)
+        if not scan.pending:
+            return scan.finish()
+
+        # Resolve the shared fact graph in the background; checks that need a fact wait only for that fact.
+        prefetch = asyncio.ensure_future(scan.facts.resolve_async(self._required_facts(scan.pending_checks())))
+
+        async def run_one(index, check):
+            # Each coroutine runs in its own task, so every check gets its own input recorder.
+            with recording_inputs() as recorder, timing_scope() as timing:
+                try:
+                    result = await asyncio.wait_for(check.run_check_async(scan.facts), check_timeout or None)
+                except asyncio.TimeoutError:
+                    result = self._create_timeout_result(check, check_timeout)
+                except Exception as e:
+                    result = self._create_error_result(check, e)
+            result["timing"] = timing.to_dict()
+            return index, result, recorder.to_dict()
+
+        for next_done in asyncio.as_completed([run_one(index, check) for index, check in scan.pending]):
+            index, result, inputs = await next_done
+            scan.complete(index, result, inputs)
+        await prefetch
+        return scan.finish()
+
+    def _enabled_checks(self, check_names=None):
+        if check_names is not None:
+            return [self.all_checks[check_name] for check_name in check_names]
         enabled_checks_config = self.config_manager.get_all_check_settings()
-        
-        checks_to_run = [
-            check_instance for check_name, check_instance in self.all_checks.items()
-            if enabled_checks_config.get(check_name, True) 
+        # Only the checks that will run are imported and instantiated.
+        return [
+            self.all_checks[check_name] for check_name, spec in self.check_specs.items()
+            if spec.supports_current_os() and enabled_checks_config.get(check_name, True)
         ]
 
-        total_checks = len(checks_to_run)
-        
-        for i, check in enumerate(checks_to_run):
-            result = check.run_check()
-            results.append(result)
-            
-            if progress_callback:
-                progress_percentage = int(((i + 1) / total_checks) * 100)
-                progress_callback(progress_percentage, f"Running: {check.check_name}")
-        return results
+    def _required_facts(self, checks):
+        names = []
+        for check in checks:
+            for name in getattr(check, "required_facts", []):
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def _run_sequentially(self, scan, cancel_event=None):
+        for index, check in scan.pending:
+            if cancel_event is not None and cancel_event.is_set():
+                scan.cancel(index)
+            else:
+                scan.complete(index, *self._run_single_check(check, scan.facts))
+
+    def _run_concurrently(self, scan, max_workers, check_timeout, cancel_event=None):
+        # Checks mostly wait on subprocesses (apt, freshclam, iptables, ss), so threads overlap them well.
+        # A check that runs past check_timeout is reported as "Timed out"; its thread cannot be killed,
+        # but the scan no longer waits for it. The threads are daemon threads rather than a
+        # ThreadPoolExecutor, whose workers the interpreter joins at exit: an abandoned check (e.g. a
+        # probe stuck on a sudo prompt) must not keep the process alive after the results are out.
+        started_at = {}
+        tasks = queue.Queue()
+        finished = queue.Queue()
+        stopped = threading.Event()
+        for index, check in scan.pending:
+            tasks.put((index, check))
+
+        def worker():
+            while not stopped.is_set():
+                try:
+                    index, check = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                finished.put((index, self._run_timed_check(check, scan.facts, index, started_at)))
+
+        # The fact graph is resolved on its own thread so checks waiting on a fact can never starve it.
+        threading.Thread(target=scan.facts.resolve, args=(self._required_facts(scan.pending_checks()), max_workers),
+                         name="hel-sec-facts", daemon=True).start()
+        for number in range(min(max_workers, len(scan.pending))):
+            threading.Thread(target=worker, name=f"hel-sec-check_{number}", daemon=True).start()
+
+        pending = dict(scan.pending)
+        try:
+            while pending:
+                poll = TIMEOUT_POLL_INTERVAL if check_timeout or cancel_event is not None else None
+                try:
+                    index, outcome = finished.get(timeout=poll)
+                    # A check that already timed out is no longer pending; its late result is dropped.
+                    if pending.pop(index, None) is not None:
+                        scan.complete(index, *outcome)
+                except queue.Empty:
+                    pass
+
+                if cancel_event is not None and cancel_event.is_set():
+                    # Queued checks are never started; running ones are abandoned like timeouts.
+                    for index in pending:
+                        scan.cancel(index)
+                    break
+
+                if check_timeout:
+                    now = time.monotonic()
+                    for index, check in list(pending.items()):
+                        start = started_at.get(index)
+                        if start is not None and now - start > check_timeout:
+                            del pending[index]
+                            scan.complete(index, self._create_timeout_result(check, check_timeout))
+        finally:
+            stopped.set()
+
+    def _run_timed_check(self, check, facts, index, started_at):
+        started_at[index] = time.monotonic()
+        return self._run_single_check(check, facts)
+
+    def _run_single_check(self, check, facts):
+        """
+        :return: (result, inputs), where inputs are the file fingerprints the check recorded.
+        The result carries a "timing" block (see core/instrumentation.py).
+        """
+        with recording_inputs() as recorder, timing_scope() as timing:
+            try:
+                result = check.run_check(facts)
+            except Exception as e:
+                result = self._create_error_result(check, e)
+        result["timing"] = timing.to_dict()
+        return result, recorder.to_dict()
+
+    def _create_error_result(self, check, error):
+        return {
+            "check_name": check.check_name,
+            "is_secure": False,
+            "title": "Check Failed",
+            "description": f"An unexpected error occurred: {error}",
+            "solution": "N/A",
+            "severity": "Medium"
+        }
+
+    def _create_timeout_result(self, check, check_timeout):
+        return {
+            "check_name": check.check_name,
+            "is_secure": False,
+            "title": "Timed out",
+            "description": f"The check did not finish within {check_timeout} seconds and was abandoned.",
+            "solution": "Re-run the scan, or raise 'check_timeout' in the scan settings if this check is slow on your system.",
+            "severity": "Medium"
+        }
+
+
+class _LazyChecks(Mapping):
+    # {check name: check instance}, creating each check (and importing its module) on first access.
+    def __init__(self, specs):
+        self._specs = specs
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, check_name):
+        with self._lock:
+            if check_name not in self._instances:
+                self._instances[check_name] = self._specs[check_name].create()
+            return self._instances[check_name]
+
+    def __iter__(self):
+        return iter(self._specs)
+
+    def __len__(self):
+        return len(self._specs)
+
+
+class _Scan:
+    # Book-keeping for one scan: which checks still have to run, their results,
+    # progress reporting, and the hand-off to and from the result cache.
+    def __init__(self, scanner, checks, progress_callback, force_refresh, incremental=False, result_callback=None):
+        self.scanner = scanner
+        self.checks = checks
+        self.progress_callback = progress_callback
+        self.result_callback = result_callback
+        # One provider per scan: shared probes are computed once and never leak into the next scan.
+        self.facts = FactProvider()
+        self.results = [None] * len(checks)
+        self.completed = 0
+
+        cache_settings = scanner.config_manager.get_cache_settings()
+        self.cache_enabled = cache_settings.get("enabled", True)
+        self.ttls = cache_settings.get("ttl", {})
+        self.fingerprints = {}
+
+        self.pending = []
+        for index, check in enumerate(checks):
+            cached, verb = None, "Cached"
+            if self.cache_enabled:
+                self.fingerprints[index] = path_fingerprint(getattr(check, "cache_inputs", []))
+                if incremental and not force_refresh:
+                    # Unlike the TTL cache, an unchanged result is reused however old it is,
+                    # and a check whose inputs changed (or that reads live state) always re-runs.
+                    cached, verb = scanner.result_cache.get_unchanged(check.check_name), "Unchanged"
+                elif not force_refresh:
+                    cached = scanner.result_cache.get(check.check_name, self.ttls.get(check.check_name, 0), self.fingerprints[index])
+            if cached is not None:
+                self._record(index, cached, verb)
+            else:
+                self.pending.append((index, check))
+
+    def pending_checks(self):
+        return [check for index, check in self.pending]
+
+    def complete(self, index, result, inputs=None):
+        check = self.checks[index]
+        if self.cache_enabled and result.get("title") not in UNCACHEABLE_TITLES:
+            self.scanner.result_cache.put(check.check_name, result, self.fingerprints[index], inputs)
+        self._record(index, result, "Finished")
+
+    def cancel(self, index):
+        # The check leaves no result behind; only the progress moves on.
+        self._report_progress(index, "Cancelled")
+
+    def _record(self, index, result, verb):
+        self.results[index] = result
+        if self.result_callback:
+            self.result_callback(result)
+        self._report_progress(index, verb)
+
+    def _report_progress(self, index, verb):
+        self.completed += 1
+        if self.progress_callback:
+            progress_percentage = int((self.completed / len(self.checks)) * 100)
+            self.progress_callback(progress_percentage, f"{verb}: {self.checks[index].check_name}")
+
+    def finish(self):
+        if self.cache_enabled and self.pending:
+            self.scanner.result_cache.save()
+        return [result for result in self.results if result is not None]
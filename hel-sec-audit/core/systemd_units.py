@@ -0,0 +1,78 @@
+# core/systemd_units.py
+# State of systemd units for the whole scan, fetched in batches: every unit the checks asked about
+# is queried with a single 'systemctl show' call instead of one 'systemctl is-active' per unit.
+
+import threading
+
+from core.utils import run_command
+
+SHOW_PROPERTIES = ["Id", "LoadState", "ActiveState", "SubState", "UnitFileState"]
+UNIT_SUFFIXES = (".service", ".socket", ".timer", ".target", ".mount", ".path", ".slice", ".scope", ".device", ".swap", ".automount")
+
+def show_command(units):
+    return ["systemctl", "show", "--property=" + ",".join(SHOW_PROPERTIES), "--"] + list(units)
+
+def parse_show_output(stdout):
+    """:return: One {property: value} dict per unit, in the order the units were given."""
+    blocks = []
+    for block in stdout.strip("\n").split("\n\n"):
+        properties = {}
+        for line in block.splitlines():
+            key, sep, value = line.partition("=")
+            if sep:
+                properties[key] = value
+        if properties:
+            blocks.append(properties)
+    return blocks
+
+def _unit_id(unit):
+    # systemctl treats a bare name as a service
+    return unit if unit.endswith(UNIT_SUFFIXES) else unit + ".service"
+
+class UnitStates:
+    def __init__(self, run=run_command):
+        """:param run: Command runner, run_command by default."""
+        self._run = run
+        self._units = {} # unit -> {property: value}, or None when it could not be queried
+        self._lock = threading.Lock()
+        # False once systemctl turned out to be missing or systemd is not running (containers, WSL1)
+        self.available = True
+
+    def load(self, units):
+        """Fetches every unit not known yet with one systemctl call."""
+        with self._lock:
+            missing = [unit for unit in dict.fromkeys(units) if unit not in self._units]
+            if not missing:
+                return
+            if not self.available:
+                self._units.update((unit, None) for unit in missing)
+                return
+
+            stdout, stderr, return_code = self._run(show_command(missing))
+            if return_code != 0:
+                if return_code == 127 or "systemd" in stderr or "Failed to connect to bus" in stderr:
+                    self.available = False
+                self._units.update((unit, None) for unit in missing)
+                return
+
+            blocks = parse_show_output(stdout)
+            if len(blocks) == len(missing):
+                self._units.update(zip(missing, blocks))
+            else:
+                # Should not happen, but never pair a unit with another unit's block
+                by_id = {block.get("Id"): block for block in blocks}
+                self._units.update((unit, by_id.get(_unit_id(unit))) for unit in missing)
+
+    def info(self, unit):
+        """:return: {"Id", "LoadState", "ActiveState", "SubState", "UnitFileState"} of the unit, or None."""
+        self.load([unit])
+        return self._units.get(unit)
+
+    def active_state(self, unit):
+        """:return: "active", "inactive", "failed", "activating", ... (what 'systemctl is-active' prints), or None."""
+        info = self.info(unit)
+        return (info.get("ActiveState") or None) if info else None
+
+    def is_installed(self, unit):
+        info = self.info(unit)
+        return bool(info) and info.get("LoadState") not in ("not-found", "", None)
@@ -0,0 +1,324 @@
+# core/versions.py
+# Package version comparison with the same results as the package managers themselves,
+# so pending updates can be computed without asking them.
+#
+# compare_pacman_versions() / compare_debian_versions() are direct ports, one pair at a time.
+# For many versions at once, version_key() turns a version into a tuple once (cached) so that
+# comparing, sorting and range checks are plain tuple comparisons:
+#   sort_versions(["1.0-1", "1.0~rc1-1"], "debian") -> ["1.0~rc1-1", "1.0-1"]
+
+import re
+from functools import cmp_to_key, lru_cache
+
+def _is_digit(char):
+    return "0" <= char <= "9"
+
+def _is_alpha(char):
+    # rpmvercmp uses the C locale's isalpha(), ASCII letters only
+    return "a" <= char <= "z" or "A" <= char <= "Z"
+
+def _is_alnum(char):
+    return _is_digit(char) or _is_alpha(char)
+
+def rpmvercmp(a, b):
+    """
+    Compares two version strings segment by segment (pacman's rpmvercmp()).
+    :return: -1, 0 or 1
+    """
+    if a == b:
+        return 0
+    i = j = 0
+    # End of the previous segment in each string
+    end_a = end_b = 0
+    len_a, len_b = len(a), len(b)
+    while i < len_a and j < len_b:
+        while i < len_a and not _is_alnum(a[i]):
+            i += 1
+        while j < len_b and not _is_alnum(b[j]):
+            j += 1
+        if i >= len_a or j >= len_b:
+            break
+        # "1.0" vs "1..0": a longer separator is newer
+        if i - end_a != j - end_b:
+            return -1 if i - end_a < j - end_b else 1
+
+        end_a, end_b = i, j
+        if _is_digit(a[i]):
+            while end_a < len_a and _is_digit(a[end_a]):
+                end_a += 1
+            while end_b < len_b and _is_digit(b[end_b]):
+                end_b += 1
+            is_number = True
+        else:
+            while end_a < len_a and _is_alpha(a[end_a]):
+                end_a += 1
+            while end_b < len_b and _is_alpha(b[end_b]):
+                end_b += 1
+            is_number = False
+
+        segment_b = b[j:end_b]
+        if not segment_b:
+            # Numeric and alpha segments compared: numbers are newer
+            return 1 if is_number else -1
+        segment_a = a[i:end_a]
+        if is_number:
+            segment_a = segment_a.lstrip("0")
+            segment_b = segment_b.lstrip("0")
+            if len(segment_a) != len(segment_b):
+                return 1 if len(segment_a) > len(segment_b) else -1
+        if segment_a != segment_b:
+            return 1 if segment_a > segment_b else -1
+        i, j = end_a, end_b
+
+    if i >= len_a and j >= len_b:
+        return 0
+    # Whatever is left decides: "1.0" < "1.0.1", but "1.0alpha" < "1.0"
+    if (i >= len_a and not _is_alpha(b[j])) or (i < len_a and _is_alpha(a[i])):
+        return -1
+    return 1
+
+def split_evr(version):
+    """"1:2.0.1-3" -> ("1", "2.0.1", "3"); the epoch defaults to "0" and the release may be None."""
+    position = 0
+    while position < len(version) and _is_digit(version[position]):
+        position += 1
+    if position < len(version) and version[position] == ":":
+        epoch, rest = version[:position] or "0", version[position + 1:]
+    else:
+        epoch, rest = "0", version
+    upstream, sep, release = rest.rpartition("-")
+    if not sep:
+        return epoch, rest, None
+    return epoch, upstream, release
+
+def compare_pacman_versions(a, b):
+    """
+    Compares two "[epoch:]pkgver[-pkgrel]" versions the way 'vercmp' / alpm_pkg_vercmp() does.
+    :return: -1 if a is older than b, 0 if they are equal, 1 if a is newer.
+    """
+    if a == b:
+        return 0
+    epoch_a, version_a, release_a = split_evr(a)
+    epoch_b, version_b, release_b = split_evr(b)
+    result = rpmvercmp(epoch_a, epoch_b)
+    if result == 0:
+        result = rpmvercmp(version_a, version_b)
+        # A missing pkgrel matches any pkgrel
+        if result == 0 and release_a is not None and release_b is not None:
+            result = rpmvercmp(release_a, release_b)
+    return result
+
+def _debian_order(char):
+    # dpkg's order(): "~" sorts before everything, even the end of the string; letters before other symbols
+    if char == "~":
+        return -1
+    if _is_alpha(char):
+        return ord(char)
+    return ord(char) + 256
+
+def verrevcmp(a, b):
+    """
+    Compares an upstream version or revision the way dpkg does.
+    :return: A negative number, 0 or a positive number.
+    """
+    i = j = 0
+    len_a, len_b = len(a), len(b)
+    while i < len_a or j < len_b:
+        first_diff = 0
+        while (i < len_a and not _is_digit(a[i])) or (j < len_b and not _is_digit(b[j])):
+            order_a = _debian_order(a[i]) if i < len_a and not _is_digit(a[i]) else 0
+            order_b = _debian_order(b[j]) if j < len_b and not _is_digit(b[j]) else 0
+            if order_a != order_b:
+                return order_a - order_b
+            i += 1
+            j += 1
+        while i < len_a and a[i] == "0":
+            i += 1
+        while j < len_b and b[j] == "0":
+            j += 1
+        while i < len_a and j < len_b and _is_digit(a[i]) and _is_digit(b[j]):
+            if not first_diff:
+                first_diff = ord(a[i]) - ord(b[j])
+            i += 1
+            j += 1
+        if i < len_a and _is_digit(a[i]):
+            return 1
+        if j < len_b and _is_digit(b[j]):
+            return -1
+        if first_diff:
+            return first_diff
+    return 0
+
+def split_debian_version(version):
+    """"1:2.30-1ubuntu2" -> (1, "2.30", "1ubuntu2"); no epoch is 0 and no revision is ""."""
+    epoch, sep, rest = version.partition(":")
+    if not sep:
+        epoch, rest = "0", version
+    upstream, sep, revision = rest.rpartition("-")
+    if not sep:
+        upstream, revision = rest, ""
+    return (int(epoch) if epoch.isdigit() else 0), upstream, revision
+
+def compare_debian_versions(a, b):
+    """
+    Compares two "[epoch:]upstream[-revision]" versions the way 'dpkg --compare-versions' does.
+    :return: -1 if a is older than b, 0 if they are equal, 1 if a is newer.
+    """
+    if a == b:
+        return 0
+    epoch_a, upstream_a, revision_a = split_debian_version(a)
+    epoch_b, upstream_b, revision_b = split_debian_version(b)
+    if epoch_a != epoch_b:
+        return -1 if epoch_a < epoch_b else 1
+    result = verrevcmp(upstream_a, upstream_b) or verrevcmp(revision_a, revision_b)
+    return (result > 0) - (result < 0)
+
+
+# Sortable keys. A Debian key is (epoch, upstream, revision), where upstream and revision alternate
+# non-digit parts (dpkg's order() of every character, then a 0 for the end of the part) with numbers.
+_DEBIAN_PARTS = re.compile(r"([^0-9]*)([0-9]*)")
+_DEBIAN_END = ((0,), 0)
+
+# A pacman key holds one (separator length, 1, number) or (separator length, 0, letters) per segment,
+# then _PACMAN_END: a string that ended sorts after letters and before numbers or another separator.
+_PACMAN_SEGMENTS = re.compile(r"([^A-Za-z0-9]*)(?:([0-9]+)|([A-Za-z]+))")
+_PACMAN_END = (0, 0.5)
+
+KEY_CACHE_SIZE = 1 << 16
+
+def _debian_part_key(text):
+    parts = []
+    for position, (letters, digits) in enumerate(_DEBIAN_PARTS.findall(text)):
+        # The first part is kept even when empty, so "" and "0" both start with ((0,), 0)
+        if letters or digits or not position:
+            parts.append((tuple(_debian_order(char) for char in letters) + (0,), int(digits) if digits else 0))
+    parts.append(_DEBIAN_END)
+    return tuple(parts)
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def debian_version_key(version):
+    """:return: A tuple that sorts exactly like 'dpkg --compare-versions' orders the versions."""
+    epoch, upstream, revision = split_debian_version(version)
+    return (epoch, _debian_part_key(upstream), _debian_part_key(revision))
+
+def _pacman_part_key(text):
+    if text and not _is_alnum(text[-1]):
+        # rpmvercmp is not transitive for trailing separators ("1." > "1..a" > "1.2" > "1."), no key can order them
+        return None
+    segments = []
+    for separator, number, letters in _PACMAN_SEGMENTS.findall(text):
+        segments.append((len(separator), 1, int(number)) if number else (len(separator), 0, letters))
+    segments.append(_PACMAN_END)
+    return tuple(segments)
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def pacman_version_key(version):
+    """
+    :return: A tuple that sorts like 'vercmp' orders the versions: (epoch, pkgver) plus pkgrel when there is one,
+             or None for the rare versions no key can order (a part ending in a separator, or non-ASCII).
+    """
+    epoch, upstream, release = split_evr(version)
+    upstream_key = _pacman_part_key(upstream)
+    release_key = _pacman_part_key(release) if release is not None else ()
+    if upstream_key is None or release_key is None or not version.isascii():
+        return None
+    key = (int(epoch) if epoch.isdigit() else 0, upstream_key)
+    return key + (release_key,) if release is not None else key
+
+SCHEMES = {
+    "pacman": (pacman_version_key, compare_pacman_versions),
+    "debian": (debian_version_key, compare_debian_versions),
+}
+
+def version_key(version, scheme="pacman"):
+    """:return: The cached sortable key of a version ("pacman" or "debian" ordering); None if it has none."""
+    return SCHEMES[scheme][0](version)
+
+def _encode_number(number):
+    # Length-prefixed big-endian: a longer number is a larger one
+    length = (number.bit_length() + 7) // 8
+    return bytes((length,)) + number.to_bytes(length, "big")
+
+def _debian_key_bytes(key):
+    epoch, upstream, revision = key
+    encoded = bytearray(_encode_number(epoch))
+    for part in (upstream, revision):
+        for orders, number in part:
+            # order() is -1 for "~" and ends every run with 0; shifted so both fit unsigned
+            for order in orders:
+                encoded += (order + 2).to_bytes(3, "big")
+            encoded += _encode_number(number)
+    return bytes(encoded)
+
+def _pacman_key_bytes(key):
+    encoded = bytearray(_encode_number(key[0]))
+    for part in key[1:]:
+        for segment in part:
+            encoded += _encode_number(segment[0])
+            if segment == _PACMAN_END:
+                encoded += b"\x02"
+            elif segment[1]:
+                encoded += b"\x03" + _encode_number(segment[2])
+            else:
+                encoded += b"\x01" + segment[2].encode("ascii") + b"\x00"
+    return bytes(encoded)
+
+_KEY_ENCODERS = {"pacman": _pacman_key_bytes, "debian": _debian_key_bytes}
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def version_key_bytes(version, scheme="pacman"):
+    """
+    :return: The version's key as bytes that compare exactly like the key, compact enough to store
+             many of them (see core/advisories.py); None when the version has no key.
+    """
+    key = SCHEMES[scheme][0](version)
+    if key is None:
+        return None
+    try:
+        return _KEY_ENCODERS[scheme](key)
+    except OverflowError:
+        return None # a number of more than 255 bytes
+
+def _compare(a, b, key_a, key_b, compare):
+    if key_a is None or key_b is None:
+        return compare(a, b)
+    if len(key_a) != len(key_b):
+        # pacman: a version without pkgrel matches the other version's every pkgrel
+        key_a, key_b = key_a[:2], key_b[:2]
+    return (key_a > key_b) - (key_a < key_b)
+
+def compare_versions(a, b, scheme="pacman"):
+    """:return: -1 if a is older than b, 0 if they are equal, 1 if a is newer."""
+    key, compare = SCHEMES[scheme]
+    return _compare(a, b, key(a), key(b), compare)
+
+def compare_batch(pairs, scheme="pacman"):
+    """
+    Compares many (a, b) pairs; every distinct version is tokenized once.
+    :return: [-1 | 0 | 1] in the order of the pairs.
+    """
+    key, compare = SCHEMES[scheme]
+    return [_compare(a, b, key(a), key(b), compare) for a, b in pairs]
+
+def sort_versions(versions, scheme="pacman", reverse=False):
+    """:return: The versions sorted oldest first (newest first with reverse=True)."""
+    key, compare = SCHEMES[scheme]
+    keys = [key(version) for version in versions]
+    if None in keys or (scheme == "pacman" and len({len(item) for item in keys}) > 1):
+        # Versions without a key, or pacman versions with and without pkgrel: no total order, compare pairwise
+        return sorted(versions, key=cmp_to_key(compare), reverse=reverse)
+    return [version for _, version in sorted(zip(keys, versions), key=lambda item: item[0], reverse=reverse)]
+
+def in_range(version, introduced=None, fixed=None, scheme="pacman"):
+    """:return: True if introduced <= version < fixed; a missing bound is open."""
+    key, compare = SCHEMES[scheme]
+    own_key = key(version)
+    if introduced is not None and _compare(version, introduced, own_key, key(introduced), compare) < 0:
+        return False
+    if fixed is not None and _compare(version, fixed, own_key, key(fixed), compare) >= 0:
+        return False
+    return True
+
+def versions_in_range(versions, introduced=None, fixed=None, scheme="pacman"):
+    """:return: [bool] for every version, as in_range() with the bounds tokenized once."""
+    return [in_range(version, introduced, fixed, scheme) for version in versions]
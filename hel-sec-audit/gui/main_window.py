@@ -1,12 +1,12 @@
 from PyQt5.QtWidgets import (
     QMainWindow, QVBoxLayout, QPushButton, QLabel, QWidget, 
-    QHBoxLayout, QAction
+    QHBoxLayout, QAction, QCheckBox
 )
 from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSize
+import threading
 
 # Import all necessary windows
-from gui.scan_window import ScanWindow
 from gui.results_window import ResultsWindow
 from gui.settings_window import SettingsWindow
 from gui.about_window import AboutWindow     
@@ -17,16 +17,31 @@ from core.security_scanner import SecurityScanner
 
 class ScanThread(QThread):
     progress_updated = pyqtSignal(int, str)
+    # Emitted for every check as soon as it finishes, before scan_finished
+    result_ready = pyqtSignal(dict)
     scan_finished = pyqtSignal(list)
 
-    def __init__(self, scanner):
+    def __init__(self, scanner, force_refresh=False, incremental=False):
         super().__init__()
         self.scanner = scanner
+        self.force_refresh = force_refresh
+        self.incremental = incremental
+        self.cancel_event = threading.Event()
 
     def run(self):
-        results = self.scanner.run_all_checks(progress_callback=self.progress_updated.emit)
+        results = self.scanner.run_all_checks(
+            progress_callback=self.progress_updated.emit,
+            force_refresh=self.force_refresh,
+            incremental=self.incremental,
+            result_callback=self.result_ready.emit,
+            cancel_event=self.cancel_event
+        )
         self.scan_finished.emit(results)
 
+    def cancel(self):
+        # Checks that are still running are dropped; the thread finishes with the results so far.
+        self.cancel_event.set()
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -56,13 +71,29 @@ class MainWindow(QMainWindow):
         self.start_scan_button.setFixedSize(250, 50)
         self.start_scan_button.clicked.connect(self.start_scan)
 
+        # إعادة الفحص للفحوصات التي تغيرت ملفاتها فقط، مفيد بعد إصلاح مشكلة واحدة
+        # Re-runs only the checks whose input files changed, handy after fixing a single issue
+        self.rescan_changed_button = QPushButton("🔁 Rescan Changed")
+        self.rescan_changed_button.setFixedSize(250, 50)
+        self.rescan_changed_button.clicked.connect(lambda: self.start_scan(incremental=True))
+
         button_layout = QHBoxLayout()
         button_layout.addStretch()
         button_layout.addWidget(self.start_scan_button)
+        button_layout.addWidget(self.rescan_changed_button)
         button_layout.addStretch()
 
         main_layout.addLayout(button_layout)
 
+        # نتائج الفحوصات التي لم تتغير مدخلاتها تُعاد من الذاكرة المؤقتة ما لم يُطلب التحديث
+        # Unchanged checks are served from the result cache unless a refresh is forced
+        self.force_refresh_checkbox = QCheckBox("Force refresh (ignore cached results)")
+        refresh_layout = QHBoxLayout()
+        refresh_layout.addStretch()
+        refresh_layout.addWidget(self.force_refresh_checkbox)
+        refresh_layout.addStretch()
+        main_layout.addLayout(refresh_layout)
+
         main_layout.addStretch()
 
     def create_menu_bar(self):
@@ -211,20 +242,26 @@ class MainWindow(QMainWindow):
                 }
             """)
 
-    def start_scan(self):
-        self.scan_win = ScanWindow()
-        self.scan_win.show()
+    def start_scan(self, incremental=False):
+        # نافذة النتائج تفتح فوراً وتعرض كل نتيجة فور انتهاء فحصها
+        # The results window opens right away and shows each finding as soon as its check finishes
+        self.results_win = ResultsWindow([], scanning=True)
+        self.results_win.show()
+        self.start_scan_button.setEnabled(False)
+        self.rescan_changed_button.setEnabled(False)
 
         self.scanner = SecurityScanner()
-        self.scan_thread = ScanThread(self.scanner)
-        self.scan_thread.progress_updated.connect(self.scan_win.update_progress)
+        self.scan_thread = ScanThread(self.scanner, force_refresh=self.force_refresh_checkbox.isChecked(), incremental=incremental)
+        self.scan_thread.progress_updated.connect(self.results_win.update_progress)
+        self.scan_thread.result_ready.connect(self.results_win.add_result)
         self.scan_thread.scan_finished.connect(self.on_scan_finished)
+        self.results_win.cancel_requested.connect(self.scan_thread.cancel)
         self.scan_thread.start()
 
     def on_scan_finished(self, results):
-        self.scan_win.hide()
-        self.results_win = ResultsWindow(results)
-        self.results_win.show()
+        self.results_win.finish_scan(results)
+        self.start_scan_button.setEnabled(True)
+        self.rescan_changed_button.setEnabled(True)
 
     def open_settings(self):
         self.settings_window = SettingsWindow()
@@ -1,17 +1,28 @@
 # gui/results_window.py
 # Displays the security scan results in a user-friendly format.
 
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QScrollArea, QWidget, QFrame, QSizePolicy, QComboBox, QFileDialog # <--- إضافة QFileDialog
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QScrollArea, QWidget, QFrame, QSizePolicy, QComboBox, QFileDialog, QProgressBar # <--- إضافة QFileDialog
+from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QColor, QPalette
 import os # <--- إضافة os
+import html
+
+from core.instrumentation import format_timing_table
 
 class ResultsWindow(QDialog):
-    def __init__(self, results):
+    # Emitted when the user asks to stop a scan that is still running
+    cancel_requested = pyqtSignal()
+
+    def __init__(self, results, scanning=False):
+        """
+        :param results: Results to show; more can be added with add_result() while a scan runs.
+        :param scanning: If True, the window shows the scan progress and a cancel button until finish_scan().
+        """
         super().__init__()
         self.setWindowTitle("Scan Results")
         self.setGeometry(100, 100, 800, 600) # زيادة حجم النافذة
-        self.results = results
+        self.results = list(results)
+        self.scanning = scanning
         self.init_ui()
 
     def init_ui(self):
@@ -20,6 +31,19 @@ class ResultsWindow(QDialog):
 
         main_layout.addWidget(QLabel("<h1>Security Scan Results</h1>"))
 
+        # تقدم الفحص يظهر هنا بينما تصل النتائج واحدة تلو الأخرى
+        # Scan progress, shown while results arrive one by one
+        self.status_label = QLabel("Initializing scan...")
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.cancel_button = QPushButton("Cancel Scan")
+        self.cancel_button.clicked.connect(self._cancel_scan)
+        main_layout.addWidget(self.status_label)
+        main_layout.addWidget(self.progress_bar)
+        main_layout.addWidget(self.cancel_button)
+        self._set_progress_visible(self.scanning)
+
         filter_layout = QVBoxLayout()
         filter_label = QLabel("Filter by Severity:")
         self.filter_combo = QComboBox()
@@ -27,6 +51,8 @@ class ResultsWindow(QDialog):
         self.filter_combo.addItem("Secure (Low)")
         self.filter_combo.addItem("Medium")
         self.filter_combo.addItem("High")
+        # Passwordless or extra UID 0 accounts, advisories rated Critical
+        self.filter_combo.addItem("Critical")
         self.filter_combo.currentIndexChanged.connect(self.update_results_display)
         
         filter_layout.addWidget(filter_label)
@@ -42,6 +68,13 @@ class ResultsWindow(QDialog):
         
         main_layout.addWidget(self.scroll_area)
 
+        # ملخص زمن الفحص: أي فحص أو أمر استغرق أطول وقت
+        # Timing summary: which check or command dominated the scan
+        self.timing_label = QLabel()
+        self.timing_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        main_layout.addWidget(self.timing_label)
+        self._update_timing_summary()
+
         # منطقة الأزرار: إضافة زر "Generate Report"
         # Buttons area: Add "Generate Report" button
         button_layout = QVBoxLayout() # استخدمنا QVBoxLayout عشان كل زرار يبقى في سطر لوحده
@@ -59,6 +92,37 @@ class ResultsWindow(QDialog):
 
         self.update_results_display()
 
+    def add_result(self, result):
+        # A check finished while the scan is still running
+        self.results.append(result)
+        self.update_results_display()
+
+    def update_progress(self, value, message):
+        self.progress_bar.setValue(value)
+        self.status_label.setText(message)
+
+    def finish_scan(self, results):
+        # The final list is in configuration order; the live one was in completion order.
+        self.results = list(results)
+        self.scanning = False
+        self._set_progress_visible(False)
+        self.update_results_display()
+        self._update_timing_summary()
+
+    def _cancel_scan(self):
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText("Cancelling...")
+        self.cancel_requested.emit()
+
+    def _set_progress_visible(self, visible):
+        self.status_label.setVisible(visible)
+        self.progress_bar.setVisible(visible)
+        self.cancel_button.setVisible(visible)
+
+    def _update_timing_summary(self):
+        self.timing_label.setText(f"<b>Scan Timing</b><pre>{html.escape(format_timing_table(self.results))}</pre>")
+        self.timing_label.setVisible(bool(self.results) and not self.scanning)
+
     def _generate_report(self):
         options = QFileDialog.Options()
         # options |= QFileDialog.DontUseNativeDialog # لبعض الأنظمة ممكن تحتاج دي لو فيه مشاكل
@@ -97,9 +161,10 @@ class ResultsWindow(QDialog):
 
     def update_results_display(self):
         for i in reversed(range(self.results_layout.count())):
-            widget = self.results_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
+            # takeAt also removes the trailing stretch, which otherwise piles up on every refresh
+            item = self.results_layout.takeAt(i)
+            if item.widget():
+                item.widget().setParent(None)
 
         selected_filter = self.filter_combo.currentText()
 
@@ -112,6 +177,8 @@ class ResultsWindow(QDialog):
                 continue
             elif selected_filter == "High" and result["severity"] != "High":
                 continue
+            elif selected_filter == "Critical" and result["severity"] != "Critical":
+                continue
             
             result_frame = QFrame()
             result_frame.setFrameShape(QFrame.StyledPanel)
@@ -123,7 +190,9 @@ class ResultsWindow(QDialog):
             if result["is_secure"]:
                 background_color = QColor("#e6ffe6")
             else:
-                if result["severity"] == "High":
+                if result["severity"] == "Critical":
+                    background_color = QColor("#ffcccc")
+                elif result["severity"] == "High":
                     background_color = QColor("#ffe6e6")
                 elif result["severity"] == "Medium":
                     background_color = QColor("#fff2e6")
@@ -136,6 +205,8 @@ class ResultsWindow(QDialog):
             result_frame.setAutoFillBackground(True)
 
             status_text = "SECURE" if result["is_secure"] else "VULNERABLE"
+            if result.get("cached"):
+                status_text += " (cached)"
             
             result_frame_layout.addWidget(QLabel(f"<h2>{result['check_name']} - Status: {status_text}</h2>"))
             result_frame_layout.addWidget(QLabel(f"<b>Title:</b> {result['title']}"))
@@ -154,7 +225,9 @@ class ResultsWindow(QDialog):
         self.results_layout.addStretch(1)
 
     def _get_severity_color(self, severity):
-        if severity == "High":
+        if severity == "Critical":
+            return "darkred"
+        elif severity == "High":
             return "red"
         elif severity == "Medium":
             return "orange"
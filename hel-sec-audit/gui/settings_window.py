@@ -5,6 +5,7 @@ from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QCheckBox
 from PyQt5.QtCore import Qt
 
 from core.config_manager import ConfigManager
+from core.registry import check_names as available_check_names
 
 class SettingsWindow(QDialog):
     def __init__(self):
@@ -29,17 +30,9 @@ class SettingsWindow(QDialog):
         
         current_check_settings = self.config_manager.get_all_check_settings()
 
-        check_names = [
-            "System Updates Status",
-            "Weak Password Policies/Usage",
-            "Open Network Ports",
-            "Firewall Status",
-            "Antivirus Status",
-            "Browser Security Settings",
-            "Installed Software Updates" # <--- إضافة اسم الفحص الجديد هنا
-        ]
-
-        for check_name in check_names:
+        # الأسماء تأتي من سجل الفحوصات، بما فيها الإضافات المثبتة
+        # Names come from the check registry, including installed plugins
+        for check_name in available_check_names():
             checkbox = QCheckBox(check_name)
             checkbox.setChecked(current_check_settings.get(check_name, True))
             checkbox.stateChanged.connect(lambda state, name=check_name: self._save_check_setting(name, state))
@@ -1,11 +1,14 @@
+#!/usr/bin/env python3
 import os
 import sys
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QIcon
 
-from gui.main_window import MainWindow
+def run_gui():
+    # PyQt5 is imported only for the GUI, so the headless CLI works on servers without it.
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QIcon
+
+    from gui.main_window import MainWindow
 
-if __name__ == "__main__":
     app = QApplication(sys.argv)
 
     base_path = os.path.dirname(os.path.abspath(__file__))
@@ -14,4 +17,12 @@ if __name__ == "__main__":
 
     main_win = MainWindow()
     main_win.show()
-    sys.exit(app.exec_())
+    return app.exec_()
+
+if __name__ == "__main__":
+    # 'hel-sec-audit scan ...' (or any other argument) goes to the command line interface
+    # 'hel-sec-audit scan ...' وأي وسائط أخرى تُوجَّه إلى واجهة سطر الأوامر
+    if len(sys.argv) > 1:
+        from cli import main as cli_main, exit_process
+        exit_process(cli_main(sys.argv[1:]))
+    sys.exit(run_gui())